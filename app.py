@@ -13,18 +13,72 @@
 
 
 
-from flask import Flask, render_template, request, redirect, jsonify, session, url_for, flash, Response
+from flask import Flask, render_template, request, redirect, jsonify, session, url_for, flash, Response, Request, send_from_directory, send_file, stream_with_context
+from markupsafe import Markup
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import text
+from sqlalchemy import text, and_, or_, type_coerce, select, table, column, literal_column, event, tuple_
+from sqlalchemy.orm import Session as OrmSession, object_session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from werkzeug.security import generate_password_hash, check_password_hash
 import os
-from werkzeug.utils import secure_filename
+from werkzeug.utils import secure_filename, safe_join
+from werkzeug.exceptions import RequestEntityTooLarge
 import re
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from io import BytesIO
 from flask_mail import Mail, Message as MailMessage
+import click
 import secrets
 import json
+import shutil
+import tempfile
+import mimetypes
+import smtplib
+import io
+import zipfile
+import heapq
+from collections import deque, OrderedDict
+import queue
+import hashlib
+import random
+import sys
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from types import SimpleNamespace
+import time
+from minhash import lsh_band_shape, lsh_buckets, minhash_signature, minhash_similarity, pack_minhash, unpack_minhash
+from poster_render import POSTER_PHOTO_LIMIT, render_poster_pdf, draw_poster_pages
+try:
+    import fcntl  # POSIX file locks for electing a single background sweeper
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt  # Windows fallback
+except ImportError:
+    msvcrt = None
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    # Optional: without Pillow photos are not hashed or thumbnailed, and matching is text-only
+    Image = None
+    ImageOps = None
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    # Optional: without NumPy/SciPy, matching scores candidate pairs one by one with _match_score
+    np = None
+    sparse = None
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:
+    # Optional: only needed for UPLOAD_STORAGE=s3
+    boto3 = None
+    ClientError = None
 try:
     from reportlab.pdfgen import canvas
     from reportlab.lib.pagesizes import A4
@@ -42,7 +96,7 @@ except Exception as e:
 app = Flask(__name__)
 
 # Database Configuration
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///ecommerce.db"
+app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///ecommerce.db")
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 app.secret_key = "ecommerce_secret"
 
@@ -56,8 +110,31 @@ app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME')
 app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD')
 app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', app.config.get('MAIL_USERNAME'))
 
+app.config['MAIL_NO_AUTH'] = os.environ.get('MAIL_NO_AUTH', 'false').lower() == 'true'  # relay takes mail without logging in (e.g. a local aiosmtpd stand-in); needs MAIL_DEFAULT_SENDER
+
 mail = Mail(app)
 
+# Email outbox (requests only queue mail; a worker delivers it)
+app.config['EMAIL_OUTBOX_WORKER_ENABLED'] = os.environ.get('EMAIL_OUTBOX_WORKER_ENABLED', 'true').lower() == 'true'  # deliver from a thread in each serving process
+app.config['EMAIL_WORKERS'] = int(os.environ.get('EMAIL_WORKERS', '2'))  # SMTP connections the outbox worker uses in parallel
+app.config['EMAIL_OUTBOX_POLL_INTERVAL'] = int(os.environ.get('EMAIL_OUTBOX_POLL_INTERVAL', '5'))  # seconds between outbox checks when nothing wakes the worker
+app.config['EMAIL_MAX_ATTEMPTS'] = int(os.environ.get('EMAIL_MAX_ATTEMPTS', '6'))  # deliveries tried before a message is dead-lettered
+app.config['EMAIL_RETRY_BASE'] = int(os.environ.get('EMAIL_RETRY_BASE', '30'))  # seconds before the first retry; doubles on every further attempt
+app.config['EMAIL_RETRY_MAX'] = int(os.environ.get('EMAIL_RETRY_MAX', '3600'))  # cap on the delay between attempts
+app.config['EMAIL_SENDING_TIMEOUT'] = int(os.environ.get('EMAIL_SENDING_TIMEOUT', '300'))  # seconds before a claimed but unfinished message (crashed worker) is retried
+app.config['EMAIL_OUTBOX_RETENTION'] = int(os.environ.get('EMAIL_OUTBOX_RETENTION', str(7 * 24 * 3600)))  # seconds sent messages are kept
+
+# Background warehouse sweep (moves items past their deadline off the request path)
+app.config['WAREHOUSE_SCHEDULER_ENABLED'] = os.environ.get('WAREHOUSE_SCHEDULER_ENABLED', 'true').lower() == 'true'
+app.config['WAREHOUSE_SWEEP_INTERVAL'] = int(os.environ.get('WAREHOUSE_SWEEP_INTERVAL', '60'))  # seconds between sweeper-lock retries on standby processes and deadline polls on the sweeper
+app.config['WAREHOUSE_RESYNC_INTERVAL'] = int(os.environ.get('WAREHOUSE_RESYNC_INTERVAL', '3600'))  # seconds between deadline reloads from the DB
+app.config['MATCH_ENGINE_REBUILD_INTERVAL'] = int(os.environ.get('MATCH_ENGINE_REBUILD_INTERVAL', '900'))  # seconds between full TF-IDF matrix reloads
+app.config['MATCH_FANOUT_ASYNC'] = os.environ.get('MATCH_FANOUT_ASYNC', 'true').lower() == 'true'  # send new-post match notifications from a background thread
+app.config['PHOTO_WORKERS'] = int(os.environ.get('PHOTO_WORKERS', '2'))  # threads hashing uploaded photos and generating thumbnails
+app.config['UPLOAD_WORKERS'] = int(os.environ.get('UPLOAD_WORKERS', '4'))  # threads staging the files of one multi-photo post in parallel
+app.config['MATCH_LSH_ENABLED'] = os.environ.get('MATCH_LSH_ENABLED', 'false').lower() == 'true'  # approximate MinHash/LSH candidates for very large archives
+app.config['MATCH_LSH_THRESHOLD'] = float(os.environ.get('MATCH_LSH_THRESHOLD', '0.3'))  # estimated Jaccard needed to become a candidate
+
 # File upload configuration
 UPLOAD_FOLDER = 'static/uploads'
 # Allow common image types and a few document formats for chat/file uploads
@@ -66,15 +143,42 @@ ALLOWED_EXTENSIONS = {
     'pdf', 'txt', 'doc', 'docx', 'xls', 'xlsx'
 }
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_REQUEST_SIZE', str(50 * 1024 * 1024)))  # whole request body; Flask answers 413 past it
+app.config['MAX_UPLOAD_FILE_SIZE'] = int(os.environ.get('MAX_UPLOAD_FILE_SIZE', str(10 * 1024 * 1024)))  # each uploaded file, checked while it streams in
+app.config['UPLOAD_STAGING_FOLDER'] = os.environ.get('UPLOAD_STAGING_FOLDER', os.path.join(app.instance_path, 'upload_staging'))  # local temp files before they enter storage
+app.config['UPLOAD_STORAGE'] = os.environ.get('UPLOAD_STORAGE', 'local')  # 'local' (sharded under UPLOAD_FOLDER) or 's3'
+app.config['UPLOAD_S3_BUCKET'] = os.environ.get('UPLOAD_S3_BUCKET')
+app.config['UPLOAD_S3_PREFIX'] = os.environ.get('UPLOAD_S3_PREFIX', 'uploads/')
+app.config['UPLOAD_S3_ENDPOINT_URL'] = os.environ.get('UPLOAD_S3_ENDPOINT_URL')  # e.g. http://localhost:9000 for MinIO
+app.config['UPLOAD_S3_PUBLIC_URL'] = os.environ.get('UPLOAD_S3_PUBLIC_URL')  # base URL serving the bucket; presigned URLs if unset
+app.config['UPLOAD_S3_URL_EXPIRY'] = int(os.environ.get('UPLOAD_S3_URL_EXPIRY', '3600'))  # seconds presigned URLs stay valid
+app.config['UPLOAD_CACHE_MAX_AGE'] = int(os.environ.get('UPLOAD_CACHE_MAX_AGE', '3600'))  # browser cache for uploads without a content hash in the name
+app.config['UPLOAD_SENDFILE'] = os.environ.get('UPLOAD_SENDFILE', '').lower()  # '', 'x-sendfile' (Apache/lighttpd) or 'x-accel-redirect' (nginx)
+app.config['UPLOAD_ACCEL_REDIRECT_PREFIX'] = os.environ.get('UPLOAD_ACCEL_REDIRECT_PREFIX', '/_uploads/')  # nginx internal location aliased to UPLOAD_FOLDER
+app.config['UPLOAD_QUARANTINE_FOLDER'] = os.environ.get('UPLOAD_QUARANTINE_FOLDER', os.path.join(app.instance_path, 'upload_quarantine'))  # orphans parked by gc-uploads (local backend)
+app.config['UPLOAD_GC_GRACE'] = int(os.environ.get('UPLOAD_GC_GRACE', '3600'))  # seconds a new file may stay unreferenced (written before its row commits)
+app.config['UPLOAD_QUARANTINE_TTL'] = int(os.environ.get('UPLOAD_QUARANTINE_TTL', str(7 * 24 * 3600)))  # seconds in quarantine before an orphan is deleted
+app.config['PENDING_UPLOAD_TTL'] = int(os.environ.get('PENDING_UPLOAD_TTL', str(24 * 3600)))  # seconds before abandoned staged files (unverified profile photos) are removed
+
+# Rendered poster PDFs, reused until the item changes
+app.config['POSTER_CACHE_FOLDER'] = os.environ.get('POSTER_CACHE_FOLDER', os.path.join(app.instance_path, 'poster_cache'))
+app.config['POSTER_CACHE_MAX_BYTES'] = int(os.environ.get('POSTER_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))  # least recently used posters are evicted past this
+app.config['POSTER_WORKERS'] = int(os.environ.get('POSTER_WORKERS', str(os.cpu_count() or 2)))  # worker processes rendering large posters, started on first use; 0 renders inside the request
+app.config['POSTER_INLINE_MAX_BYTES'] = int(os.environ.get('POSTER_INLINE_MAX_BYTES', str(256 * 1024)))  # posters with less photo data than this skip the pool
+app.config['POSTER_RENDER_TIMEOUT'] = int(os.environ.get('POSTER_RENDER_TIMEOUT', '60'))  # seconds /poster/<id> waits for a pooled render
 
 # Create upload folder if it doesn't exist
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
+os.makedirs(app.config['UPLOAD_STAGING_FOLDER'], exist_ok=True)
+os.makedirs(app.config['POSTER_CACHE_FOLDER'], exist_ok=True)
 
 db = SQLAlchemy(app)
 
 # Helper to check mail credentials presence
 def are_mail_credentials_present():
+    if app.config.get('MAIL_NO_AUTH'):
+        return True
     return bool(app.config.get('MAIL_USERNAME')) and bool(app.config.get('MAIL_PASSWORD'))
 
 # Helper functions for user suspension checks
@@ -223,9 +327,30 @@ def _tokenize_text(text: str):
     except Exception:
         return []
 
+def _compute_match_tokens(item) -> str:
+    """Sorted distinct tokens of name + description + location, space-joined (stored on LostItem.match_tokens)"""
+    tokens = set(_tokenize_text(getattr(item, 'name', '')) + _tokenize_text(getattr(item, 'description', '')) + _tokenize_text(getattr(item, 'location', '')))
+    return ' '.join(sorted(tokens))
+
+def _item_tokens(item):
+    """Distinct match tokens of an item, from the stored match_tokens when it was loaded"""
+    stored = getattr(item, 'match_tokens', None)
+    if stored is None:
+        stored = _compute_match_tokens(item)
+    cached = getattr(item, '_match_token_set', None)
+    if cached is not None and cached[0] == stored:
+        return cached[1]
+    tokens = frozenset(sys.intern(t) for t in stored.split())
+    try:
+        # Parsed once per loaded instance; keyed on the raw string so edits invalidate it
+        item._match_token_set = (stored, tokens)
+    except AttributeError:
+        pass  # plain result rows (with_entities) are immutable
+    return tokens
+
 def _match_score(a, b) -> float:
-    a_tokens = set(_tokenize_text(getattr(a, 'name', '')) + _tokenize_text(getattr(a, 'description', '')) + _tokenize_text(getattr(a, 'location', '')))
-    b_tokens = set(_tokenize_text(getattr(b, 'name', '')) + _tokenize_text(getattr(b, 'description', '')) + _tokenize_text(getattr(b, 'location', '')))
+    a_tokens = _item_tokens(a)
+    b_tokens = _item_tokens(b)
     if not a_tokens or not b_tokens:
         return 0.0
     inter = len(a_tokens & b_tokens)
@@ -245,9 +370,82 @@ def _match_score(a, b) -> float:
     return jaccard + value_bonus + loc_bonus
 
 def _has_token_overlap(a, b) -> bool:
-    a_tokens = set(_tokenize_text(getattr(a, 'name', '')) + _tokenize_text(getattr(a, 'description', '')) + _tokenize_text(getattr(a, 'location', '')))
-    b_tokens = set(_tokenize_text(getattr(b, 'name', '')) + _tokenize_text(getattr(b, 'description', '')) + _tokenize_text(getattr(b, 'location', '')))
-    return len(a_tokens & b_tokens) >= 1
+    return not _item_tokens(a).isdisjoint(_item_tokens(b))
+
+# Candidates pulled from the inverted index per lookup, ranked by shared-token count
+MATCH_CANDIDATE_LIMIT = 200
+# Tokens posted by at least this many items act as stop words ("black", "library") and are
+# skipped whenever the item has rarer tokens to match on
+MATCH_COMMON_TOKEN_POSTINGS = 2000
+
+def _match_lookup_tokens(item):
+    tokens = {t[:ITEM_TOKEN_MAX_LENGTH] for t in _item_tokens(item)}
+    rare = {
+        t for t in tokens
+        if db.session.query(ItemToken.item_id).filter(ItemToken.token == t)
+            .limit(MATCH_COMMON_TOKEN_POSTINGS).count() < MATCH_COMMON_TOKEN_POSTINGS
+    }
+    return rare or tokens
+
+def find_item_matches(item, status, limit=5, filters=None):
+    """Best-scoring open items of `status` for `item`, as [(other, score)].
+
+    With MATCH_LSH_ENABLED candidates come from the MinHash/LSH index; otherwise, with
+    NumPy/SciPy the TF-IDF engine scores every open item in one pass, and without them
+    candidates come from the ItemToken inverted index (items sharing at least one token).
+    LSH and token-index candidates get the per-pair _match_score. Items with a near-identical
+    photo join the candidates and get a photo bonus. `filters` (from _parse_item_filters)
+    narrows the candidates like the listing search.
+    """
+    photo_matches = photo_similar_items(item, status)
+    if app.config['MATCH_LSH_ENABLED']:
+        scored = _score_match_candidates(item, lsh_candidate_ids(item, status, MATCH_CANDIDATE_LIMIT), filters)
+    elif item_match_engine is not None:
+        ranked = dict(item_match_engine.top(item, status, MATCH_CANDIDATE_LIMIT if filters or photo_matches else limit))
+        scored = []
+        if ranked:
+            candidates = LostItem.query.filter(LostItem.id.in_(list(ranked)), LostItem.status == status)
+            if filters:
+                candidates = _apply_item_filters(candidates, filters)
+            scored = [(other, ranked[other.id]) for other in candidates.all()]
+    else:
+        scored = []
+        tokens = _match_lookup_tokens(item)
+        if tokens:
+            shared = db.func.count(ItemToken.token).label('shared')
+            # likely() keeps SQLite from driving the join off the (unselective) status index
+            query = db.session.query(ItemToken.item_id, shared)\
+                .join(LostItem, LostItem.id == ItemToken.item_id)\
+                .filter(ItemToken.token.in_(tokens), db.func.likely(LostItem.status == status))
+            if item.id is not None:
+                query = query.filter(ItemToken.item_id != item.id)
+            rows = query.group_by(ItemToken.item_id)\
+                .order_by(shared.desc(), ItemToken.item_id.desc())\
+                .limit(MATCH_CANDIDATE_LIMIT).all()
+            scored = _score_match_candidates(item, [row.item_id for row in rows], filters)
+    if photo_matches:
+        scored = _add_photo_bonus(item, scored, photo_matches, filters)
+    scored.sort(key=lambda x: (x[1], x[0].id), reverse=True)
+    return scored[:limit]
+
+def _score_match_candidates(item, candidate_ids, filters=None):
+    if not candidate_ids:
+        return []
+    candidates = LostItem.query.filter(LostItem.id.in_(candidate_ids))
+    if filters:
+        candidates = _apply_item_filters(candidates, filters)
+    # Every candidate shares a token, so all pass the old "score >= 0.12 or overlap" rule
+    return [(other, _match_score(item, other)) for other in candidates.all()]
+
+def _add_photo_bonus(item, scored, photo_matches, filters=None):
+    """Add the photo-similarity bonus; photo-only matches (no shared words) are scored here"""
+    seen = {other.id for other, _ in scored}
+    scored = [(other, score + _photo_match_bonus(photo_matches[other.id]) if other.id in photo_matches else score)
+              for other, score in scored]
+    extra = [item_id for item_id in photo_matches if item_id not in seen]
+    for other, score in _score_match_candidates(item, extra, filters):
+        scored.append((other, score + _photo_match_bonus(photo_matches[other.id])))
+    return scored
 
 # ------------ Email Verification Model ------------
 class EmailVerification(db.Model):
@@ -264,14 +462,83 @@ class LostItem(db.Model):
     name = db.Column(db.String(100), nullable=False)
     value = db.Column(db.Float, nullable=True)  # Optional value
     description = db.Column(db.String(500), nullable=False)
-    photo_filename = db.Column(db.String(200), nullable=True)  # Optional photo filename
-    photo_filenames = db.Column(db.Text, nullable=True)  # JSON array of filenames
+    photo_filename = db.Column(db.String(200), nullable=True)  # Cover photo (first ItemPhoto), kept for quick "has a photo" filters
+    photo_filenames = db.Column(db.Text, nullable=True)  # Legacy JSON array of filenames; photos now live in ItemPhoto
     location = db.Column(db.String(200), nullable=True)  # Where it was lost/found
     date_lost = db.Column(db.DateTime, default=db.func.current_timestamp())
     status = db.Column(db.String(20), default='lost')  # lost, found, claimed, warehouse
     reported_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
-    warehouse_deadline = db.Column(db.DateTime, nullable=True)  # When item will be sent to warehouse
+    warehouse_deadline = db.Column(db.DateTime, nullable=True, index=True)  # When item will be sent to warehouse
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    minhash = db.deferred(db.Column(db.LargeBinary, nullable=True))  # MinHash signature of the match tokens
+    match_tokens = db.Column(db.Text, nullable=True)  # normalized match tokens, space-separated (see _compute_match_tokens)
+    photo_hashes = db.Column(db.Text, nullable=True)  # 64-bit dHash per photo, hex, space-separated; NULL = not hashed yet
+
+    __table_args__ = (
+        # Serves the keyset-paginated listings: WHERE status = ? ORDER BY created_at DESC, id DESC
+        db.Index('ix_lost_item_status_created_id', 'status', 'created_at', 'id'),
+        # Lets the warehouse sweeper read the earliest open deadline per status from the index
+        db.Index('ix_lost_item_status_deadline', 'status', 'warehouse_deadline'),
+    )
+
+    photo_rows = db.relationship('ItemPhoto', order_by='ItemPhoto.position', cascade='all, delete-orphan')
+
+    @property
+    def photos(self):
+        """Upload names of the item's photos, in display order"""
+        return [photo.storage_key for photo in self.photo_rows]
+
+# Tokenize once at write time; the match scorers read the stored set instead of re-parsing text.
+# Registered before the index listeners below so they already see the new tokens.
+@event.listens_for(LostItem, 'before_insert')
+def _store_match_tokens_on_insert(mapper, connection, target):
+    target.match_tokens = _compute_match_tokens(target)
+
+@event.listens_for(LostItem, 'before_update')
+def _store_match_tokens_on_update(mapper, connection, target):
+    state = db.inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in ('name', 'description', 'location')):
+        target.match_tokens = _compute_match_tokens(target)
+
+# ------------ Item Photo Model ------------
+class ItemPhoto(db.Model):
+    """One row per photo of an item, in display order, with metadata filled in by hash_item_photos()"""
+    item_id = db.Column(db.Integer, db.ForeignKey('lost_item.id'), primary_key=True)  # the PK's prefix serves item lookups
+    position = db.Column(db.SmallInteger, primary_key=True)
+    storage_key = db.Column(db.String(200), nullable=False)  # upload name (see upload_storage)
+    width = db.Column(db.Integer, nullable=True)
+    height = db.Column(db.Integer, nullable=True)
+    hash = db.Column(db.String(16), nullable=True)  # 64-bit dHash, hex
+
+def add_item_photos(item, names):
+    """Append uploaded photos to an item's gallery and keep its cover photo in step"""
+    start = max((photo.position for photo in item.photo_rows), default=-1) + 1
+    for offset, name in enumerate(names):
+        item.photo_rows.append(ItemPhoto(position=start + offset, storage_key=name))
+    if item.photo_rows:
+        item.photo_filename = item.photo_rows[0].storage_key
+
+def load_item_photos(items):
+    """Fill photo_rows for a batch of items with one IN-query instead of a lazy load per item"""
+    ids = [it.id for it in items if it.id is not None]
+    by_item = {}
+    if ids:
+        for photo in ItemPhoto.query.filter(ItemPhoto.item_id.in_(ids)).order_by(ItemPhoto.item_id, ItemPhoto.position):
+            by_item.setdefault(photo.item_id, []).append(photo)
+    for it in items:
+        if it.id is not None:
+            set_committed_value(it, 'photo_rows', by_item.get(it.id, []))
+    return items
+
+def _legacy_photo_names(item):
+    """Photo names from the pre-ItemPhoto photo_filenames/photo_filename columns"""
+    try:
+        data = json.loads(item.photo_filenames) if item.photo_filenames else None
+        if isinstance(data, list):
+            return [p for p in data if isinstance(p, str)]
+    except Exception:
+        pass
+    return [item.photo_filename] if item.photo_filename else []
 
 # ------------ User Model ------------
 class User(db.Model):
@@ -298,6 +565,23 @@ class Notification(db.Model):
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
 
+# ------------ Email Outbox Model ------------
+class EmailOutbox(db.Model):
+    """An email waiting for (or done with) delivery by the outbox worker"""
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    recipients = db.Column(db.Text, nullable=False)  # JSON list of addresses
+    body = db.Column(db.Text, nullable=False)
+    sender = db.Column(db.String(120), nullable=True)  # MAIL_DEFAULT_SENDER when empty
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, sent, dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    __table_args__ = (db.Index('ix_email_outbox_status_next', 'status', 'next_attempt_at'),)
+
 # ------------ Activity Log Model ------------
 class ActivityLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -422,8 +706,891 @@ class Message(db.Model):
     sender_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp(), index=True)
-    # Optional attachment filename stored under static/uploads
+    # Optional attachment upload name (see upload_storage)
     attachment = db.Column(db.String(300), nullable=True)
+    # Sanitized name the attachment was uploaded under (offered again when it's downloaded)
+    attachment_name = db.Column(db.String(300), nullable=True)
+
+# ------------ Stored Upload Model ------------
+class StoredUpload(db.Model):
+    """One row per distinct upload content (SHA-256) in the content-addressed store"""
+    digest = db.Column(db.String(64), primary_key=True)
+    filename = db.Column(db.String(200), nullable=False, unique=True)  # upload name (see upload_storage)
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)  # DB references (item photos, attachments, avatars)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Item photos stop counting as references when their row goes away (with the item on claims/"mark as found")
+@event.listens_for(ItemPhoto, 'after_delete')
+def _release_item_photo_on_delete(mapper, connection, target):
+    release_uploads([target.storage_key], connection=connection)
+
+# ------------ Matching Index Model ------------
+ITEM_TOKEN_MAX_LENGTH = 64
+
+class ItemToken(db.Model):
+    """Inverted index for match suggestions: one row per distinct token of an item"""
+    token = db.Column(db.String(ITEM_TOKEN_MAX_LENGTH), primary_key=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('lost_item.id'), primary_key=True, index=True)
+
+def _item_token_rows(item):
+    return [{'token': t, 'item_id': item.id} for t in {t[:ITEM_TOKEN_MAX_LENGTH] for t in _item_tokens(item)}]
+
+# Keep the inverted index in step with every ORM write to LostItem (create, edit, delete).
+# Status changes need no upkeep: lookups filter on the item's current status.
+@event.listens_for(LostItem, 'after_insert')
+def _index_item_tokens_on_insert(mapper, connection, target):
+    rows = _item_token_rows(target)
+    if rows:
+        connection.execute(ItemToken.__table__.insert(), rows)
+
+@event.listens_for(LostItem, 'after_update')
+def _index_item_tokens_on_update(mapper, connection, target):
+    state = db.inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in ('name', 'description', 'location')):
+        return
+    connection.execute(ItemToken.__table__.delete().where(ItemToken.item_id == target.id))
+    rows = _item_token_rows(target)
+    if rows:
+        connection.execute(ItemToken.__table__.insert(), rows)
+
+@event.listens_for(LostItem, 'after_delete')
+def _index_item_tokens_on_delete(mapper, connection, target):
+    connection.execute(ItemToken.__table__.delete().where(ItemToken.item_id == target.id))
+
+def rebuild_item_token_index():
+    """Re-tokenize every item into ItemToken (backfill for databases created before the index)"""
+    ItemToken.query.delete()
+    rows = []
+    for item in LostItem.query.with_entities(LostItem.id, LostItem.name, LostItem.description, LostItem.location, LostItem.match_tokens).yield_per(1000):
+        rows.extend(_item_token_rows(item))
+        if len(rows) >= 5000:
+            db.session.execute(ItemToken.__table__.insert(), rows)
+            rows = []
+    if rows:
+        db.session.execute(ItemToken.__table__.insert(), rows)
+    db.session.commit()
+
+# ------------ Item Match Model ------------
+# Pairs kept in each item's own list (its best matches from the opposite side)
+ITEM_MATCH_PER_ITEM = 10
+MATCH_OPPOSITE_STATUS = {'lost': 'found', 'found': 'lost'}
+
+class ItemMatch(db.Model):
+    """Precomputed lost/found match suggestion.
+
+    Every open item owns a list of its best ITEM_MATCH_PER_ITEM pairs; `side` says whose list
+    the row is in ('lost': lost_id's, 'found': found_id's), so the same pair can be stored twice.
+    """
+    lost_id = db.Column(db.Integer, db.ForeignKey('lost_item.id'), primary_key=True)
+    found_id = db.Column(db.Integer, db.ForeignKey('lost_item.id'), primary_key=True)
+    side = db.Column(db.String(5), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_item_match_lost_score', 'side', 'lost_id', 'score'),
+        db.Index('ix_item_match_found_score', 'side', 'found_id', 'score'),
+    )
+
+class MatchNotice(db.Model):
+    """Lost/found pairs whose owners were already told about the match (dedupes fan-out)"""
+    lost_id = db.Column(db.Integer, db.ForeignKey('lost_item.id'), primary_key=True)
+    found_id = db.Column(db.Integer, db.ForeignKey('lost_item.id'), primary_key=True)
+    notified_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+def _match_list_columns(side):
+    """(owner, other) columns of the lists kept by `side` items"""
+    if side == 'lost':
+        return ItemMatch.lost_id, ItemMatch.found_id
+    return ItemMatch.found_id, ItemMatch.lost_id
+
+def _item_match_row(item, other, score, side, now):
+    lost, found = (item, other) if item.status == 'lost' else (other, item)
+    return {'lost_id': lost.id, 'found_id': found.id, 'side': side, 'score': score, 'computed_at': now}
+
+def _drop_item_match_rows(item_ids):
+    """Delete every stored pair touching the given items (runs in the caller's transaction).
+
+    Returns {side: owner ids} of the other items whose lists lost a pair.
+    """
+    item_ids = list(item_ids)
+    losers = {side: set() for side in MATCH_OPPOSITE_STATUS}
+    if not item_ids:
+        return losers
+    dropped = db.session.execute(ItemMatch.__table__.delete().where(
+        or_(ItemMatch.lost_id.in_(item_ids), ItemMatch.found_id.in_(item_ids))
+    ).returning(ItemMatch.lost_id, ItemMatch.found_id, ItemMatch.side)).all()
+    for lost_id, found_id, side in dropped:
+        losers[side].add(lost_id if side == 'lost' else found_id)
+    for owners in losers.values():
+        owners.difference_update(item_ids)
+    return losers
+
+def _trim_item_match_lists(side, owner_ids):
+    """Keep only the best ITEM_MATCH_PER_ITEM rows of each given list"""
+    owner_ids = list(owner_ids)
+    if not owner_ids:
+        return
+    owner, other = _match_list_columns(side)
+    ranked = db.select(
+        ItemMatch.lost_id, ItemMatch.found_id,
+        db.func.row_number().over(partition_by=owner, order_by=(ItemMatch.score.desc(), other.desc())).label('rank')
+    ).where(ItemMatch.side == side, owner.in_(owner_ids)).subquery()
+    db.session.execute(ItemMatch.__table__.delete().where(
+        ItemMatch.side == side,
+        tuple_(ItemMatch.lost_id, ItemMatch.found_id).in_(
+            db.select(ranked.c.lost_id, ranked.c.found_id).where(ranked.c.rank > ITEM_MATCH_PER_ITEM)
+        )
+    ))
+
+def _store_item_matches(item, matches):
+    """Write `item`'s own list (on top of whatever it holds; callers drop or trim it)"""
+    now = datetime.utcnow()
+    rows = [_item_match_row(item, other, score, item.status, now) for other, score in matches]
+    if rows:
+        db.session.execute(ItemMatch.__table__.insert().prefix_with('OR REPLACE'), rows)
+
+def _offer_item_matches(item, candidates):
+    """Enter `item` into the lists of its candidates where it ranks in their top ITEM_MATCH_PER_ITEM.
+
+    Scores are symmetric, so the candidate's score is also what that item would give `item`.
+    Returns the ids of the candidates whose lists now hold the pair.
+    """
+    if not candidates:
+        return set()
+    side = MATCH_OPPOSITE_STATUS[item.status]
+    now = datetime.utcnow()
+    db.session.execute(
+        ItemMatch.__table__.insert().prefix_with('OR REPLACE'),
+        [_item_match_row(item, other, score, side, now) for other, score in candidates]
+    )
+    owner_ids = [other.id for other, _ in candidates]
+    _trim_item_match_lists(side, owner_ids)
+    owner, other = _match_list_columns(side)
+    return {row[0] for row in db.session.execute(
+        db.select(owner).where(ItemMatch.side == side, owner.in_(owner_ids), other == item.id)
+    )}
+
+def _refill_item_matches(losers):
+    """Recompute the lists that lost a pair, so their next-best candidates move up"""
+    owner_ids = set().union(*losers.values())
+    if not owner_ids:
+        return
+    owners = LostItem.query.filter(LostItem.id.in_(list(owner_ids)), LostItem.status.in_(list(MATCH_OPPOSITE_STATUS)))
+    for item in owners.all():
+        if item.id not in losers[item.status]:
+            continue
+        owner, _ = _match_list_columns(item.status)
+        db.session.execute(ItemMatch.__table__.delete().where(ItemMatch.side == item.status, owner == item.id))
+        _store_item_matches(item, find_item_matches(item, MATCH_OPPOSITE_STATUS[item.status], limit=ITEM_MATCH_PER_ITEM))
+
+def refresh_items_matches(items, commit=True):
+    """Recompute the stored matches of items that were created, edited or changed status.
+
+    Candidates are scored for the whole batch first; then every pair touching the batch is
+    dropped once, and each open item stores its best ITEM_MATCH_PER_ITEM candidates as its own
+    list and enters the lists of its MATCH_CANDIDATE_LIMIT best candidates. Other items whose
+    lists lost a pair they didn't get back are recomputed. Returns {item_id: [(other, score)]}.
+    """
+    candidates = {}
+    for item in items:
+        opposite = MATCH_OPPOSITE_STATUS.get(item.status)
+        candidates[item.id] = find_item_matches(item, opposite, limit=MATCH_CANDIDATE_LIMIT) if opposite else []
+    losers = _drop_item_match_rows(list(candidates))
+    for item in items:
+        if not candidates[item.id]:
+            continue
+        _store_item_matches(item, candidates[item.id][:ITEM_MATCH_PER_ITEM])
+        # Batch items can already have entered each other's lists
+        _trim_item_match_lists(item.status, [item.id])
+        losers[MATCH_OPPOSITE_STATUS[item.status]] -= _offer_item_matches(item, candidates[item.id])
+    _refill_item_matches(losers)
+    if commit:
+        db.session.commit()
+    return {item_id: found[:ITEM_MATCH_PER_ITEM] for item_id, found in candidates.items()}
+
+def refresh_item_matches(item, commit=True):
+    """refresh_items_matches for one item; returns its own list [(other, score)]"""
+    return refresh_items_matches([item], commit=commit)[item.id]
+
+def drop_item_matches(item_ids):
+    """Forget the pairs of items that stopped being matchable (runs in the caller's transaction)"""
+    _refill_item_matches(_drop_item_match_rows(item_ids))
+
+def rebuild_item_matches():
+    """Recompute every stored pair from scratch (backfill / nightly repair)"""
+    db.session.execute(db.delete(ItemMatch))
+    if item_match_engine is not None:
+        now = datetime.utcnow()
+        rows = [
+            {'lost_id': lost_id, 'found_id': found_id, 'side': side, 'score': score, 'computed_at': now}
+            for (lost_id, found_id, side), score in item_match_engine.all_pairs_top_k(ITEM_MATCH_PER_ITEM).items()
+        ]
+        for start in range(0, len(rows), 5000):
+            db.session.execute(db.insert(ItemMatch), rows[start:start + 5000])
+        db.session.commit()
+        return
+    for item in LostItem.query.filter(LostItem.status.in_(list(MATCH_OPPOSITE_STATUS))).yield_per(500):
+        _store_item_matches(item, find_item_matches(item, MATCH_OPPOSITE_STATUS[item.status], limit=ITEM_MATCH_PER_ITEM))
+    db.session.commit()
+
+# Hard deletes (claims, "mark as found") take their pairs with them
+@event.listens_for(LostItem, 'after_delete')
+def _drop_item_matches_on_delete(mapper, connection, target):
+    connection.execute(ItemMatch.__table__.delete().where(
+        or_(ItemMatch.lost_id == target.id, ItemMatch.found_id == target.id)
+    ))
+    connection.execute(MatchNotice.__table__.delete().where(
+        or_(MatchNotice.lost_id == target.id, MatchNotice.found_id == target.id)
+    ))
+
+# ------------ MinHash / LSH Match Index ------------
+# MinHash signatures over the same token sets as _match_score; the LSH banding index turns
+# "Jaccard >= MATCH_LSH_THRESHOLD" into a handful of indexed bucket lookups per item.
+# Signatures and banding come from minhash.py, which bench_matching.py shares.
+LSH_BANDS, LSH_ROWS = lsh_band_shape(app.config['MATCH_LSH_THRESHOLD'])
+
+def _lsh_buckets(signature):
+    """[(band, bucket)] keys of a signature under this app's MATCH_LSH_THRESHOLD banding"""
+    return lsh_buckets(signature, LSH_BANDS, LSH_ROWS)
+
+class ItemLshBand(db.Model):
+    """LSH banding index: items landing in the same (band, bucket) are match candidates"""
+    band = db.Column(db.SmallInteger, primary_key=True)
+    bucket = db.Column(db.BigInteger, primary_key=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('lost_item.id'), primary_key=True, index=True)
+
+def _item_lsh_rows(item_id, signature):
+    return [{'band': band, 'bucket': bucket, 'item_id': item_id} for band, bucket in _lsh_buckets(signature)]
+
+@event.listens_for(LostItem, 'before_insert')
+def _sign_item_on_insert(mapper, connection, target):
+    target.minhash = pack_minhash(minhash_signature(_item_tokens(target)))
+
+@event.listens_for(LostItem, 'before_update')
+def _sign_item_on_update(mapper, connection, target):
+    state = db.inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in ('name', 'description', 'location')):
+        target.minhash = pack_minhash(minhash_signature(_item_tokens(target)))
+
+@event.listens_for(LostItem, 'after_insert')
+def _index_item_lsh_on_insert(mapper, connection, target):
+    rows = _item_lsh_rows(target.id, unpack_minhash(target.minhash))
+    if rows:
+        connection.execute(ItemLshBand.__table__.insert(), rows)
+
+@event.listens_for(LostItem, 'after_update')
+def _index_item_lsh_on_update(mapper, connection, target):
+    if not db.inspect(target).attrs.minhash.history.has_changes():
+        return
+    connection.execute(ItemLshBand.__table__.delete().where(ItemLshBand.item_id == target.id))
+    rows = _item_lsh_rows(target.id, unpack_minhash(target.minhash))
+    if rows:
+        connection.execute(ItemLshBand.__table__.insert(), rows)
+
+@event.listens_for(LostItem, 'after_delete')
+def _index_item_lsh_on_delete(mapper, connection, target):
+    connection.execute(ItemLshBand.__table__.delete().where(ItemLshBand.item_id == target.id))
+
+def rebuild_item_lsh_index():
+    """Recompute every signature and re-band them (backfill, or after changing MATCH_LSH_THRESHOLD)"""
+    db.session.execute(db.delete(ItemLshBand))
+    signatures, bands = [], []
+
+    def flush():
+        if signatures:
+            db.session.execute(db.update(LostItem), signatures)
+        if bands:
+            db.session.execute(ItemLshBand.__table__.insert(), bands)
+        signatures.clear()
+        bands.clear()
+
+    for item in LostItem.query.with_entities(LostItem.id, LostItem.name, LostItem.description, LostItem.location, LostItem.match_tokens).yield_per(1000):
+        signature = minhash_signature(_item_tokens(item))
+        signatures.append({'id': item.id, 'minhash': pack_minhash(signature)})
+        bands.extend(_item_lsh_rows(item.id, signature))
+        if len(signatures) >= 1000:
+            flush()
+    flush()
+    db.session.commit()
+
+def lsh_candidate_ids(item, status, limit):
+    """Ids of open `status` items whose estimated Jaccard with `item` reaches the LSH threshold"""
+    signature = minhash_signature(_item_tokens(item))
+    buckets = _lsh_buckets(signature)
+    if not buckets:
+        return []
+    hits = db.func.count(ItemLshBand.band).label('hits')
+    query = db.session.query(ItemLshBand.item_id, hits, LostItem.minhash)\
+        .join(LostItem, LostItem.id == ItemLshBand.item_id)\
+        .filter(tuple_(ItemLshBand.band, ItemLshBand.bucket).in_(buckets),
+                db.func.likely(LostItem.status == status))
+    if item.id is not None:
+        query = query.filter(ItemLshBand.item_id != item.id)
+    rows = query.group_by(ItemLshBand.item_id).order_by(hits.desc(), ItemLshBand.item_id.desc()).all()
+    # Drop bucket collisions below the threshold using the stored signatures
+    estimated = [(minhash_similarity(signature, unpack_minhash(row.minhash)), row.item_id) for row in rows]
+    estimated = [pair for pair in estimated if pair[0] >= app.config['MATCH_LSH_THRESHOLD']]
+    estimated.sort(reverse=True)
+    return [item_id for _, item_id in estimated[:limit]]
+
+# ------------ Photo Hash Index ------------
+# 64-bit dHash per uploaded photo, stored on the item; near-duplicate pictures (re-uploads,
+# resized copies) are found by multi-index hashing: the hash is cut into
+# PHOTO_HASH_MAX_DISTANCE + 1 chunks, so any hash within that Hamming distance shares at
+# least one chunk exactly and can be looked up by (band, chunk) equality.
+PHOTO_HASH_MAX_DISTANCE = 5
+PHOTO_MATCH_BONUS = 0.5  # added at distance 0, shrinking linearly to 0 past PHOTO_HASH_MAX_DISTANCE
+PHOTO_HASH_BANDS = [
+    (64 * band // (PHOTO_HASH_MAX_DISTANCE + 1), 64 * (band + 1) // (PHOTO_HASH_MAX_DISTANCE + 1))
+    for band in range(PHOTO_HASH_MAX_DISTANCE + 1)
+]
+photo_pool = ThreadPoolExecutor(max_workers=app.config['PHOTO_WORKERS'], thread_name_prefix='photo-worker')
+
+def photo_metadata(name):
+    """(64-bit difference hash, width, height) of an uploaded image (None if it can't be read)"""
+    if Image is None:
+        return None
+    try:
+        with upload_storage.open(name) as src, Image.open(src) as img:
+            width, height = img.size
+            if img.getexif().get(0x0112, 1) in (5, 6, 7, 8):  # EXIF orientation turns it by 90 degrees
+                width, height = height, width
+            img.draft('L', (64, 64))  # let JPEG decoding downscale early
+            pixels = list(img.convert('L').resize((9, 8), Image.Resampling.LANCZOS).getdata())
+    except Exception as e:
+        print(f"Photo hash skipped for {name}: {e}")
+        return None
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value, width, height
+
+def _parse_photo_hashes(stored):
+    return [int(h, 16) for h in (stored or '').split()]
+
+def _photo_hash_chunks(value):
+    return [(band, (value >> (64 - end)) & ((1 << (end - start)) - 1)) for band, (start, end) in enumerate(PHOTO_HASH_BANDS)]
+
+class PhotoHashBand(db.Model):
+    """Multi-index hashing table: one row per (band, chunk value) of each item's photo hashes"""
+    band = db.Column(db.SmallInteger, primary_key=True)
+    chunk = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('lost_item.id'), primary_key=True, index=True)
+
+def _photo_hash_rows(item_id, stored):
+    keys = {key for value in _parse_photo_hashes(stored) for key in _photo_hash_chunks(value)}
+    return [{'band': band, 'chunk': chunk, 'item_id': item_id} for band, chunk in keys]
+
+@event.listens_for(LostItem, 'after_update')
+def _index_photo_hashes_on_update(mapper, connection, target):
+    if not db.inspect(target).attrs.photo_hashes.history.has_changes():
+        return
+    connection.execute(PhotoHashBand.__table__.delete().where(PhotoHashBand.item_id == target.id))
+    rows = _photo_hash_rows(target.id, target.photo_hashes)
+    if rows:
+        connection.execute(PhotoHashBand.__table__.insert(), rows)
+
+@event.listens_for(LostItem, 'after_delete')
+def _index_photo_hashes_on_delete(mapper, connection, target):
+    connection.execute(PhotoHashBand.__table__.delete().where(PhotoHashBand.item_id == target.id))
+
+def hash_item_photos(item_id, refresh_matches=True):
+    """Hash every photo of an item, store the hashes and refresh its stored matches"""
+    item = db.session.get(LostItem, item_id)
+    if not item:
+        return None
+    for photo in item.photo_rows:
+        meta = photo_metadata(photo.storage_key)
+        if meta:
+            value, photo.width, photo.height = meta
+            photo.hash = f"{value:016x}"
+    # '' marks "hashed, nothing usable" so the backfill doesn't retry it
+    item.photo_hashes = ' '.join(dict.fromkeys(photo.hash for photo in item.photo_rows if photo.hash))
+    db.session.commit()
+    if item.photo_hashes and refresh_matches:
+        refresh_item_matches(item)
+    return item.photo_hashes
+
+def _run_photo_hashing(item_id, fan_out=False):
+    with app.app_context():
+        try:
+            hash_item_photos(item_id, refresh_matches=not fan_out)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Photo hashing failed for item {item_id}: {e}")
+        finally:
+            db.session.remove()
+    if fan_out:
+        # The fan-out refreshes the stored matches, now including photo-only ones
+        with app.test_request_context('/'):
+            try:
+                enqueue_match_fanout(item_id)
+            finally:
+                db.session.remove()
+
+def enqueue_photo_hashing(item_id, fan_out=False):
+    """Hash an item's photos on the worker pool so the upload request returns immediately.
+
+    With `fan_out` the new-post match notifications are queued once the hashes are stored.
+    Returns None (and does nothing) without Pillow.
+    """
+    if Image is None:
+        return None
+    return photo_pool.submit(_run_photo_hashing, item_id, fan_out)
+
+def photo_similar_items(item, status):
+    """{item_id: Hamming distance} of open `status` items with a photo near one of `item`'s"""
+    own = _parse_photo_hashes(getattr(item, 'photo_hashes', None))
+    if not own:
+        return {}
+    keys = {key for value in own for key in _photo_hash_chunks(value)}
+    query = db.session.query(LostItem.id, LostItem.photo_hashes)\
+        .join(PhotoHashBand, PhotoHashBand.item_id == LostItem.id)\
+        .filter(tuple_(PhotoHashBand.band, PhotoHashBand.chunk).in_(keys), LostItem.status == status)
+    if item.id is not None:
+        query = query.filter(LostItem.id != item.id)
+    distances = {}
+    for item_id, stored in query.distinct().all():
+        best = min(bin(a ^ b).count("1") for a in own for b in _parse_photo_hashes(stored))
+        if best <= PHOTO_HASH_MAX_DISTANCE:
+            distances[item_id] = best
+    return distances
+
+def _photo_match_bonus(distance):
+    return PHOTO_MATCH_BONUS * (1.0 - distance / (PHOTO_HASH_MAX_DISTANCE + 1))
+
+# ------------ Photo Thumbnails ------------
+# Fixed-width WebP variants of every uploaded image, stored alongside the uploads as
+# thumbs/<width>/<upload name>.webp; templates offer them through srcset and keep the
+# original as src, so a photo whose variants aren't ready yet still renders.
+# Posters get their own variant, thumbs/poster/<upload name>.jpg: sized for the poster's
+# photo frame and JPEG so ReportLab embeds the bytes as they are instead of re-encoding.
+THUMBNAIL_WIDTHS = (160, 480, 1024)
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+POSTER_IMAGE_BOX = (1032, 450)  # the poster's 6.9 x 3 inch photo frame at 150 dpi
+POSTER_IMAGE_QUALITY = 75
+THUMBNAIL_MISSING_TTL = 60  # seconds a "no thumbnails yet" answer is reused before asking storage again
+THUMBNAIL_MISSING_MAX = 4096  # remembered misses before expired ones are dropped
+_thumbnails_ready = set()
+_thumbnails_missing = {}  # upload name -> time.monotonic() of the last miss
+_poster_images_ready = set()
+
+def _thumbnail_name(filename, width):
+    return f"thumbs/{width}/{filename}.webp"
+
+def _poster_image_name(filename):
+    return f"thumbs/poster/{filename}.jpg"
+
+def _upload_variant_names(filename):
+    """Every file derived from an upload: its thumbnails and its poster image"""
+    return [_thumbnail_name(filename, width) for width in THUMBNAIL_WIDTHS] + [_poster_image_name(filename)]
+
+def _is_thumbnail_source(filename):
+    return bool(filename) and '.' in filename and filename.rsplit('.', 1)[1].lower() in THUMBNAIL_IMAGE_EXTENSIONS
+
+def generate_thumbnails(filename, force=False):
+    """Write the THUMBNAIL_WIDTHS variants of one upload; returns how many were written"""
+    if Image is None or not _is_thumbnail_source(filename):
+        return 0
+    written = 0
+    try:
+        with upload_storage.open(filename) as src, Image.open(src) as img:
+            img.draft('RGB', (max(THUMBNAIL_WIDTHS + POSTER_IMAGE_BOX),) * 2)
+            img = ImageOps.exif_transpose(img)
+            img = img.convert('RGBA' if img.mode in ('RGBA', 'LA', 'P') else 'RGB')
+            written += _write_poster_image(filename, img, force)
+            # Largest first, each variant downscaled from the previous one
+            for width in sorted(THUMBNAIL_WIDTHS, reverse=True):
+                target = _thumbnail_name(filename, width)
+                if img.width > width:
+                    img = img.resize((width, max(1, round(img.height * width / img.width))), Image.Resampling.LANCZOS)
+                if not force and upload_storage.exists(target):
+                    continue
+                fd, staged = staging_file(suffix='.webp')
+                with os.fdopen(fd, 'wb') as out:
+                    img.save(out, 'WEBP', quality=THUMBNAIL_QUALITY, method=4)
+                upload_storage.put_file(staged, target)
+                written += 1
+    except Exception as e:
+        print(f"Thumbnail generation skipped for {filename}: {e}")
+        return written
+    _thumbnails_ready.add(filename)
+    _thumbnails_missing.pop(filename, None)
+    return written
+
+def _write_poster_image(filename, img, force=False):
+    target = _poster_image_name(filename)
+    if not force and (filename in _poster_images_ready or upload_storage.exists(target)):
+        _poster_images_ready.add(filename)
+        return 0
+    poster = img.copy()
+    poster.thumbnail(POSTER_IMAGE_BOX, Image.Resampling.LANCZOS)
+    if poster.mode == 'RGBA':
+        # JPEG has no alpha; posters print on white
+        flat = Image.new('RGB', poster.size, (255, 255, 255))
+        flat.paste(poster, mask=poster.getchannel('A'))
+        poster = flat
+    fd, staged = staging_file(suffix='.jpg')
+    with os.fdopen(fd, 'wb') as out:
+        poster.save(out, 'JPEG', quality=POSTER_IMAGE_QUALITY, optimize=True)
+    upload_storage.put_file(staged, target)
+    _poster_images_ready.add(filename)
+    return 1
+
+def poster_image(filename):
+    """Name of the poster-sized variant of an upload, made now if missing (None if it can't be)"""
+    if Image is None or not _is_thumbnail_source(filename):
+        return None
+    if filename in _poster_images_ready or upload_storage.exists(_poster_image_name(filename)):
+        _poster_images_ready.add(filename)
+        return _poster_image_name(filename)
+    try:
+        with upload_storage.open(filename) as src, Image.open(src) as img:
+            img.draft('RGB', POSTER_IMAGE_BOX)
+            img = ImageOps.exif_transpose(img)
+            img = img.convert('RGBA' if img.mode in ('RGBA', 'LA', 'P') else 'RGB')
+            _write_poster_image(filename, img, force=True)
+    except Exception as e:
+        print(f"Poster image skipped for {filename}: {e}")
+        return None
+    return _poster_image_name(filename)
+
+def enqueue_thumbnails(filenames):
+    """Generate thumbnails for freshly saved uploads on the photo worker pool"""
+    if Image is None:
+        return []
+    return [photo_pool.submit(generate_thumbnails, name) for name in filenames if _is_thumbnail_source(name)]
+
+def _thumbnails_exist(filename):
+    # Both answers are cached so listings don't ask storage about every photo on every
+    # render; a miss only for THUMBNAIL_MISSING_TTL, since another process may be writing them
+    if filename in _thumbnails_ready:
+        return True
+    missed_at = _thumbnails_missing.get(filename)
+    if missed_at is not None and time.monotonic() - missed_at < THUMBNAIL_MISSING_TTL:
+        return False
+    smallest = _thumbnail_name(filename, min(THUMBNAIL_WIDTHS))
+    largest = _thumbnail_name(filename, max(THUMBNAIL_WIDTHS))
+    try:
+        ready = upload_storage.exists(smallest) and upload_storage.exists(largest)
+    except Exception as e:
+        # e.g. S3 answering 403: render the original without a srcset rather than fail the page
+        print(f"Thumbnail check failed for {filename}: {e}")
+        ready = False
+    if ready:
+        _thumbnails_ready.add(filename)
+        _thumbnails_missing.pop(filename, None)
+        return True
+    if len(_thumbnails_missing) >= THUMBNAIL_MISSING_MAX:
+        now = time.monotonic()
+        for name, checked_at in list(_thumbnails_missing.items()):
+            if now - checked_at >= THUMBNAIL_MISSING_TTL:
+                _thumbnails_missing.pop(name, None)
+    _thumbnails_missing[filename] = time.monotonic()
+    return False
+
+def photo_srcset(filename):
+    """srcset value for an upload ('' until its thumbnails have been generated)"""
+    if not _is_thumbnail_source(filename) or not _thumbnails_exist(filename):
+        return ''
+    return ', '.join(
+        f"{upload_url(_thumbnail_name(filename, width))} {width}w"
+        for width in THUMBNAIL_WIDTHS
+    )
+
+@app.template_global()
+def photo_srcset_attrs(filename, sizes):
+    """` srcset="..." sizes="..."` for an <img> showing an upload, or nothing if not ready"""
+    srcset = photo_srcset(filename)
+    if not srcset:
+        return ''
+    return Markup(' srcset="{}" sizes="{}"').format(srcset, sizes)
+
+# ------------ TF-IDF Match Engine ------------
+# Status codes used inside the engine's row arrays (0 = row retired)
+MATCH_ENGINE_STATUS_CODES = {'lost': 1, 'found': 2}
+
+class TfidfMatchEngine:
+    """Sparse TF-IDF matrix over open lost/found items.
+
+    One sparse matrix-vector product scores an item against every open item; the value and
+    location bonuses of _match_score are applied as array operations on the result. Committed
+    changes are picked up incrementally (session events / mark_dirty). The whole matrix is
+    rebuilt from the database every `max_age` seconds to absorb other processes' writes, and
+    to compact retired rows, by the warehouse scheduler thread (rebuild_if_stale) so lookups
+    never wait for it; without that thread (scheduled=False) lookups rebuild it themselves.
+    """
+
+    # Everything rebuild() replaces
+    _MATRIX_FIELDS = ('vocab', 'location_codes', 'matrix', 'item_ids', 'status', 'values', 'locations', 'df', 'row_of', '_norm_cache')
+
+    def __init__(self, max_age):
+        self.max_age = max_age
+        self.lock = threading.RLock()
+        self.build_lock = threading.Lock()
+        self.pending = set()
+        self.changed_during_build = None
+        self.built_at = None
+        self.scheduled = False
+        self._reset()
+
+    def _reset(self):
+        self.vocab = {}
+        self.location_codes = {}
+        self.matrix = sparse.csr_matrix((0, 0), dtype=np.float64)
+        self.item_ids = np.zeros(0, dtype=np.int64)
+        self.status = np.zeros(0, dtype=np.int8)
+        self.values = np.zeros(0, dtype=np.float64)
+        self.locations = np.zeros(0, dtype=np.int64)
+        self.df = np.zeros(0, dtype=np.float64)
+        self.row_of = {}
+        self._norm_cache = None
+
+    def mark_dirty(self, item_ids):
+        with self.lock:
+            self.pending.update(item_ids)
+            if self.changed_during_build is not None:
+                self.changed_during_build.update(item_ids)
+
+    @staticmethod
+    def _value(item):
+        try:
+            value = getattr(item, 'value', None)
+            return float(value) if value is not None else np.nan
+        except (TypeError, ValueError):
+            return np.nan
+
+    def _location_code(self, item, add=True):
+        loc = (getattr(item, 'location', None) or '').strip().lower()
+        if not loc:
+            return -1
+        if add:
+            return self.location_codes.setdefault(loc, len(self.location_codes))
+        return self.location_codes.get(loc, -2)
+
+    def _append(self, items):
+        """Add rows for open items; vocabulary and document frequencies grow as needed."""
+        if not items:
+            return
+        indptr, indices = [0], []
+        for item in items:
+            for token in _item_tokens(item):
+                indices.append(self.vocab.setdefault(token, len(self.vocab)))
+            indptr.append(len(indices))
+        n_cols = len(self.vocab)
+        new_rows = sparse.csr_matrix(
+            (np.ones(len(indices)), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+            shape=(len(items), n_cols)
+        )
+        self.matrix.resize((self.matrix.shape[0], n_cols))
+        first_row = self.matrix.shape[0]
+        self.matrix = sparse.vstack([self.matrix, new_rows], format='csr')
+        self.df = np.concatenate([self.df, np.zeros(n_cols - len(self.df))]) + np.asarray(new_rows.sum(axis=0)).ravel()
+        self.item_ids = np.concatenate([self.item_ids, [item.id for item in items]]).astype(np.int64)
+        self.status = np.concatenate([self.status, [MATCH_ENGINE_STATUS_CODES[item.status] for item in items]]).astype(np.int8)
+        self.values = np.concatenate([self.values, [self._value(item) for item in items]])
+        self.locations = np.concatenate([self.locations, [self._location_code(item) for item in items]]).astype(np.int64)
+        for offset, item in enumerate(items):
+            self.row_of[item.id] = first_row + offset
+        self._norm_cache = None
+
+    def _retire(self, item_id):
+        row = self.row_of.pop(item_id, None)
+        if row is None:
+            return
+        self.status[row] = 0
+        start, end = self.matrix.indptr[row], self.matrix.indptr[row + 1]
+        self.df[self.matrix.indices[start:end]] -= 1
+        self._norm_cache = None
+
+    @staticmethod
+    def _open_items_query():
+        return db.session.query(
+            LostItem.id, LostItem.name, LostItem.description, LostItem.location, LostItem.value, LostItem.status,
+            LostItem.match_tokens
+        ).filter(LostItem.status.in_(list(MATCH_ENGINE_STATUS_CODES)))
+
+    def rebuild(self):
+        """Reload every open item. The new matrix is built without holding `lock`, so lookups
+        keep using the old one meanwhile; changes marked during the build are re-read into
+        the new matrix on the next lookup."""
+        with self.build_lock:
+            with self.lock:
+                self.changed_during_build = set()
+            try:
+                fresh = TfidfMatchEngine(self.max_age)
+                fresh._append(self._open_items_query().all())
+            except Exception:
+                with self.lock:
+                    self.changed_during_build = None
+                raise
+            with self.lock:
+                for name in self._MATRIX_FIELDS:
+                    setattr(self, name, getattr(fresh, name))
+                self.pending, self.changed_during_build = self.changed_during_build, None
+                self.built_at = time.monotonic()
+
+    def is_stale(self):
+        """Due for a periodic reload, or retired rows dominate the matrix"""
+        with self.lock:
+            if self.built_at is None:
+                return False  # the first lookup builds it
+            return time.monotonic() - self.built_at >= self.max_age or len(self.row_of) * 2 < self.matrix.shape[0]
+
+    def rebuild_if_stale(self):
+        if self.is_stale():
+            self.rebuild()
+            return True
+        return False
+
+    def _ensure_built(self):
+        # Called without `lock` held: rebuild() takes build_lock first, then lock
+        if self.built_at is None or (not self.scheduled and self.is_stale()):
+            self.rebuild()
+
+    def _sync(self):
+        if not self.pending:
+            return
+        item_ids, self.pending = list(self.pending), set()
+        for item_id in item_ids:
+            self._retire(item_id)
+        self._append(self._open_items_query().filter(LostItem.id.in_(item_ids)).all())
+
+    def _idf(self):
+        n_open = max(1, len(self.row_of))
+        return np.log((1.0 + n_open) / (1.0 + self.df)) + 1.0
+
+    def _row_norms(self, idf):
+        if self._norm_cache is None:
+            self._norm_cache = np.sqrt(self.matrix @ (idf ** 2))
+        return self._norm_cache
+
+    def _bonuses(self, values_a, values_b, locs_a, locs_b):
+        """Value-proximity and same-location bonuses, broadcast like _match_score"""
+        with np.errstate(invalid='ignore'):
+            base = np.maximum(1.0, np.maximum(values_a, values_b))
+            value_bonus = np.clip(0.2 - np.abs(values_a - values_b) / base, 0.0, None)
+        value_bonus = np.nan_to_num(value_bonus, nan=0.0)
+        loc_bonus = np.where((locs_a == locs_b) & (locs_a >= 0), 0.1, 0.0)
+        return value_bonus + loc_bonus
+
+    def score(self, item, status):
+        """(item_ids, scores) of open `status` items sharing at least one token with `item`."""
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0))
+        self._ensure_built()
+        with self.lock:
+            self._sync()
+            code = MATCH_ENGINE_STATUS_CODES.get(status)
+            tokens = _item_tokens(item)
+            if code is None or not tokens or not self.row_of:
+                return empty
+            idf = self._idf()
+            known = [self.vocab[t] for t in tokens if t in self.vocab]
+            unseen_idf = np.log(1.0 + len(self.row_of)) + 1.0
+            query_norm = np.sqrt(np.sum(idf[known] ** 2) + (len(tokens) - len(known)) * unseen_idf ** 2)
+            if not known:
+                return empty
+            query = np.zeros(len(self.vocab))
+            query[known] = idf[known] ** 2
+            dot = self.matrix @ query
+            mask = (self.status == code) & (dot > 0)
+            if item.id is not None:
+                mask &= self.item_ids != item.id
+            rows = np.flatnonzero(mask)
+            norms = self._row_norms(idf)[rows]
+            scores = dot[rows] / (norms * query_norm)
+            scores += self._bonuses(self._value(item), self.values[rows], self._location_code(item, add=False), self.locations[rows])
+            return self.item_ids[rows], scores
+
+    def top(self, item, status, k):
+        item_ids, scores = self.score(item, status)
+        if len(scores) > k:
+            keep = np.argpartition(-scores, k - 1)[:k]
+            item_ids, scores = item_ids[keep], scores[keep]
+        order = np.lexsort((-item_ids, -scores))
+        return [(int(item_ids[i]), float(scores[i])) for i in order]
+
+    def all_pairs_top_k(self, k, block_cells=2_000_000):
+        """Best k opposite-side matches for every open item, as {(lost_id, found_id, side): score}.
+
+        Bulk mode for the nightly rebuild: blocks of rows are scored against the whole
+        opposite side with one sparse matrix product each.
+        """
+        self.rebuild()
+        with self.lock:
+            self._sync()
+            pairs = {}
+            if not self.row_of:
+                return pairs
+            idf = self._idf()
+            norms = self._row_norms(idf)
+            inv_norms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+            weighted = sparse.diags(inv_norms) @ self.matrix @ sparse.diags(idf)
+            weighted = weighted.tocsr()
+            for side, other_side in (('lost', 'found'), ('found', 'lost')):
+                rows_a = np.flatnonzero(self.status == MATCH_ENGINE_STATUS_CODES[side])
+                rows_b = np.flatnonzero(self.status == MATCH_ENGINE_STATUS_CODES[other_side])
+                if not len(rows_a) or not len(rows_b):
+                    continue
+                other_t = weighted[rows_b].T.tocsc()
+                block = max(1, block_cells // len(rows_b))
+                for start in range(0, len(rows_a), block):
+                    chunk = rows_a[start:start + block]
+                    cosine = (weighted[chunk] @ other_t).toarray()
+                    shared = cosine > 0
+                    scores = cosine + self._bonuses(
+                        self.values[chunk][:, None], self.values[rows_b][None, :],
+                        self.locations[chunk][:, None], self.locations[rows_b][None, :]
+                    )
+                    scores = np.where(shared, scores, -np.inf)
+                    kk = min(k, len(rows_b))
+                    best = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+                    for i, row in enumerate(chunk):
+                        for j in best[i]:
+                            if not shared[i, j]:
+                                continue
+                            a_id, b_id = int(self.item_ids[row]), int(self.item_ids[rows_b[j]])
+                            key = (a_id, b_id, side) if side == 'lost' else (b_id, a_id, side)
+                            pairs[key] = float(scores[i, j])
+            return pairs
+
+item_match_engine = TfidfMatchEngine(app.config['MATCH_ENGINE_REBUILD_INTERVAL']) if sparse is not None else None
+
+# Feed item changes to the engine; it re-reads them from the DB on its next lookup. Ids are
+# collected on the session while flushing and handed over after the commit, so no lookup
+# (or background rebuild) reads a change that could still be rolled back.
+def _collect_item_for_match_engine(target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('match_engine_dirty', set()).add(target.id)
+
+@event.listens_for(LostItem, 'after_insert')
+@event.listens_for(LostItem, 'after_delete')
+def _mark_item_for_match_engine(mapper, connection, target):
+    if item_match_engine is not None:
+        _collect_item_for_match_engine(target)
+
+@event.listens_for(LostItem, 'after_update')
+def _mark_updated_item_for_match_engine(mapper, connection, target):
+    if item_match_engine is None:
+        return
+    state = db.inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in ('name', 'description', 'location', 'value', 'status')):
+        _collect_item_for_match_engine(target)
+
+@event.listens_for(OrmSession, 'after_commit')
+def _mark_committed_items_for_match_engine(session):
+    item_ids = session.info.pop('match_engine_dirty', None)
+    if item_ids and item_match_engine is not None:
+        item_match_engine.mark_dirty(item_ids)
+
+@event.listens_for(OrmSession, 'after_rollback')
+def _forget_rolled_back_items_for_match_engine(session):
+    session.info.pop('match_engine_dirty', None)
 
 # Ensure new columns exist in SQLite without full migrations (run once on import)
 def _ensure_chat_schema():
@@ -434,6 +1601,8 @@ def _ensure_chat_schema():
                 columns = [row[1] for row in info]
                 if 'attachment' not in columns:
                     conn.execute(text("ALTER TABLE message ADD COLUMN attachment VARCHAR(300)"))
+                if 'attachment_name' not in columns:
+                    conn.execute(text("ALTER TABLE message ADD COLUMN attachment_name VARCHAR(300)"))
             except Exception:
                 pass
     except Exception:
@@ -507,6 +1676,673 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# ---------------- Upload storage backends ----------------
+# The DB keeps logical upload names (cas/<sha256>.<ext>, thumbs/<w>/<name>.webp, legacy
+# user_* names); a backend maps each to a sharded key <dir>/<aa>/<bb>/<file> so no single
+# directory (or S3 prefix) grows without bound. Everything that reads, writes or links an
+# upload goes through `upload_storage`.
+_CAS_FILE_NAME = re.compile(r'^[0-9a-f]{64}\.')
+
+def _sharded_key(name):
+    directory, _, base = name.rpartition('/')
+    # Content-addressed files shard on their own digest, anything else on a hash of the name
+    digest = base if _CAS_FILE_NAME.match(base) else hashlib.md5(base.encode('utf-8')).hexdigest()
+    return '/'.join(part for part in (directory, digest[:2], digest[2:4], base) if part)
+
+def _upload_name_for_key(key):
+    """Inverse of _sharded_key (flat, not re-homed keys are their own name)"""
+    parts = key.split('/')
+    if len(parts) >= 3:
+        name = '/'.join(parts[:-3] + parts[-1:])
+        if _sharded_key(name) == key:
+            return name
+    return key
+
+def _thumbnail_source(name):
+    match = re.match(r'^thumbs/(?:\d+/(.+)\.webp|poster/(.+)\.jpg)$', name)
+    return (match.group(1) or match.group(2)) if match else name
+
+def _is_immutable_upload(name):
+    """Content-addressed uploads never change under the same name. Their thumbnails and
+    poster images do (make-thumbnails --force, new sizes or quality), so they aren't"""
+    return name.startswith(UPLOAD_CAS_DIR + '/')
+
+def _upload_cache_control(name):
+    """Cache-Control stored with an S3 object (serve_upload sets the same for local files)"""
+    if _is_immutable_upload(name):
+        return f"public, max-age={UPLOAD_IMMUTABLE_MAX_AGE}, immutable"
+    return f"public, max-age={app.config['UPLOAD_CACHE_MAX_AGE']}"
+
+class LocalUploadStorage:
+    """Uploads on the local filesystem under `root`, served by serve_upload()"""
+
+    def __init__(self, root, quarantine_root=None):
+        self.root = root
+        self.quarantine_root = quarantine_root or app.config['UPLOAD_QUARANTINE_FOLDER']
+
+    def key(self, name):
+        return _sharded_key(name)
+
+    def path(self, name):
+        """Filesystem path of an upload; files not yet re-homed are still found at their flat path"""
+        sharded = os.path.join(self.root, self.key(name))
+        if not os.path.exists(sharded) and os.path.isfile(os.path.join(self.root, name)):
+            return os.path.join(self.root, name)
+        return sharded
+
+    def exists(self, name):
+        return os.path.isfile(self.path(name))
+
+    def touch(self, name):
+        """Mark a stored file as just used (False if it isn't there)"""
+        try:
+            os.utime(self.path(name))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def open(self, name):
+        return open(self.path(name), 'rb')
+
+    def put_file(self, local_path, name):
+        """Move a local file into storage under `name` (replacing any existing copy)"""
+        target = os.path.join(self.root, self.key(name))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Move next to the target first, so readers never see a half-copied file
+        staged = f"{target}.{secrets.token_hex(4)}.part"
+        shutil.move(local_path, staged)
+        os.replace(staged, target)
+
+    def delete(self, name):
+        for path in (os.path.join(self.root, self.key(name)), os.path.join(self.root, name)):
+            if os.path.isfile(path):
+                os.remove(path)
+
+    def url(self, name, download_name=None):
+        relative = os.path.relpath(self.path(name), self.root).replace(os.sep, '/')
+        return url_for('serve_upload', key=relative, download=download_name)
+
+    # Key-level operations for the garbage collector (keys are paths relative to the root)
+    def iter_keys(self, quarantined=False):
+        """Yield (key, size, mtime) for every stored file, streaming the directory tree"""
+        base = self.quarantine_root if quarantined else self.root
+        for dirpath, _, filenames in os.walk(base):
+            for filename in filenames:
+                if filename.endswith('.part'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield os.path.relpath(path, base).replace(os.sep, '/'), stat.st_size, stat.st_mtime
+
+    def _move_key(self, key, from_root, to_root):
+        target = os.path.join(to_root, key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(os.path.join(from_root, key), target)
+        return target
+
+    def quarantine_key(self, key, unmodified_since):
+        """Park a file in quarantine unless it was touched after `unmodified_since`; returns
+        whether it was. Checked after the rename, so a touch() can't slip in between."""
+        target = self._move_key(key, self.root, self.quarantine_root)
+        if os.stat(target).st_mtime > unmodified_since:
+            self._move_key(key, self.quarantine_root, self.root)
+            return False
+        os.utime(target)  # the quarantine TTL runs from now
+        return True
+
+    def restore_key(self, key):
+        self._move_key(key, self.quarantine_root, self.root)
+
+    def purge_keys(self, keys):
+        for key in keys:
+            path = os.path.join(self.quarantine_root, key)
+            if os.path.isfile(path):
+                os.remove(path)
+
+class S3UploadStorage:
+    """Uploads in an S3-compatible bucket (AWS, MinIO, or moto in tests)"""
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, public_url=None, url_expiry=3600):
+        self.client = boto3.client('s3', endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.prefix = prefix
+        self.quarantine_prefix = 'quarantine/' + prefix
+        self.public_url = public_url.rstrip('/') if public_url else None
+        self.url_expiry = url_expiry
+
+    def key(self, name):
+        return self.prefix + _sharded_key(name)
+
+    def exists(self, name):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.key(name))
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def touch(self, name):
+        """Mark a stored object as just used (False if it isn't there): copying it onto itself
+        gives it a fresh LastModified"""
+        key = self.key(name)
+        extra = {'ContentType': mimetypes.guess_type(name)[0] or 'application/octet-stream'}
+        extra['CacheControl'] = _upload_cache_control(name)
+        try:
+            self.client.copy_object(Bucket=self.bucket, Key=key, CopySource={'Bucket': self.bucket, 'Key': key},
+                                    MetadataDirective='REPLACE', **extra)
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def open(self, name):
+        body = self.client.get_object(Bucket=self.bucket, Key=self.key(name))['Body']
+        try:
+            return BytesIO(body.read())  # seekable, which Pillow and ReportLab need
+        finally:
+            body.close()
+
+    def put_file(self, local_path, name):
+        extra = {'ContentType': mimetypes.guess_type(name)[0] or 'application/octet-stream'}
+        extra['CacheControl'] = _upload_cache_control(name)
+        self.client.upload_file(local_path, self.bucket, self.key(name), ExtraArgs=extra)
+        os.remove(local_path)
+
+    def delete(self, name):
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(name))
+
+    def url(self, name, download_name=None):
+        if self.public_url:
+            return f"{self.public_url}/{self.key(name)}"
+        params = {'Bucket': self.bucket, 'Key': self.key(name)}
+        if download_name:
+            params['ResponseContentDisposition'] = f'attachment; filename="{download_name}"'
+        return self.client.generate_presigned_url('get_object', Params=params, ExpiresIn=self.url_expiry)
+
+    # Key-level operations for the garbage collector (keys are relative to the prefix)
+    def iter_keys(self, quarantined=False):
+        """Yield (key, size, mtime) for every stored object, one listing page at a time"""
+        prefix = self.quarantine_prefix if quarantined else self.prefix
+        for page in self.client.get_paginator('list_objects_v2').paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                if not quarantined and obj['Key'].startswith(self.quarantine_prefix):
+                    continue
+                yield obj['Key'][len(prefix):], obj['Size'], obj['LastModified'].timestamp()
+
+    def _move_key(self, source, target, **conditions):
+        # The copy gets a fresh LastModified, so the quarantine TTL runs from now
+        self.client.copy_object(Bucket=self.bucket, Key=target, CopySource={'Bucket': self.bucket, 'Key': source}, **conditions)
+        self.client.delete_object(Bucket=self.bucket, Key=source)
+
+    def quarantine_key(self, key, unmodified_since):
+        """Park an object in quarantine unless it was touched after `unmodified_since`; returns whether it was"""
+        try:
+            # The copy condition closes the race on S3 itself; the HEAD covers stores that ignore it
+            if self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)['LastModified'].timestamp() > unmodified_since:
+                return False
+            self._move_key(self.prefix + key, self.quarantine_prefix + key,
+                           CopySourceIfUnmodifiedSince=datetime.fromtimestamp(unmodified_since, timezone.utc))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('412', 'PreconditionFailed'):
+                return False
+            raise
+        return True
+
+    def restore_key(self, key):
+        self._move_key(self.quarantine_prefix + key, self.prefix + key)
+
+    def purge_keys(self, keys):
+        keys = list(keys)
+        for start in range(0, len(keys), 1000):  # DeleteObjects takes at most 1000 keys
+            self.client.delete_objects(Bucket=self.bucket, Delete={
+                'Objects': [{'Key': self.quarantine_prefix + key} for key in keys[start:start + 1000]],
+                'Quiet': True,
+            })
+
+def make_upload_storage(backend=None):
+    """Build the backend named by UPLOAD_STORAGE (or `backend`)"""
+    backend = backend or app.config['UPLOAD_STORAGE']
+    if backend == 's3':
+        if boto3 is None:
+            raise RuntimeError("UPLOAD_STORAGE=s3 requires boto3 (pip install boto3)")
+        if not app.config['UPLOAD_S3_BUCKET']:
+            raise RuntimeError("UPLOAD_STORAGE=s3 requires UPLOAD_S3_BUCKET")
+        return S3UploadStorage(
+            app.config['UPLOAD_S3_BUCKET'],
+            prefix=app.config['UPLOAD_S3_PREFIX'],
+            endpoint_url=app.config['UPLOAD_S3_ENDPOINT_URL'],
+            public_url=app.config['UPLOAD_S3_PUBLIC_URL'],
+            url_expiry=app.config['UPLOAD_S3_URL_EXPIRY'],
+        )
+    if backend != 'local':
+        raise RuntimeError(f"Unknown UPLOAD_STORAGE backend: {backend}")
+    return LocalUploadStorage(os.path.join(app.root_path, app.config['UPLOAD_FOLDER']))
+
+upload_storage = make_upload_storage()
+
+@app.template_global()
+@app.template_filter()
+def upload_url(name, download_name=None):
+    """URL of an uploaded file, wherever the storage backend keeps it.
+
+    With `download_name` the file is served as a download under that name (not possible
+    through UPLOAD_S3_PUBLIC_URL, which serves the bucket as it is).
+    """
+    return upload_storage.url(name, download_name)
+
+# Local uploads are served here rather than by the static route so each response can carry
+# the right caching: content-addressed names are immutable and use their digest as ETag;
+# thumbnails can be regenerated in place, so they revalidate like legacy names.
+# With UPLOAD_SENDFILE set, Python only answers conditional requests and hands the bytes
+# to the proxy, e.g. for nginx:
+#   location /_uploads/ { internal; alias /path/to/app/static/uploads/; }
+UPLOAD_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+@app.route('/uploads/<path:key>')
+def serve_upload(key):
+    if not isinstance(upload_storage, LocalUploadStorage):
+        return "Not found", 404
+    name = _upload_name_for_key(key)
+    immutable = _is_immutable_upload(name)
+    etag = True  # Flask's mtime/size-based tag for legacy names and image variants
+    if immutable:
+        etag = name.rsplit('/', 1)[1].split('.', 1)[0]
+    max_age = UPLOAD_IMMUTABLE_MAX_AGE if immutable else app.config['UPLOAD_CACHE_MAX_AGE']
+    # Content-addressed names say nothing about the file; chat links pass the original name
+    download_name = secure_filename(request.args.get('download', ''))
+    mode = app.config['UPLOAD_SENDFILE']
+    if mode in ('x-sendfile', 'x-accel-redirect'):
+        path = safe_join(upload_storage.root, key)
+        if path is None or not os.path.isfile(path):
+            return "Not found", 404
+        stat = os.stat(path)
+        response = Response(mimetype=mimetypes.guess_type(key)[0] or 'application/octet-stream')
+        response.set_etag(etag if isinstance(etag, str) else f"{stat.st_mtime}-{stat.st_size}")
+        response.last_modified = stat.st_mtime
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        response = response.make_conditional(request)  # 304s here; the proxy handles Range
+        if response.status_code == 200:
+            if mode == 'x-sendfile':
+                response.headers['X-Sendfile'] = os.path.abspath(path)
+            else:
+                response.headers['X-Accel-Redirect'] = app.config['UPLOAD_ACCEL_REDIRECT_PREFIX'] + key
+    else:
+        # conditional=True answers If-None-Match/If-Modified-Since and Range requests
+        response = send_from_directory(upload_storage.root, key, conditional=True, etag=etag, max_age=max_age,
+                                       as_attachment=bool(download_name), download_name=download_name or None)
+    if download_name and mode in ('x-sendfile', 'x-accel-redirect'):
+        response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+    if immutable:
+        response.cache_control.immutable = True
+    return response
+
+def staging_file(suffix=''):
+    """(fd, path) of a fresh local temp file for an upload on its way into storage"""
+    return tempfile.mkstemp(dir=app.config['UPLOAD_STAGING_FOLDER'], suffix=suffix)
+
+def rehome_uploads(storage=None):
+    """Move every referenced upload (and its thumbnails) into `storage`'s sharded layout.
+
+    Picks files up from the old flat layout under UPLOAD_FOLDER and, when the target is
+    another backend, from the local sharded layout too. Returns the number of files moved.
+    """
+    storage = storage or upload_storage
+    local = LocalUploadStorage(os.path.join(app.root_path, app.config['UPLOAD_FOLDER']))
+    names = set(_upload_references())
+    names.update(row[0] for row in db.session.query(StoredUpload.filename))
+    names.update([variant for name in names for variant in _upload_variant_names(name)])
+    moved = 0
+    for name in sorted(names):
+        sources = [os.path.join(local.root, name)]
+        if not isinstance(storage, LocalUploadStorage):
+            sources.append(os.path.join(local.root, local.key(name)))
+        for path in sources:
+            if not os.path.isfile(path):
+                continue
+            try:
+                storage.put_file(path, name)
+                moved += 1
+            except Exception as e:
+                print(f"Could not re-home upload {name}: {e}")
+    return moved
+
+# ---------------- Upload storage (content-addressed) ----------------
+# Uploads are stored once per distinct content under the name cas/<sha256>.<ext>;
+# StoredUpload.ref_count tracks how many DB rows point at each file. Files whose count
+# drops to zero are left for a cleanup pass rather than deleted inside a transaction.
+UPLOAD_CAS_DIR = 'cas'
+UPLOAD_CHUNK_SIZE = 64 * 1024
+upload_pool = ThreadPoolExecutor(max_workers=app.config['UPLOAD_WORKERS'], thread_name_prefix='upload-worker')
+
+class UploadFileTooLarge(RequestEntityTooLarge):
+    """One file of a multipart upload is over MAX_UPLOAD_FILE_SIZE"""
+
+class _SizeCappedUploadFile(tempfile.SpooledTemporaryFile):
+    """Spool for one multipart file part that fails as soon as it grows past `limit` bytes"""
+
+    def __init__(self, limit):
+        super().__init__(max_size=500 * 1024, mode='w+b', dir=app.config['UPLOAD_STAGING_FOLDER'])
+        self.limit = limit
+        self.received = 0
+
+    def write(self, data):
+        self.received += len(data)
+        if self.received > self.limit:
+            raise UploadFileTooLarge()
+        return super().write(data)
+
+class UploadRequest(Request):
+    """Request whose multipart file parts are capped at MAX_UPLOAD_FILE_SIZE while they stream in"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        limit = app.config['MAX_UPLOAD_FILE_SIZE']
+        if content_length is not None and content_length > limit:
+            raise UploadFileTooLarge()
+        return _SizeCappedUploadFile(limit)
+
+app.request_class = UploadRequest
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    """413 for bodies over MAX_CONTENT_LENGTH or files over MAX_UPLOAD_FILE_SIZE"""
+    if isinstance(e, UploadFileTooLarge):
+        message = f"Each file can be at most {app.config['MAX_UPLOAD_FILE_SIZE'] // (1024 * 1024)} MB."
+    else:
+        message = f"Uploads can be at most {app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)} MB in total."
+    if request.path.startswith('/api/') or request.accept_mimetypes.best == 'application/json':
+        return jsonify({'error': message}), 413
+    flash(message, 'error')
+    return redirect(request.referrer or url_for('home'))
+
+def _upload_extension(filename):
+    safe = secure_filename(filename or '')
+    return safe.rsplit('.', 1)[1].lower() if '.' in safe else 'bin'
+
+def _register_stored_file(digest, extension, size, refs=1):
+    """Add `refs` references to the content in StoredUpload; returns the name it is stored under"""
+    return db.session.execute(
+        sqlite_insert(StoredUpload)
+        .values(digest=digest, filename=f"{UPLOAD_CAS_DIR}/{digest}.{extension}", size=size, ref_count=refs)
+        .on_conflict_do_update(index_elements=['digest'], set_={'ref_count': StoredUpload.ref_count + refs})
+        .returning(StoredUpload.filename)
+    ).scalar_one()
+
+def _place_stored_file(temp_path, filename):
+    # Same bytes already stored: touching the file keeps gc-uploads from quarantining it before
+    # this request's reference commits (UPLOAD_GC_GRACE runs from the touch). If the GC got
+    # there first, the file is gone and is simply written again.
+    if upload_storage.touch(filename):
+        os.remove(temp_path)
+    else:
+        upload_storage.put_file(temp_path, filename)
+
+def _commit_stored_file(temp_path, digest, extension, size, refs=1):
+    """Register content in StoredUpload (ref_count += refs) and move the temp file into place"""
+    filename = _register_stored_file(digest, extension, size, refs)
+    _place_stored_file(temp_path, filename)
+    return filename
+
+def _stage_upload(file):
+    """Copy an uploaded FileStorage to a staging file, hashing it on the way.
+
+    Returns (temp_path, digest, extension, size), or None for an image Pillow can't parse.
+    Touches no DB state, so several files can be staged on upload_pool at once.
+    """
+    extension = _upload_extension(file.filename)
+    fd, temp_path = staging_file(suffix='.part')
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = file.stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        if Image is not None and extension in THUMBNAIL_IMAGE_EXTENSIONS:
+            try:
+                with Image.open(temp_path) as img:
+                    img.verify()  # parses headers and structure without decoding pixels
+            except Exception as e:
+                print(f"Rejected upload {file.filename!r}: not a readable image ({e})")
+                os.remove(temp_path)
+                return None
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return temp_path, digest.hexdigest(), extension, size
+
+def store_upload(file):
+    """Save an uploaded FileStorage into the store; returns its upload name (None if rejected).
+
+    The new reference is part of the current session, so it commits with the row using it.
+    """
+    staged = _stage_upload(file)
+    if staged is None:
+        return None
+    return _commit_stored_file(*staged)
+
+def store_uploads(files):
+    """store_upload() for several files, staging and writing them in parallel on upload_pool.
+
+    Returns the upload names in order, leaving out rejected files. Only the StoredUpload
+    bookkeeping runs on the request thread, since the session can't be shared.
+    """
+    files = list(files)
+    if len(files) < 2:
+        return [name for name in (store_upload(file) for file in files) if name]
+    futures = [upload_pool.submit(_stage_upload, file) for file in files]
+    staged, error = [], None
+    for future in futures:
+        try:
+            staged.append(future.result())
+        except Exception as e:
+            error = error or e
+    staged = [entry for entry in staged if entry]
+    if error is not None:
+        for temp_path, _, _, _ in staged:
+            os.remove(temp_path)
+        raise error
+    # Identical photos in one post are written once; the extras are only referenced
+    targets = {}
+    for temp_path, digest, extension, _ in staged:
+        target = f"{UPLOAD_CAS_DIR}/{digest}.{extension}"
+        if target in targets:
+            os.remove(temp_path)
+        else:
+            targets[target] = upload_pool.submit(_place_stored_file, temp_path, target)
+    for future in targets.values():
+        future.result()
+    names = [_register_stored_file(digest, extension, size) for _, digest, extension, size in staged]
+    for target in set(targets) - set(names):
+        upload_storage.delete(target)  # content was already stored under another extension
+    return names
+
+def store_upload_file(path, refs=1, extension=None):
+    """Move a local file (e.g. a staged profile photo) into the store; returns its upload name"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as src:
+        for chunk in iter(lambda: src.read(UPLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return _commit_stored_file(path, digest.hexdigest(), extension or _upload_extension(os.path.basename(path)), os.path.getsize(path), refs)
+
+def release_uploads(filenames, connection=None):
+    """Drop one reference per occurrence of each stored upload name"""
+    counts = {}
+    for name in filenames:
+        if name and name.startswith(UPLOAD_CAS_DIR + '/'):
+            counts[name] = counts.get(name, 0) + 1
+    for name, count in counts.items():
+        stmt = db.update(StoredUpload).where(StoredUpload.filename == name)\
+            .values(ref_count=db.func.max(StoredUpload.ref_count - count, 0))
+        (connection.execute if connection is not None else db.session.execute)(stmt)
+
+def _upload_references():
+    """Every upload name referenced from the DB, one entry per reference"""
+    names = [row[0] for row in db.session.query(ItemPhoto.storage_key)]
+    names.extend(row[0] for row in db.session.query(Message.attachment).filter(Message.attachment.isnot(None)))
+    names.extend(row[0] for row in db.session.query(User.profile_photo).filter(User.profile_photo.isnot(None)))
+    return [name for name in names if name]
+
+def recount_upload_refs():
+    """Recompute every StoredUpload.ref_count from the rows that reference it"""
+    counts = {}
+    for name in _upload_references():
+        counts[name] = counts.get(name, 0) + 1
+    db.session.execute(db.update(StoredUpload).values(ref_count=0))
+    for name, count in counts.items():
+        db.session.execute(db.update(StoredUpload).where(StoredUpload.filename == name).values(ref_count=count))
+    db.session.commit()
+
+def migrate_legacy_uploads():
+    """Move referenced user_<id>_<token>_<name> files into the store and repoint the rows.
+
+    Returns (files migrated, bytes freed by deduplication).
+    """
+    renamed = {}
+    bytes_before = bytes_after = 0
+    for name in dict.fromkeys(_upload_references()):
+        if name.startswith(UPLOAD_CAS_DIR + '/') or not upload_storage.exists(name):
+            continue
+        # Store a copy; the legacy file is only removed once the rows point at the new name
+        fd, staged = staging_file(suffix='.part')
+        with os.fdopen(fd, 'wb') as out, upload_storage.open(name) as src:
+            shutil.copyfileobj(src, out)
+        size = os.path.getsize(staged)
+        bytes_before += size
+        new_name = store_upload_file(staged, refs=0, extension=_upload_extension(name))
+        if new_name not in renamed.values():
+            bytes_after += size
+        renamed[name] = new_name
+    if not renamed:
+        return 0, 0
+
+    def repoint(name):
+        return renamed.get(name, name)
+
+    for photo in ItemPhoto.query.filter(ItemPhoto.storage_key.in_(list(renamed))):
+        photo.storage_key = repoint(photo.storage_key)
+    for item in LostItem.query.filter(LostItem.photo_filename.in_(list(renamed))):
+        item.photo_filename = repoint(item.photo_filename)
+    for msg in Message.query.filter(Message.attachment.in_(list(renamed))):
+        msg.attachment = repoint(msg.attachment)
+    for user in User.query.filter(User.profile_photo.in_(list(renamed))):
+        user.profile_photo = repoint(user.profile_photo)
+    db.session.commit()
+    recount_upload_refs()
+    # Legacy copies and their variants are now unreferenced; the store names get fresh variants
+    for name in renamed:
+        upload_storage.delete(name)
+        for variant in _upload_variant_names(name):
+            upload_storage.delete(variant)
+    enqueue_thumbnails(set(renamed.values()))
+    return len(renamed), bytes_before - bytes_after
+
+# ---------------- Upload garbage collection ----------------
+# Files reach storage before the row that references them commits, and rows go away
+# without deleting their files, so unreferenced uploads pile up. gc-uploads parks them
+# in quarantine first and only deletes them UPLOAD_QUARANTINE_TTL later, restoring any
+# that got referenced again in between.
+UPLOAD_GC_BATCH = 500
+
+def _is_collectable_key(key):
+    """Only files the app wrote itself: the store, thumbnails and legacy user_* uploads"""
+    return key.startswith((UPLOAD_CAS_DIR + '/', 'thumbs/')) or key.rsplit('/', 1)[-1].startswith('user_')
+
+def _referenced_upload_keys():
+    """Storage keys (sharded and flat) of every referenced upload and its thumbnails"""
+    names = set(_upload_references())
+    names.update(row[0] for row in db.session.query(LostItem.photo_filename).filter(LostItem.photo_filename.isnot(None)))
+    names.update([variant for name in names for variant in _upload_variant_names(name)])
+    return names | {_sharded_key(name) for name in names}
+
+def _quarantine_batch(storage, keys, stats, dry_run):
+    # Same bytes may have been uploaded again since the scan started; keep those files
+    sources = {_thumbnail_source(_upload_name_for_key(key)) for key in keys}
+    stored = {row[0] for row in db.session.query(StoredUpload.filename).filter(StoredUpload.filename.in_(list(sources)))}
+    for key, (size, mtime) in keys.items():
+        if _thumbnail_source(_upload_name_for_key(key)) in stored:
+            continue
+        try:
+            # A request reusing the bytes touches the file, even before its row commits
+            if not dry_run and not storage.quarantine_key(key, unmodified_since=mtime):
+                continue
+            stats['quarantined'] += 1
+            stats['bytes_quarantined'] += size
+        except Exception as e:
+            print(f"Could not quarantine upload {key}: {e}")
+
+def _purge_batch(storage, keys, stats, dry_run):
+    if not dry_run:
+        storage.purge_keys(list(keys))
+    stats['purged'] += len(keys)
+    stats['bytes_reclaimed'] += sum(keys.values())
+
+def collect_upload_garbage(storage=None, dry_run=False, quarantine_ttl=None):
+    """Quarantine unreferenced uploads and delete the ones quarantined longer than the TTL.
+
+    Also removes staged files (abandoned profile photo verifications, interrupted uploads)
+    older than PENDING_UPLOAD_TTL. Returns counters, including bytes_reclaimed.
+    """
+    storage = storage or upload_storage
+    quarantine_ttl = app.config['UPLOAD_QUARANTINE_TTL'] if quarantine_ttl is None else quarantine_ttl
+    now = time.time()
+    stats = dict.fromkeys(('scanned', 'quarantined', 'bytes_quarantined', 'restored', 'purged',
+                           'staging_removed', 'bytes_reclaimed'), 0)
+    if not dry_run:
+        recount_upload_refs()
+        # Content no row points at; uploading the same bytes again simply re-registers it
+        db.session.execute(db.delete(StoredUpload).where(StoredUpload.ref_count <= 0))
+        db.session.commit()
+    referenced = _referenced_upload_keys()
+
+    # Quarantine first: bring back files referenced again, delete the ones past the TTL
+    expired = {}
+    for key, size, mtime in storage.iter_keys(quarantined=True):
+        if key in referenced:
+            if not dry_run:
+                storage.restore_key(key)
+            stats['restored'] += 1
+        elif now - mtime >= quarantine_ttl:
+            expired[key] = size
+            if len(expired) >= UPLOAD_GC_BATCH:
+                _purge_batch(storage, expired, stats, dry_run)
+                expired = {}
+    if expired:
+        _purge_batch(storage, expired, stats, dry_run)
+
+    # Then the live store, streamed and quarantined in batches
+    orphans = {}
+    for key, size, mtime in storage.iter_keys():
+        stats['scanned'] += 1
+        if key in referenced or not _is_collectable_key(key) or now - mtime < app.config['UPLOAD_GC_GRACE']:
+            continue
+        orphans[key] = (size, mtime)
+        if len(orphans) >= UPLOAD_GC_BATCH:
+            _quarantine_batch(storage, orphans, stats, dry_run)
+            orphans = {}
+    if orphans:
+        _quarantine_batch(storage, orphans, stats, dry_run)
+
+    # Staged files are never referenced from the DB; pending verifications expire long before the TTL
+    for entry in os.scandir(app.config['UPLOAD_STAGING_FOLDER']):
+        if entry.is_file() and now - entry.stat().st_mtime >= app.config['PENDING_UPLOAD_TTL']:
+            size = entry.stat().st_size
+            if not dry_run:
+                os.remove(entry.path)
+            stats['staging_removed'] += 1
+            stats['bytes_reclaimed'] += size
+    return stats
+
 # Helper function to calculate warehouse deadline (150 hours from creation)
 def calculate_warehouse_deadline():
     return datetime.now() + timedelta(hours=150)
@@ -544,12 +2380,7 @@ def send_verification_email(email, verification_code):
             print("Email not sent: MAIL_USERNAME/MAIL_PASSWORD environment variables are not set.")
             print(f"[VERIFICATION CODE] For email {email}: {verification_code}")
             return True
-        msg = MailMessage(
-            subject='Email Verification Code',
-            sender=app.config.get('MAIL_DEFAULT_SENDER') or app.config.get('MAIL_USERNAME'),
-            recipients=[email]
-        )
-        msg.body = f'''
+        body = f'''
 Thank you for signing up!
 
 Your verification code is: {verification_code}
@@ -558,7 +2389,7 @@ This code will expire in 10 minutes.
 
 If you didn't request this code, please ignore this email.
 '''
-        mail.send(msg)
+        enqueue_email('Email Verification Code', [email], body)
         return True
     except Exception as e:
         print(f"Error sending email: {e}")
@@ -573,12 +2404,7 @@ def send_password_reset_verification_email(email, verification_code):
             print("Email not sent: MAIL_USERNAME/MAIL_PASSWORD environment variables are not set.")
             print(f"[PASSWORD RESET VERIFICATION CODE] For email {email}: {verification_code}")
             return True
-        msg = MailMessage(
-            subject='Password Reset Verification Code',
-            sender=app.config.get('MAIL_DEFAULT_SENDER') or app.config.get('MAIL_USERNAME'),
-            recipients=[email]
-        )
-        msg.body = f'''
+        body = f'''
 You have requested to reset your password.
 
 Your verification code is: {verification_code}
@@ -587,7 +2413,7 @@ This code will expire in 10 minutes.
 
 If you did not request this code, please ignore this email.
 '''
-        mail.send(msg)
+        enqueue_email('Password Reset Verification Code', [email], body)
         return True
     except Exception as e:
         print(f"Error sending password reset email: {e}")
@@ -601,14 +2427,9 @@ def send_identity_verification_email(email, verification_code):
             print("Email not sent: MAIL_USERNAME/MAIL_PASSWORD environment variables are not set.")
             print(f"[IDENTITY VERIFY CODE] For email {email}: {verification_code}")
             return True
-        msg = MailMessage(
-            subject='Verify your identity to change email',
-            sender=app.config.get('MAIL_USERNAME'),
-            recipients=[email]
-        )
-        msg.body = f'''\
+        body = f'''\
 You requested to change your account email.\n\nVerification code: {verification_code}\n\nThis code will expire in 10 minutes.\nIf you did not request this, please secure your account.'''
-        mail.send(msg)
+        enqueue_email('Verify your identity to change email', [email], body, sender=app.config.get('MAIL_USERNAME'))
         return True
     except Exception as e:
         print(f"Error sending identity verification email: {e}")
@@ -622,14 +2443,9 @@ def send_new_email_verification(email, verification_code):
             print("Email not sent: MAIL_USERNAME/MAIL_PASSWORD environment variables are not set.")
             print(f"[NEW EMAIL VERIFY CODE] For email {email}: {verification_code}")
             return True
-        msg = MailMessage(
-            subject='Verify your new email address',
-            sender=app.config.get('MAIL_USERNAME'),
-            recipients=[email]
-        )
-        msg.body = f'''\
+        body = f'''\
 You're changing your account email to this address.\n\nVerification code: {verification_code}\n\nThis code will expire in 10 minutes.\nIf you did not request this, ignore this email.'''
-        mail.send(msg)
+        enqueue_email('Verify your new email address', [email], body, sender=app.config.get('MAIL_USERNAME'))
         return True
     except Exception as e:
         print(f"Error sending new email verification: {e}")
@@ -643,14 +2459,9 @@ def send_profile_update_verification_email(email, verification_code):
             print("Email not sent: MAIL_USERNAME/MAIL_PASSWORD environment variables are not set.")
             print(f"[PROFILE UPDATE VERIFY CODE] For email {email}: {verification_code}")
             return True
-        msg = MailMessage(
-            subject='Confirm Profile Update',
-            sender=app.config.get('MAIL_USERNAME'),
-            recipients=[email]
-        )
-        msg.body = f'''\
+        body = f'''\
 You attempted to update your profile information.\n\nVerification code: {verification_code}\n\nThis code will expire in 10 minutes.\nIf you did not request this change, please review your account activity.'''
-        mail.send(msg)
+        enqueue_email('Confirm Profile Update', [email], body, sender=app.config.get('MAIL_USERNAME'))
         return True
     except Exception as e:
         print(f"Error sending profile update verification: {e}")
@@ -667,19 +2478,47 @@ def send_email(subject, recipients, body):
             print("Email not sent: MAIL_USERNAME/MAIL_PASSWORD environment variables are not set.")
             print(f"[EMAIL FALLBACK] Subject: {subject}\nTo: {', '.join(recipients)}\n\n{body}")
             return True
-        msg = MailMessage(
-            subject=subject,
-            sender=app.config.get('MAIL_DEFAULT_SENDER') or app.config.get('MAIL_USERNAME'),
-            recipients=recipients
-        )
-        msg.body = body
-        mail.send(msg)
-        return True
+        return enqueue_email(subject, recipients, body)
     except Exception as e:
         print(f"Error sending email: {e}")
         print(f"[EMAIL FALLBACK] Subject: {subject}\nTo: {', '.join(recipients)}\n\n{body}")
         return True
 
+def send_emails(batch, commit=True):
+    """Queue many (subject, recipients, body) emails with one INSERT.
+
+    With commit=False the rows join the caller's transaction, so they are only delivered
+    if it commits; call wake_email_worker() afterwards. Returns the number queued.
+    """
+    if not batch:
+        return 0
+    if not are_mail_credentials_present():
+        print(f"Email not sent: MAIL_USERNAME/MAIL_PASSWORD environment variables are not set ({len(batch)} queued).")
+        for subject, recipients, body in batch:
+            print(f"[EMAIL FALLBACK] Subject: {subject}\nTo: {', '.join(recipients)}\n\n{body}")
+        return 0
+    db.session.execute(db.insert(EmailOutbox), [
+        {'subject': subject, 'recipients': json.dumps(list(recipients)), 'body': body}
+        for subject, recipients, body in batch
+    ])
+    if commit:
+        db.session.commit()
+        wake_email_worker()
+    return len(batch)
+
+def enqueue_email(subject, recipients, body, sender=None):
+    """Put one email in the outbox (committing the session) and wake the outbox worker"""
+    try:
+        db.session.add(EmailOutbox(subject=subject, recipients=json.dumps(list(recipients)), body=body, sender=sender))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error queueing email: {e}")
+        print(f"[EMAIL FALLBACK] Subject: {subject}\nTo: {', '.join(recipients)}\n\n{body}")
+        return False
+    wake_email_worker()
+    return True
+
 def send_item_submission_email(user, item, submission_type):
     if not user or not user.email:
         return False
@@ -706,6 +2545,11 @@ def send_item_submission_email(user, item, submission_type):
 def send_item_status_update_email(user, item, old_status, new_status):
     if not user or not user.email:
         return False
+    subject, body = build_item_status_update_email(user, item, old_status, new_status)
+    return send_email(subject, [user.email], body)
+
+def build_item_status_update_email(user, item, old_status, new_status):
+    """Return (subject, body) for a status-change email"""
     item_url = url_for('home', _external=False)
     subject = f"Status update for '{item.name}': {old_status} → {new_status}"
     body = (
@@ -719,7 +2563,7 @@ def send_item_status_update_email(user, item, old_status, new_status):
         f"Visit the portal for more details: {item_url}\n\n"
         f"This is an automated message."
     )
-    return send_email(subject, [user.email], body)
+    return subject, body
 
 def send_item_deleted_email(user, item, previous_status, undo_url=None):
     if not user or not user.email:
@@ -841,49 +2685,759 @@ def clean_expired_codes():
     if expired_codes:
         db.session.commit()
 
+# Timings (seconds) and counts from the most recent warehouse sweep, for logs/diagnostics
+warehouse_sweep_stats = {}
+
 # Helper function to check and move expired items to warehouse
-def check_warehouse_deadlines():
-    expired_items = LostItem.query.filter(
-        LostItem.warehouse_deadline <= datetime.now(),
+def check_warehouse_deadlines(item_ids=None):
+    """Move expired lost/found items to the warehouse; optionally only the given item ids.
+
+    The status change, in-app notifications and activity-log rows are written as bulk
+    statements in a single transaction; status emails go out afterwards as one batch.
+    """
+    phase_started = time.perf_counter()
+    timings = {}
+
+    def lap(phase):
+        nonlocal phase_started
+        now_ts = time.perf_counter()
+        timings[phase] = round(now_ts - phase_started, 4)
+        phase_started = now_ts
+
+    now = datetime.now()
+    query = db.session.query(LostItem.id).filter(
+        LostItem.warehouse_deadline <= now,
         LostItem.status.in_(['lost', 'found'])
-    ).all()
-    # Prepare notifications before status change
-    notifications = []
-    for item in expired_items:
-        old_status = item.status
-        item.status = 'warehouse'
-        if item.reported_by:
-            reporter = db.session.get(User, item.reported_by)
-            if reporter:
-                notifications.append((reporter, item, old_status, 'warehouse'))
-    if expired_items:
-        db.session.commit()
-        print(f"Moved {len(expired_items)} items to warehouse")
-        # Send notifications after commit
-        for reporter, item, old_status, new_status in notifications:
-            send_item_status_update_email(reporter, item, old_status, new_status)
-            create_notification(
-                user_id=reporter.id,
-                title="Item moved to warehouse",
-                message=f"Your item '{item.name}' has been moved to the warehouse.",
-                url=f"{url_for('home', _external=False)}#item-{item.id}"
-            )
-            
-            # Log warehouse movement activity
-            log_activity(
-                user_id=reporter.id,
-                action_type='item_moved_to_warehouse',
-                action_description=f'Item "{item.name}" automatically moved to warehouse after deadline',
-                item_id=item.id,
-                additional_data={
-                    'item_name': item.name,
-                    'previous_status': old_status,
-                    'new_status': new_status,
-                    'warehouse_deadline': item.warehouse_deadline.isoformat() if item.warehouse_deadline else None,
+    )
+    if item_ids is not None:
+        if not item_ids:
+            return 0
+        query = query.filter(LostItem.id.in_(list(item_ids)))
+    candidate_ids = [row.id for row in query.all()]
+    lap('select')
+    if not candidate_ids:
+        return 0
+
+    try:
+        # Guarded transition, one statement per previous status: RETURNING tells us exactly
+        # which rows this sweep moved and from which status, re-checked at write time, so an
+        # overlapping sweeper, a claim or a deadline extension since the SELECT can't lead to
+        # a duplicate or wrong notice
+        moved = []
+        for previous_status in ('lost', 'found'):
+            moved.extend(db.session.execute(
+                db.update(LostItem)
+                .where(
+                    LostItem.id.in_(candidate_ids),
+                    LostItem.status == previous_status,
+                    LostItem.warehouse_deadline <= now,
+                )
+                .values(status='warehouse')
+                .returning(
+                    LostItem.id, LostItem.name, LostItem.reported_by, LostItem.warehouse_deadline,
+                    db.literal(previous_status).label('status'),
+                )
+            ).all())
+        moved_ids = [row.id for row in moved]
+        lap('update')
+        # Warehouse items are no longer matchable. The bulk UPDATE skips the mapper events, so
+        # hand the ids to the engine the way they do: through the session, after the commit
+        db.session.info.setdefault('match_engine_dirty', set()).update(moved_ids)
+        drop_item_matches(moved_ids)
+
+        reporter_ids = {row.reported_by for row in moved if row.reported_by}
+        reporters = {u.id: u for u in User.query.filter(User.id.in_(reporter_ids)).all()} if reporter_ids else {}
+        home_url = url_for('home', _external=False)
+
+        notification_rows = []
+        activity_rows = []
+        for row in moved:
+            reporter = reporters.get(row.reported_by)
+            if not reporter:
+                continue
+            notification_rows.append({
+                'user_id': reporter.id,
+                'title': "Item moved to warehouse",
+                'message': f"Your item '{row.name}' has been moved to the warehouse.",
+                'url': f"{home_url}#item-{row.id}",
+            })
+            activity_rows.append({
+                'user_id': reporter.id,
+                'action_type': 'item_moved_to_warehouse',
+                'action_description': f'Item "{row.name}" automatically moved to warehouse after deadline',
+                'item_id': row.id,
+                'ip_address': None,
+                'user_agent': None,
+                'additional_data': json.dumps({
+                    'item_name': row.name,
+                    'previous_status': row.status,
+                    'new_status': 'warehouse',
+                    'warehouse_deadline': row.warehouse_deadline.isoformat() if row.warehouse_deadline else None,
                     'reason': 'automatic_deadline_expiry'
-                }
+                }),
+            })
+        if notification_rows:
+            db.session.execute(db.insert(Notification), notification_rows)
+        lap('notifications')
+        if activity_rows:
+            db.session.execute(db.insert(ActivityLog), activity_rows)
+        lap('activity_log')
+        # Emails go into the outbox in the same transaction: queued exactly when the move commits
+        emails = []
+        for row in moved:
+            reporter = reporters.get(row.reported_by)
+            if reporter and reporter.email:
+                subject, body = build_item_status_update_email(reporter, row, row.status, 'warehouse')
+                emails.append((subject, [reporter.email], body))
+        send_emails(emails, commit=False)
+        lap('email')
+        db.session.commit()
+        lap('commit')
+    except Exception:
+        db.session.rollback()
+        raise
+    invalidate_posters(moved_ids)
+    wake_email_worker()
+
+    warehouse_sweep_stats.clear()
+    warehouse_sweep_stats.update({
+        'finished_at': datetime.now().isoformat(),
+        'moved': len(moved),
+        'notifications': len(notification_rows),
+        'emails': len(emails),
+        'timings': timings,
+    })
+    print(f"Moved {len(moved)} items to warehouse (timings: {timings})")
+    return len(moved)
+
+# ---------------- Background Warehouse Scheduler ----------------
+class WarehouseDeadlineQueue:
+    """In-memory min-heap of (warehouse_deadline, item_id) for open lost/found items.
+
+    The scheduler thread sleeps until the earliest deadline and then moves exactly the
+    items that are due. Routes that create or re-open items call schedule() so a new,
+    earlier deadline wakes the thread. Entries for items that were claimed, deleted or
+    edited in the meantime are dropped lazily: the sweep re-checks status and deadline
+    in the database before moving anything. Only the process holding the sweeper lock
+    keeps a heap (`active`); schedule() is a no-op everywhere else.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._cond = threading.Condition()
+        self.active = False
+
+    def rebuild(self):
+        """Reload every pending deadline from the database (startup, restart, periodic resync)"""
+        rows = db.session.query(LostItem.warehouse_deadline, LostItem.id).filter(
+            LostItem.warehouse_deadline.isnot(None),
+            LostItem.status.in_(['lost', 'found'])
+        ).all()
+        heap = [(deadline, item_id) for deadline, item_id in rows]
+        heapq.heapify(heap)
+        with self._cond:
+            self._heap = heap
+            self._cond.notify_all()
+        return len(heap)
+
+    def schedule(self, item_id, deadline):
+        if not self.active or not item_id or not deadline:
+            return
+        with self._cond:
+            wake = not self._heap or deadline < self._heap[0][0]
+            heapq.heappush(self._heap, (deadline, item_id))
+            if wake:
+                self._cond.notify_all()
+
+    def pop_due(self, now=None):
+        """Remove and return the ids of every entry whose deadline has passed"""
+        now = now or datetime.now()
+        due = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap)[1])
+        return due
+
+    def wait(self, stop_event, max_wait):
+        """Sleep until the next deadline, a schedule()/wake() call, or max_wait seconds"""
+        with self._cond:
+            if stop_event.is_set():
+                return
+            timeout = max_wait
+            if self._heap:
+                until_next = (self._heap[0][0] - datetime.now()).total_seconds()
+                timeout = max(0.0, min(timeout, until_next))
+            if timeout > 0:
+                self._cond.wait(timeout)
+
+    def wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._heap)
+
+warehouse_deadlines = WarehouseDeadlineQueue()
+_warehouse_scheduler = {'thread': None, 'stop': threading.Event()}
+_warehouse_scheduler_guard = threading.Lock()
+
+def _acquire_sweeper_lock():
+    """Try to become the one process that sweeps (e.g. among several gunicorn workers).
+
+    Returns the open lock file on success (keep it open to hold the lock), or None if
+    another process already holds it. The lock is released when the holder exits.
+    """
+    try:
+        os.makedirs(app.instance_path, exist_ok=True)
+        lock_file = open(os.path.join(app.instance_path, 'warehouse_sweeper.lock'), 'a+')
+    except OSError as e:
+        print(f"Warehouse sweeper lock unavailable: {e}")
+        return None
+    try:
+        if fcntl:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        elif msvcrt:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+def run_warehouse_sweep(item_ids=None):
+    """Run one warehouse deadline sweep outside of any user request"""
+    # A request context lets url_for() build the relative links used in emails/notifications
+    with app.test_request_context('/'):
+        try:
+            return check_warehouse_deadlines(item_ids)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Warehouse sweep failed: {e}")
+            return 0
+        finally:
+            db.session.remove()
+
+def _rebuild_warehouse_deadlines():
+    with app.app_context():
+        try:
+            count = warehouse_deadlines.rebuild()
+            print(f"Warehouse scheduler tracking {count} deadlines")
+        except Exception as e:
+            print(f"Warehouse deadline rebuild failed: {e}")
+        finally:
+            db.session.remove()
+
+def _next_warehouse_deadline():
+    """Earliest deadline of any open item, or None (one index lookup per status).
+
+    Items posted or re-opened through other processes are not in this process's heap;
+    polling this on every wakeup lets the sweeper see their deadlines anyway.
+    """
+    with app.app_context():
+        try:
+            deadlines = [
+                db.session.query(db.func.min(LostItem.warehouse_deadline)).filter(LostItem.status == status).scalar()
+                for status in ('lost', 'found')
+            ]
+        except Exception as e:
+            print(f"Warehouse deadline poll failed: {e}")
+            return None
+        finally:
+            db.session.remove()
+    deadlines = [deadline for deadline in deadlines if deadline is not None]
+    return min(deadlines) if deadlines else None
+
+def _rebuild_stale_match_engine():
+    if item_match_engine is None:
+        return
+    with app.app_context():
+        try:
+            item_match_engine.rebuild_if_stale()
+        except Exception as e:
+            print(f"Match engine rebuild failed: {e}")
+        finally:
+            db.session.remove()
+
+def _warehouse_scheduler_loop(stop_event):
+    lock_file = None
+    last_rebuild = None
+    last_prune = None
+    while not stop_event.is_set():
+        # Each process has its own match engine, so this runs whether or not it sweeps
+        _rebuild_stale_match_engine()
+        # Every process keeps trying, so another one takes over if the current sweeper dies
+        if lock_file is None:
+            lock_file = _acquire_sweeper_lock()
+            if lock_file is None:
+                stop_event.wait(max(1, app.config['WAREHOUSE_SWEEP_INTERVAL']))
+                continue
+            warehouse_deadlines.active = True
+            backfill_photo_hashes()
+        if last_rebuild is None or (datetime.now() - last_rebuild).total_seconds() >= app.config['WAREHOUSE_RESYNC_INTERVAL']:
+            _rebuild_warehouse_deadlines()
+            last_rebuild = datetime.now()
+        # One process is enough for outbox housekeeping too
+        if last_prune is None or (datetime.now() - last_prune).total_seconds() >= EMAIL_OUTBOX_PRUNE_INTERVAL:
+            run_email_outbox_prune()
+            last_prune = datetime.now()
+        due = warehouse_deadlines.pop_due()
+        # Deadlines set through other worker processes only show up in the poll
+        next_deadline = _next_warehouse_deadline()
+        if next_deadline is not None and next_deadline <= datetime.now():
+            run_warehouse_sweep()
+        elif due:
+            run_warehouse_sweep(due)
+        max_wait = min(
+            app.config['WAREHOUSE_RESYNC_INTERVAL'], app.config['MATCH_ENGINE_REBUILD_INTERVAL'],
+            max(1, app.config['WAREHOUSE_SWEEP_INTERVAL'])
+        )
+        if next_deadline is not None and next_deadline > datetime.now():
+            max_wait = min(max_wait, (next_deadline - datetime.now()).total_seconds())
+        warehouse_deadlines.wait(stop_event, max_wait=max_wait)
+    if lock_file is not None:
+        warehouse_deadlines.active = False
+        lock_file.close()
+
+def start_warehouse_scheduler():
+    """Start the background sweep thread for this process (idempotent)"""
+    with _warehouse_scheduler_guard:
+        thread = _warehouse_scheduler['thread']
+        if thread and thread.is_alive():
+            return thread
+        _warehouse_scheduler['stop'].clear()
+        thread = threading.Thread(
+            target=_warehouse_scheduler_loop,
+            args=(_warehouse_scheduler['stop'],),
+            name='warehouse-scheduler',
+            daemon=True
+        )
+        thread.start()
+        _warehouse_scheduler['thread'] = thread
+        if item_match_engine is not None:
+            item_match_engine.scheduled = True
+        return thread
+
+def stop_warehouse_scheduler():
+    _warehouse_scheduler['stop'].set()
+    warehouse_deadlines.wake()
+
+# ---------------- Match notification fan-out (background) ----------------
+# New posts only commit their own row; scoring candidates and notifying the owners of the
+# best matches happens on a worker thread, several posts per transaction.
+MATCH_FANOUT_LIMIT = 5
+MATCH_FANOUT_BATCH = 50
+_match_fanout = {'queue': queue.Queue(), 'thread': None}
+_match_fanout_guard = threading.Lock()
+
+def fan_out_item_matches(item_ids):
+    """Refresh stored matches of newly posted items and notify the other sides once per pair.
+
+    The batch's matches are refreshed together (refresh_items_matches), so the result doesn't
+    depend on the order of the items. All notifications of the batch go in with one bulk INSERT; MatchNotice (insert-or-ignore
+    with RETURNING) filters out pairs that were already announced. Returns the count sent.
+    """
+    items = LostItem.query.filter(LostItem.id.in_(list(item_ids)), LostItem.status.in_(['lost', 'found'])).all()
+    home_url = url_for('home', _external=False)
+    stored = refresh_items_matches(items, commit=False)
+    candidates = {}
+    for item in items:
+        for other, _ in stored[item.id][:MATCH_FANOUT_LIMIT]:
+            if not other.reported_by:
+                continue
+            lost, found = (item, other) if item.status == 'lost' else (other, item)
+            candidates.setdefault((lost.id, found.id), (item, other))
+    notification_rows = []
+    if candidates:
+        fresh = db.session.execute(
+            sqlite_insert(MatchNotice)
+            .values([{'lost_id': lost_id, 'found_id': found_id} for lost_id, found_id in candidates])
+            .on_conflict_do_nothing()
+            .returning(MatchNotice.lost_id, MatchNotice.found_id)
+        ).all()
+        for lost_id, found_id in fresh:
+            item, other = candidates[(lost_id, found_id)]
+            if item.status == 'lost':
+                title = 'Potential match for your found item'
+                message = f"A new lost report '{item.name}' may match your found item '{other.name}'."
+            else:
+                title = 'Potential match for your lost item'
+                message = f"A new found item '{item.name}' may match your lost item '{other.name}'."
+            notification_rows.append({
+                'user_id': other.reported_by,
+                'title': title,
+                'message': message,
+                'url': f"{home_url}#item-{item.id}",
+            })
+    if notification_rows:
+        db.session.execute(db.insert(Notification), notification_rows)
+    db.session.commit()
+    return len(notification_rows)
+
+def run_match_fanout(item_ids):
+    """Run one fan-out batch outside of any user request"""
+    with app.test_request_context('/'):
+        try:
+            return fan_out_item_matches(item_ids)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Match notification fan-out failed for items {list(item_ids)}: {e}")
+            return 0
+        finally:
+            db.session.remove()
+
+def _match_fanout_loop(jobs):
+    while True:
+        item_ids = [jobs.get()]
+        # Drain whatever else is waiting so a burst of posts shares one transaction
+        while len(item_ids) < MATCH_FANOUT_BATCH:
+            try:
+                item_ids.append(jobs.get_nowait())
+            except queue.Empty:
+                break
+        run_match_fanout(item_ids)
+        for _ in item_ids:
+            jobs.task_done()
+
+def enqueue_match_fanout(item_id):
+    """Queue match notifications for a freshly committed item (inline when MATCH_FANOUT_ASYNC is off)"""
+    if not app.config['MATCH_FANOUT_ASYNC'] or app.testing:
+        try:
+            return fan_out_item_matches([item_id])
+        except Exception as e:
+            db.session.rollback()
+            print(f"Match notification fan-out failed for item {item_id}: {e}")
+            return 0
+    with _match_fanout_guard:
+        thread = _match_fanout['thread']
+        if not (thread and thread.is_alive()):
+            thread = threading.Thread(
+                target=_match_fanout_loop,
+                args=(_match_fanout['queue'],),
+                name='match-fanout',
+                daemon=True
             )
-    return len(expired_items)
+            thread.start()
+            _match_fanout['thread'] = thread
+    _match_fanout['queue'].put(item_id)
+
+# ---------------- Email outbox worker ----------------
+# Requests only insert EmailOutbox rows; a worker delivers them, so a slow SMTP handshake
+# never holds up signup, posting or the warehouse sweep. Rows are claimed with a single
+# UPDATE ... RETURNING, so the thread in every serving process (and `flask email-worker`
+# next to them) can drain the same table without sending anything twice. Failed sends are
+# retried with exponential backoff; after EMAIL_MAX_ATTEMPTS, or on a permanent SMTP
+# rejection, the row is dead-lettered and its content printed like the old fallback.
+# Idle pollers only run a SELECT ... LIMIT 1; old sent rows are pruned by the one process
+# holding the warehouse sweeper lock.
+EMAIL_OUTBOX_BATCH = 50
+EMAIL_OUTBOX_PRUNE_INTERVAL = 3600
+email_pool = ThreadPoolExecutor(max_workers=max(1, app.config['EMAIL_WORKERS']), thread_name_prefix='email-worker')
+_email_outbox = {'thread': None, 'wake': threading.Event(), 'stop': threading.Event()}
+_email_outbox_guard = threading.Lock()
+
+def _claim_email_batch(limit=EMAIL_OUTBOX_BATCH):
+    now = datetime.now()
+    stale = now - timedelta(seconds=app.config['EMAIL_SENDING_TIMEOUT'])
+    is_due = ((EmailOutbox.status == 'pending') & (EmailOutbox.next_attempt_at <= now)) | \
+        ((EmailOutbox.status == 'sending') & (EmailOutbox.claimed_at <= stale))
+    # Every process polls: check with a read before taking SQLite's write lock for the claim
+    if db.session.execute(select(EmailOutbox.id).where(is_due).limit(1)).first() is None:
+        db.session.rollback()
+        return []
+    due = select(EmailOutbox.id).where(is_due).order_by(EmailOutbox.id).limit(limit)
+    rows = db.session.execute(
+        db.update(EmailOutbox)
+        .where(EmailOutbox.id.in_(due.scalar_subquery()))
+        .values(status='sending', claimed_at=now, attempts=EmailOutbox.attempts + 1)
+        .returning(EmailOutbox.id, EmailOutbox.subject, EmailOutbox.recipients, EmailOutbox.body,
+                   EmailOutbox.sender, EmailOutbox.attempts)
+    ).all()
+    db.session.commit()
+    return rows
+
+def _deliver_email_rows(rows):
+    """Send claimed rows over one SMTP connection; returns {id: None on success, else the error}"""
+    results = {}
+    with app.app_context():
+        default_sender = app.config.get('MAIL_DEFAULT_SENDER') or app.config.get('MAIL_USERNAME')
+        try:
+            with mail.connect() as conn:
+                for row in rows:
+                    try:
+                        msg = MailMessage(subject=row.subject, sender=row.sender or default_sender,
+                                          recipients=json.loads(row.recipients))
+                        msg.body = row.body
+                        conn.send(msg)
+                        results[row.id] = None
+                    except Exception as e:
+                        results[row.id] = e
+        except Exception as e:
+            for row in rows:
+                results.setdefault(row.id, e)
+    return results
+
+def _is_permanent_email_error(error):
+    """Rejections that retrying can't fix (unknown recipient, refused sender or content)"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    code = getattr(error, 'smtp_code', None)
+    return isinstance(error, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)) and code is not None and 500 <= code < 600
+
+def _record_email_results(rows, results, stats):
+    now = datetime.now()
+    updates = []
+    for row in rows:
+        error = results.get(row.id, RuntimeError('not attempted'))
+        if error is None:
+            updates.append({'id': row.id, 'status': 'sent', 'sent_at': now, 'last_error': None})
+            stats['sent'] += 1
+        elif row.attempts >= app.config['EMAIL_MAX_ATTEMPTS'] or _is_permanent_email_error(error):
+            updates.append({'id': row.id, 'status': 'dead', 'last_error': str(error)[:1000]})
+            stats['dead'] += 1
+            print(f"Email {row.id} dead-lettered after {row.attempts} attempts: {error}")
+            print(f"[EMAIL FALLBACK] Subject: {row.subject}\nTo: {', '.join(json.loads(row.recipients))}\n\n{row.body}")
+        else:
+            delay = min(app.config['EMAIL_RETRY_MAX'], app.config['EMAIL_RETRY_BASE'] * 2 ** (row.attempts - 1))
+            updates.append({
+                'id': row.id,
+                'status': 'pending',
+                # Jitter keeps retries of one outage from hitting the server all at once
+                'next_attempt_at': now + timedelta(seconds=delay * random.uniform(0.8, 1.2)),
+                'last_error': str(error)[:1000],
+            })
+            stats['retried'] += 1
+    if updates:
+        db.session.execute(db.update(EmailOutbox), updates)
+        db.session.commit()
+
+def drain_email_outbox(max_batches=None):
+    """Deliver every due outbox email, EMAIL_WORKERS SMTP connections at a time.
+
+    Returns counts of messages sent, scheduled for a retry and dead-lettered.
+    """
+    stats = {'sent': 0, 'retried': 0, 'dead': 0}
+    if not are_mail_credentials_present():
+        return stats
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        rows = _claim_email_batch()
+        if not rows:
+            break
+        batches += 1
+        workers = max(1, min(app.config['EMAIL_WORKERS'], len(rows)))
+        results = {}
+        for chunk_results in email_pool.map(_deliver_email_rows, [rows[i::workers] for i in range(workers)]):
+            results.update(chunk_results)
+        _record_email_results(rows, results, stats)
+    return stats
+
+def prune_email_outbox():
+    """Delete sent messages older than EMAIL_OUTBOX_RETENTION; dead letters are kept for review"""
+    cutoff = datetime.now() - timedelta(seconds=app.config['EMAIL_OUTBOX_RETENTION'])
+    deleted = EmailOutbox.query.filter(EmailOutbox.status == 'sent', EmailOutbox.sent_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+def run_email_outbox(prune=False):
+    """Run one outbox drain outside of any user request"""
+    with app.app_context():
+        try:
+            if prune:
+                prune_email_outbox()
+            stats = drain_email_outbox()
+            if any(stats.values()):
+                print(f"Email outbox: {stats}")
+            return stats
+        except Exception as e:
+            db.session.rollback()
+            print(f"Email outbox drain failed: {e}")
+            return None
+        finally:
+            db.session.remove()
+
+def run_email_outbox_prune():
+    """Prune the outbox outside of any user request (from the warehouse sweeper)"""
+    with app.app_context():
+        try:
+            deleted = prune_email_outbox()
+            if deleted:
+                print(f"Email outbox: pruned {deleted} sent messages")
+            return deleted
+        except Exception as e:
+            db.session.rollback()
+            print(f"Email outbox prune failed: {e}")
+            return 0
+        finally:
+            db.session.remove()
+
+def _email_outbox_loop(wake, stop_event):
+    while not stop_event.is_set():
+        wake.clear()
+        run_email_outbox()
+        wake.wait(max(1, app.config['EMAIL_OUTBOX_POLL_INTERVAL']))
+
+def start_email_outbox_worker():
+    """Start the outbox delivery thread for this process (idempotent)"""
+    with _email_outbox_guard:
+        thread = _email_outbox['thread']
+        if thread and thread.is_alive():
+            return thread
+        _email_outbox['stop'].clear()
+        thread = threading.Thread(
+            target=_email_outbox_loop,
+            args=(_email_outbox['wake'], _email_outbox['stop']),
+            name='email-outbox',
+            daemon=True
+        )
+        thread.start()
+        _email_outbox['thread'] = thread
+        return thread
+
+def stop_email_outbox_worker():
+    _email_outbox['stop'].set()
+    _email_outbox['wake'].set()
+
+def wake_email_worker():
+    """Tell this process's outbox thread that new mail is waiting (other processes poll)"""
+    if app.config['EMAIL_OUTBOX_WORKER_ENABLED'] and not app.testing:
+        start_email_outbox_worker()
+        _email_outbox['wake'].set()
+
+@app.before_request
+def _ensure_email_outbox_worker():
+    # Like the warehouse scheduler: only serving processes deliver, and retries left by a previous run resume
+    if app.config['EMAIL_OUTBOX_WORKER_ENABLED'] and not app.testing and _email_outbox['thread'] is None:
+        start_email_outbox_worker()
+
+@app.before_request
+def _ensure_warehouse_scheduler():
+    # Started lazily from the first request so only serving processes run it (not init_db.py or CLI commands)
+    if app.config['WAREHOUSE_SCHEDULER_ENABLED'] and not app.testing and _warehouse_scheduler['thread'] is None:
+        start_warehouse_scheduler()
+
+@app.cli.command('sweep-warehouse')
+def sweep_warehouse_command():
+    """Move items past their warehouse deadline once and exit."""
+    moved = run_warehouse_sweep()
+    print(f"Warehouse sweep moved {moved} items")
+
+@app.cli.command('warehouse-worker')
+def warehouse_worker_command():
+    """Run the warehouse deadline scheduler in the foreground (use with WAREHOUSE_SCHEDULER_ENABLED=false on web workers)."""
+    print(f"Warehouse worker started (resync every {app.config['WAREHOUSE_RESYNC_INTERVAL']}s)")
+    try:
+        _warehouse_scheduler_loop(_warehouse_scheduler['stop'])
+    except KeyboardInterrupt:
+        pass
+
+@app.cli.command('send-emails')
+@click.option('--retry-dead', is_flag=True, help='Put dead-lettered emails back in the queue first.')
+def send_emails_command(retry_dead):
+    """Deliver every due email in the outbox once and exit."""
+    if retry_dead:
+        requeued = EmailOutbox.query.filter_by(status='dead').update(
+            {'status': 'pending', 'attempts': 0, 'next_attempt_at': datetime.now()}, synchronize_session=False
+        )
+        db.session.commit()
+        print(f"Requeued {requeued} dead-lettered emails")
+    stats = run_email_outbox(prune=True) or {}
+    print(f"Sent {stats.get('sent', 0)} emails, {stats.get('retried', 0)} to retry, {stats.get('dead', 0)} dead-lettered")
+
+@app.cli.command('email-worker')
+def email_worker_command():
+    """Deliver outbox emails in the foreground (use with EMAIL_OUTBOX_WORKER_ENABLED=false on web workers)."""
+    print(f"Email worker started (polling every {app.config['EMAIL_OUTBOX_POLL_INTERVAL']}s)")
+    try:
+        _email_outbox_loop(_email_outbox['wake'], _email_outbox['stop'])
+    except KeyboardInterrupt:
+        pass
+
+@app.cli.command('migrate-uploads')
+def migrate_uploads_command():
+    """Move legacy per-upload files into the content-addressed store (deduplicating them)."""
+    migrated, freed = migrate_legacy_uploads()
+    print(f"Migrated {migrated} uploads into {UPLOAD_CAS_DIR}/, freed {freed / 1024 / 1024:.1f} MB")
+
+@app.cli.command('rehome-uploads')
+@click.option('--to', 'backend', type=click.Choice(['local', 's3']), default=None,
+              help='Target backend (defaults to UPLOAD_STORAGE).')
+def rehome_uploads_command(backend):
+    """Move uploads from the flat upload folder into the sharded layout of the storage backend."""
+    storage = make_upload_storage(backend)
+    moved = rehome_uploads(storage)
+    print(f"Re-homed {moved} files into {type(storage).__name__}")
+
+@app.cli.command('gc-uploads')
+@click.option('--dry-run', is_flag=True, help='Only report what would be quarantined or deleted.')
+@click.option('--quarantine-ttl', type=int, default=None, help='Seconds in quarantine before deletion (defaults to UPLOAD_QUARANTINE_TTL).')
+def gc_uploads_command(dry_run, quarantine_ttl):
+    """Quarantine unreferenced uploads and delete expired quarantined ones (run nightly from cron)."""
+    stats = collect_upload_garbage(dry_run=dry_run, quarantine_ttl=quarantine_ttl)
+    print(f"{'[dry run] ' if dry_run else ''}Scanned {stats['scanned']} files: "
+          f"quarantined {stats['quarantined']} ({stats['bytes_quarantined'] / 1024 / 1024:.1f} MB), "
+          f"restored {stats['restored']}, deleted {stats['purged']} quarantined and "
+          f"{stats['staging_removed']} staged files; reclaimed {stats['bytes_reclaimed'] / 1024 / 1024:.1f} MB")
+
+@app.cli.command('recount-uploads')
+def recount_uploads_command():
+    """Recompute reference counts of stored uploads from the database."""
+    recount_upload_refs()
+    print(f"Recounted {StoredUpload.query.count()} stored uploads")
+
+@app.cli.command('make-thumbnails')
+@click.option('--force', is_flag=True, help='Regenerate variants that already exist.')
+def make_thumbnails_command(force):
+    """Generate missing thumbnail and poster image variants for every uploaded image referenced from the database."""
+    names = [n for n in dict.fromkeys(_upload_references()) if _is_thumbnail_source(n)]
+    futures = [photo_pool.submit(generate_thumbnails, name, force) for name in names]
+    written = sum(future.result() for future in futures)
+    print(f"Wrote {written} thumbnails and poster images for {len(names)} uploads")
+
+@app.cli.command('hash-photos')
+def hash_photos_command():
+    """Compute perceptual hashes for every item photo (re-hashes all items)."""
+    item_ids = [row.id for row in db.session.query(LostItem.id).filter(LostItem.photo_filename.isnot(None)).all()]
+    for future in [enqueue_photo_hashing(item_id) for item_id in item_ids]:
+        if future is not None:
+            future.result()
+    print(f"Hashed photos of {len(item_ids)} items")
+
+def backfill_photo_hashes():
+    """Queue hashing of photos uploaded before hashing existed (or cut short by a crash).
+
+    Only the process that takes the sweeper lock runs it, not every serving process.
+    """
+    if Image is None:
+        return 0
+    with app.app_context():
+        try:
+            unhashed = [row.id for row in db.session.query(LostItem.id).filter(
+                LostItem.photo_hashes.is_(None), LostItem.photo_filename.isnot(None)
+            ).all()]
+        except Exception as e:
+            db.session.rollback()
+            print(f"Photo hash backfill skipped: {e}")
+            return 0
+        finally:
+            db.session.remove()
+    for item_id in unhashed:
+        enqueue_photo_hashing(item_id)
+    if unhashed:
+        print(f"Queued photo hashing for {len(unhashed)} items")
+    return len(unhashed)
+
+@app.cli.command('rebuild-lsh')
+def rebuild_lsh_command():
+    """Recompute MinHash signatures and the LSH banding index."""
+    rebuild_item_lsh_index()
+    print(f"Indexed {LostItem.query.count()} items into {LSH_BANDS} bands x {LSH_ROWS} rows")
+
+@app.cli.command('rebuild-matches')
+def rebuild_matches_command():
+    """Recompute all stored lost/found match suggestions (run nightly from cron)."""
+    rebuild_item_matches()
+    print(f"Stored {ItemMatch.query.count()} match suggestions")
 
 # Create Database Tables
 with app.app_context():
@@ -897,6 +3451,32 @@ with app.app_context():
             with db.engine.begin() as conn:
                 conn.execute(text('ALTER TABLE lost_item ADD COLUMN photo_filename VARCHAR(200)'))
                 print("Added column 'photo_filename' to lost_item table")
+        if 'match_tokens' not in columns:
+            with db.engine.begin() as conn:
+                conn.execute(text('ALTER TABLE lost_item ADD COLUMN match_tokens TEXT'))
+                print("Added column 'match_tokens' to lost_item table")
+        # Backfill token sets for rows written before the column existed
+        try:
+            pending = LostItem.query.with_entities(LostItem.id, LostItem.name, LostItem.description, LostItem.location)\
+                .filter(LostItem.match_tokens.is_(None)).all()
+            for start in range(0, len(pending), 1000):
+                db.session.execute(db.update(LostItem), [
+                    {'id': row.id, 'match_tokens': _compute_match_tokens(row)} for row in pending[start:start + 1000]
+                ])
+            if pending:
+                db.session.commit()
+                print(f"Backfilled match_tokens for {len(pending)} items")
+        except Exception as be:
+            db.session.rollback()
+            print(f"Backfill match_tokens skipped: {be}")
+        if 'photo_hashes' not in columns:
+            with db.engine.begin() as conn:
+                conn.execute(text('ALTER TABLE lost_item ADD COLUMN photo_hashes TEXT'))
+                print("Added column 'photo_hashes' to lost_item table")
+        if 'minhash' not in columns:
+            with db.engine.begin() as conn:
+                conn.execute(text('ALTER TABLE lost_item ADD COLUMN minhash BLOB'))
+                print("Added column 'minhash' to lost_item table")
         if 'photo_filenames' not in columns:
             with db.engine.begin() as conn:
                 conn.execute(text('ALTER TABLE lost_item ADD COLUMN photo_filenames TEXT'))
@@ -915,6 +3495,297 @@ with app.app_context():
     except Exception as e:
         # If inspection/alter fails, log and continue without blocking app start
         print(f"Migration check for photo_filename failed or skipped: {e}")
+    # create_all() does not add indexes to tables that already exist
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(text('CREATE INDEX IF NOT EXISTS ix_lost_item_status_created_id ON lost_item (status, created_at, id)'))
+            conn.execute(text('CREATE INDEX IF NOT EXISTS ix_lost_item_warehouse_deadline ON lost_item (warehouse_deadline)'))
+            conn.execute(text('CREATE INDEX IF NOT EXISTS ix_lost_item_status_deadline ON lost_item (status, warehouse_deadline)'))
+            # Duplicated the (item_id, position) primary key
+            conn.execute(text('DROP INDEX IF EXISTS ix_item_photo_item_id'))
+    except Exception as e:
+        print(f"Index check for lost_item listing failed or skipped: {e}")
+
+# ---------------- Full-text item search (SQLite FTS5) ----------------
+# External-content FTS5 index over lost_item(name, description, location), kept in
+# sync by triggers so every write path (ORM, raw SQL, bulk updates) stays covered.
+# The trigram tokenizer keeps the substring semantics of the old ILIKE '%kw%' search
+# ("phone" still finds "iphone"), for words of 3+ characters.
+ITEM_SEARCH_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS lost_item_fts USING fts5(
+        name, description, location,
+        content='lost_item', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS lost_item_fts_ai AFTER INSERT ON lost_item BEGIN
+        INSERT INTO lost_item_fts(rowid, name, description, location)
+        VALUES (new.id, new.name, new.description, new.location);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS lost_item_fts_ad AFTER DELETE ON lost_item BEGIN
+        INSERT INTO lost_item_fts(lost_item_fts, rowid, name, description, location)
+        VALUES ('delete', old.id, old.name, old.description, old.location);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS lost_item_fts_au AFTER UPDATE OF name, description, location ON lost_item BEGIN
+        INSERT INTO lost_item_fts(lost_item_fts, rowid, name, description, location)
+        VALUES ('delete', old.id, old.name, old.description, old.location);
+        INSERT INTO lost_item_fts(rowid, name, description, location)
+        VALUES (new.id, new.name, new.description, new.location);
+    END""",
+]
+# bm25() column weights for (name, description, location): a hit in the name counts most
+ITEM_SEARCH_BM25_WEIGHTS = (5.0, 1.0, 2.0)
+item_search = {'fts': False}
+
+def _ensure_item_search_index():
+    """Create the FTS5 index and triggers; backfill it the first time it is created"""
+    try:
+        with db.engine.begin() as conn:
+            existed = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'lost_item_fts'"
+            )).first() is not None
+            for ddl in ITEM_SEARCH_FTS_DDL:
+                conn.execute(text(ddl))
+            if not existed:
+                conn.execute(text("INSERT INTO lost_item_fts(lost_item_fts) VALUES ('rebuild')"))
+                print("Built full-text search index lost_item_fts")
+        item_search['fts'] = True
+    except Exception as e:
+        # SQLite without FTS5 (or another database): fall back to LIKE filters
+        item_search['fts'] = False
+        print(f"Full-text search unavailable, using LIKE filters: {e}")
+
+with app.app_context():
+    _ensure_item_search_index()
+    # One-time backfill of the match-suggestion inverted index
+    try:
+        if not db.session.query(ItemToken.item_id).first() and db.session.query(LostItem.id).first():
+            rebuild_item_token_index()
+            print("Built match token index item_token")
+    except Exception as e:
+        db.session.rollback()
+        print(f"Match token index backfill skipped: {e}")
+    # Backfill the LSH index, or re-band it when MATCH_LSH_THRESHOLD changed the band count
+    try:
+        band_count = db.session.query(db.func.max(ItemLshBand.band)).scalar()
+        if (band_count is None and db.session.query(LostItem.id).first()) or \
+                (band_count is not None and band_count + 1 != LSH_BANDS):
+            rebuild_item_lsh_index()
+            print(f"Built LSH match index item_lsh_band ({LSH_BANDS} bands x {LSH_ROWS} rows)")
+    except Exception as e:
+        db.session.rollback()
+        print(f"LSH match index backfill skipped: {e}")
+    # Convert the legacy photo_filename/photo_filenames columns into ItemPhoto rows
+    try:
+        legacy = LostItem.query.filter(LostItem.photo_filename.isnot(None), ~LostItem.photo_rows.any()).all()
+        if legacy:
+            rows = [
+                {'item_id': it.id, 'position': position, 'storage_key': name}
+                for it in legacy for position, name in enumerate(_legacy_photo_names(it))
+            ]
+            if rows:
+                db.session.execute(ItemPhoto.__table__.insert(), rows)
+            # Re-hash them below so the new rows get their size and per-photo hash
+            db.session.execute(db.update(LostItem).where(LostItem.id.in_([it.id for it in legacy])).values(photo_hashes=None))
+            db.session.commit()
+            print(f"Converted photos of {len(legacy)} items into item_photo ({len(rows)} rows)")
+    except Exception as e:
+        db.session.rollback()
+        print(f"Item photo conversion skipped: {e}")
+    # Stored pairs predating per-side lists are rebuilt by the backfill below
+    try:
+        with db.engine.begin() as conn:
+            columns = [row[1] for row in conn.execute(text("PRAGMA table_info(item_match)")).fetchall()]
+            if 'side' not in columns:
+                ItemMatch.__table__.drop(conn)
+                ItemMatch.__table__.create(conn)
+                print("Recreated item_match with per-side match lists")
+    except Exception as e:
+        print(f"item_match migration skipped: {e}")
+    # One-time backfill of stored match suggestions
+    try:
+        if not db.session.query(ItemMatch.lost_id).first() and \
+                db.session.query(LostItem.id).filter(LostItem.status.in_(['lost', 'found'])).first():
+            rebuild_item_matches()
+            print("Built stored match suggestions item_match")
+    except Exception as e:
+        db.session.rollback()
+        print(f"Match suggestion backfill skipped: {e}")
+
+# ---------------- Listing helpers (search filters + keyset pagination) ----------------
+# Cards per page for each home-page section; "Load more" fetches the next page by cursor
+HOME_PAGE_SIZES = {
+    'lost': 12,
+    'found': 12,
+    'warehouse': 6,
+}
+
+def _parse_item_filters(args):
+    """Read the home-page search filters (item, location, keyword, date range) from request args"""
+    def parse_date(value):
+        try:
+            if not value:
+                return None
+            # Accept YYYY-MM-DD
+            return datetime.strptime(value, '%Y-%m-%d')
+        except Exception:
+            return None
+
+    dt_to = parse_date(args.get('date_to', '').strip())
+    if dt_to:
+        # include the whole end day by adding almost one day and subtracting a microsecond
+        dt_to = dt_to + timedelta(days=1) - timedelta(microseconds=1)
+    return {
+        'item': args.get('item', '').strip(),
+        'location': args.get('location', '').strip(),
+        'keyword': args.get('keyword', '').strip(),
+        'date_from': parse_date(args.get('date_from', '').strip()),
+        'date_to': dt_to,
+    }
+
+_item_fts = table('lost_item_fts', column('rowid'))
+
+def _item_search_terms(value):
+    """Words of a search filter as FTS5 phrases, or None if the trigram index can't serve it"""
+    tokens = _tokenize_text(value)
+    if not tokens or any(len(t) < 3 for t in tokens):
+        return None
+    return ' '.join(f'"{t}"' for t in tokens)
+
+def _item_search_match(filters):
+    """Build the FTS5 MATCH expression for the item/location/keyword filters, or None.
+
+    Every word must appear (as a substring); 'item' is limited to the name column and
+    'location' to the location column. Filters it can't serve are left to LIKE.
+    """
+    if not item_search['fts']:
+        return None
+    parts = []
+    for column_name, value in (('name', filters['item']), ('location', filters['location']), (None, filters['keyword'])):
+        terms = _item_search_terms(value)
+        if not terms:
+            continue
+        parts.append(f'{column_name} : ({terms})' if column_name else f'({terms})')
+    return ' AND '.join(parts) or None
+
+def _item_search_ranked(match):
+    """Subquery of (item_id, rank) for an FTS5 match; lower rank is a better BM25 score"""
+    fts_ref = literal_column('lost_item_fts')
+    return select(
+        _item_fts.c.rowid.label('item_id'),
+        db.func.bm25(fts_ref, *ITEM_SEARCH_BM25_WEIGHTS).label('rank')
+    ).where(fts_ref.op('MATCH')(match)).subquery()
+
+def _apply_item_filters(query, filters, text_search=True):
+    match = _item_search_match(filters)
+    if match and text_search:
+        query = query.filter(LostItem.id.in_(
+            select(_item_fts.c.rowid).where(literal_column('lost_item_fts').op('MATCH')(match))
+        ))
+    # Filters the FTS index can't serve (no FTS5, or words shorter than a trigram) keep the LIKE path
+    if filters['item'] and not (match and _item_search_terms(filters['item'])):
+        query = query.filter(LostItem.name.ilike(f"%{filters['item']}%"))
+    if filters['location'] and not (match and _item_search_terms(filters['location'])):
+        query = query.filter(LostItem.location.ilike(f"%{filters['location']}%"))
+    if filters['keyword'] and not (match and _item_search_terms(filters['keyword'])):
+        like = f"%{filters['keyword']}%"
+        query = query.filter(
+            (LostItem.description.ilike(like)) |
+            (LostItem.name.ilike(like)) |
+            (LostItem.location.ilike(like))
+        )
+    if filters['date_from']:
+        query = query.filter(LostItem.created_at >= filters['date_from'])
+    if filters['date_to']:
+        query = query.filter(LostItem.created_at <= filters['date_to'])
+    return query
+
+def _encode_item_cursor(item, rank=None):
+    """Opaque "load more" cursor: the (created_at, id) of the last item on a page, or (rank, id) for searches"""
+    if rank is not None:
+        return f"r{rank!r}_{item.id}"
+    return f"{item.created_at.strftime('%Y%m%d%H%M%S%f')}_{item.id}"
+
+def _decode_item_cursor(value):
+    try:
+        key, item_id = (value or '').rsplit('_', 1)
+        if key.startswith('r'):
+            return 'rank', float(key[1:]), int(item_id)
+        return 'created', datetime.strptime(key, '%Y%m%d%H%M%S%f'), int(item_id)
+    except Exception:
+        return None
+
+def _stored_timestamp(dt):
+    # created_at is filled by SQLite's CURRENT_TIMESTAMP ("YYYY-MM-DD HH:MM:SS", no fraction), while
+    # SQLAlchemy binds datetimes with microseconds; compare against the stored text form so the
+    # keyset predicate agrees with ORDER BY created_at
+    text_ts = dt.strftime('%Y-%m-%d %H:%M:%S')
+    return f"{text_ts}.{dt.microsecond:06d}" if dt.microsecond else text_ts
+
+def get_item_page(status, filters, cursor=None, limit=12):
+    """Return (items, next_cursor) for one page of a status.
+
+    Uses keyset pagination so each page reads at most limit + 1 rows no matter how deep
+    the user has scrolled: newest first on (created_at, id), or best BM25 match first on
+    (rank, id) when a text search is served by the FTS index.
+    """
+    match = _item_search_match(filters)
+    query = _apply_item_filters(LostItem.query.filter_by(status=status), filters, text_search=False)
+    position = _decode_item_cursor(cursor)
+    if match:
+        ranked = _item_search_ranked(match)
+        query = query.join(ranked, ranked.c.item_id == LostItem.id).add_columns(ranked.c.rank)
+        if position and position[0] == 'rank':
+            _, after_rank, after_id = position
+            query = query.filter(or_(
+                ranked.c.rank > after_rank,
+                and_(ranked.c.rank == after_rank, LostItem.id < after_id)
+            ))
+        rows = query.order_by(ranked.c.rank.asc(), LostItem.id.desc()).limit(limit + 1).all()
+        items = [row[0] for row in rows[:limit]]
+        next_cursor = _encode_item_cursor(items[-1], rank=rows[limit - 1][1]) if len(rows) > limit else None
+        return items, next_cursor
+
+    if position and position[0] == 'created':
+        _, after_ts, after_id = position
+        created_text = type_coerce(LostItem.created_at, db.String)
+        after_text = _stored_timestamp(after_ts)
+        query = query.filter(or_(
+            created_text < after_text,
+            and_(created_text == after_text, LostItem.id < after_id)
+        ))
+    rows = query.order_by(LostItem.created_at.desc(), LostItem.id.desc()).limit(limit + 1).all()
+    items = rows[:limit]
+    next_cursor = _encode_item_cursor(items[-1]) if len(rows) > limit and items[-1].created_at else None
+    return items, next_cursor
+
+def attach_item_details(items):
+    """Bulk-load photos and attach poster info (points/badges) for template consumption (non-persistent attributes).
+
+    Photos, posters, their UserPoints and their UserBadges are fetched with one IN-query each
+    for the whole batch, so a page costs a constant number of queries instead of four per card.
+    """
+    poster_ids = {it.reported_by for it in items if it.reported_by}
+    posters = {}
+    points_by_user = {}
+    badges_by_user = {}
+    if poster_ids:
+        posters = {u.id: u for u in User.query.filter(User.id.in_(poster_ids)).all()}
+        for up in UserPoints.query.filter(UserPoints.user_id.in_(poster_ids)).all():
+            # Mirror get_user_return_points(): first row per user wins
+            points_by_user.setdefault(up.user_id, up.return_points or 0)
+        badge_rows = UserBadge.query.filter(UserBadge.user_id.in_(poster_ids))\
+            .order_by(UserBadge.unlocked_at.desc()).all()
+        for badge in badge_rows:
+            badges_by_user.setdefault(badge.user_id, []).append(badge)
+        for user_id, user in posters.items():
+            user.return_points = points_by_user.get(user_id, 0)
+            # Populate the backref as already-loaded so templates don't trigger a lazy load per poster
+            set_committed_value(user, 'badges', badges_by_user.get(user_id, []))
+
+    load_item_photos(items)
+    for it in items:
+        # Attach user information for report functionality and points/badges
+        it.poster = posters.get(it.reported_by) if it.reported_by else None
+    return items
 
 # ------------ Routes ------------
 
@@ -948,7 +3819,7 @@ def profile():
                 original = secure_filename(file.filename)
                 temp_token = secrets.token_hex(8)
                 temp_name = f"user_{user.id}_pending_{temp_token}_{original}"
-                temp_path = os.path.join(app.config['UPLOAD_FOLDER'], temp_name)
+                temp_path = os.path.join(app.config['UPLOAD_STAGING_FOLDER'], temp_name)
                 file.save(temp_path)
                 pending['profile_photo_filename'] = temp_name
 
@@ -998,144 +3869,40 @@ def profile():
 # Home Route (Displays Lost and Found Items)
 @app.route("/")
 def home():
-    # Check for expired items and move them to warehouse
-    check_warehouse_deadlines()
-    
+    # Expired items are moved to the warehouse by the background scheduler; this view only reads
     # --- Search Filters ---
-    item_name = request.args.get('item', '').strip()
-    location = request.args.get('location', '').strip()
-    keyword = request.args.get('keyword', '').strip()
-    date_from = request.args.get('date_from', '').strip()
-    date_to = request.args.get('date_to', '').strip()
+    filters = _parse_item_filters(request.args)
 
-    def parse_date(value):
-        try:
-            if not value:
-                return None
-            # Accept YYYY-MM-DD
-            return datetime.strptime(value, '%Y-%m-%d')
-        except Exception:
-            return None
+    # First page of each section; "Load more" pulls later pages from /items/<section>
+    lost_items, lost_next_cursor = get_item_page('lost', filters, limit=HOME_PAGE_SIZES['lost'])
+    found_items, found_next_cursor = get_item_page('found', filters, limit=HOME_PAGE_SIZES['found'])
+    warehouse_items, warehouse_next_cursor = get_item_page('warehouse', filters, limit=HOME_PAGE_SIZES['warehouse'])
 
-    dt_from = parse_date(date_from)
-    dt_to = parse_date(date_to)
-    if dt_to:
-        # include the whole end day by adding almost one day and subtracting a microsecond
-        dt_to = dt_to + timedelta(days=1) - timedelta(microseconds=1)
-
-    def apply_filters(query):
-        if item_name:
-            query = query.filter(LostItem.name.ilike(f"%{item_name}%"))
-        if location:
-            query = query.filter(LostItem.location.ilike(f"%{location}%"))
-        if keyword:
-            like = f"%{keyword}%"
-            query = query.filter(
-                (LostItem.description.ilike(like)) |
-                (LostItem.name.ilike(like)) |
-                (LostItem.location.ilike(like))
-            )
-        if dt_from:
-            query = query.filter(LostItem.created_at >= dt_from)
-        if dt_to:
-            query = query.filter(LostItem.created_at <= dt_to)
-        return query
-
-    # Get items by status - ensure we only get items that actually exist
-    lost_items = apply_filters(
-        LostItem.query.filter_by(status='lost')
-    ).order_by(LostItem.created_at.desc()).all()
-    
-    found_items = apply_filters(
-        LostItem.query.filter_by(status='found')
-    ).order_by(LostItem.created_at.desc()).all()
-    
     # Debug: Print item counts to verify deletion
-    print(f"DEBUG: Found {len(lost_items)} lost items and {len(found_items)} found items")
-    # Apply filters to warehouse as well; cap to 6 only when no filters provided
-    base_warehouse_q = apply_filters(
-        LostItem.query.filter_by(status='warehouse')
-    ).order_by(LostItem.created_at.desc())
-    if any([item_name, location, keyword, dt_from, dt_to]):
-        warehouse_items = base_warehouse_q.all()
-    else:
-        warehouse_items = base_warehouse_q.limit(6).all()
-    
-    # Attach parsed photo lists and user info for template consumption (non-persistent attribute)
-    def attach_photos(items):
-        for it in items:
-            photos = []
-            if it.photo_filenames:
-                try:
-                    data = json.loads(it.photo_filenames)
-                    if isinstance(data, list):
-                        photos = [p for p in data if isinstance(p, str)]
-                except Exception:
-                    photos = []
-            elif it.photo_filename:
-                photos = [it.photo_filename]
-            it.photos = photos
-            
-            # Attach user information for report functionality and points/badges
-            if it.reported_by:
-                it.poster = db.session.get(User, it.reported_by)
-                if it.poster:
-                    it.poster.return_points = get_user_return_points(it.poster.id)
-                    it.poster.badges = get_user_badges(it.poster.id)
-            else:
-                it.poster = None
-        return items
-    
+    print(f"DEBUG: Showing {len(lost_items)} lost items and {len(found_items)} found items")
+
     # --- Matching Suggestions (for the logged-in user's lost posts) ---
     suggestions = []
     try:
         current_user_id = session.get('user_id')
         if current_user_id:
-            my_lost = [it for it in lost_items if it.reported_by == current_user_id]
-            # Only compare against recent found items to keep it light
-            recent_found = found_items[:50]
-
-            def tokenize(text):
-                text = (text or '').lower()
-                text = re.sub(r"[^a-z0-9\s]", " ", text)
-                return [t for t in text.split() if t]
-
-            def score_match(a: LostItem, b: LostItem) -> float:
-                a_tokens = set(tokenize(a.name) + tokenize(a.description) + tokenize(a.location))
-                b_tokens = set(tokenize(b.name) + tokenize(b.description) + tokenize(b.location))
-                if not a_tokens or not b_tokens:
-                    return 0.0
-                inter = len(a_tokens & b_tokens)
-                union = len(a_tokens | b_tokens)
-                jaccard = inter / union
-                # Light weighting for value proximity when both provided
-                value_bonus = 0.0
-                if a.value is not None and b.value is not None:
-                    try:
-                        diff = abs(float(a.value) - float(b.value))
-                        base = max(1.0, max(float(a.value), float(b.value)))
-                        value_bonus = max(0.0, 0.2 - (diff / base))
-                    except Exception:
-                        value_bonus = 0.0
-                # Location exact match small bump
-                loc_bonus = 0.1 if (a.location and b.location and a.location.strip().lower() == b.location.strip().lower()) else 0.0
-                return jaccard + value_bonus + loc_bonus
-
-            def has_token_overlap(a: LostItem, b: LostItem) -> bool:
-                a_tokens = set(tokenize(a.name) + tokenize(a.description) + tokenize(a.location))
-                b_tokens = set(tokenize(b.name) + tokenize(b.description) + tokenize(b.location))
-                return len(a_tokens & b_tokens) >= 1
-
-            # Build scored pairs
+            # The listing is paginated, so read the user's own lost posts directly
+            my_lost = _apply_item_filters(
+                LostItem.query.filter_by(status='lost', reported_by=current_user_id), filters
+            ).order_by(LostItem.created_at.desc()).all()
+            # Stored pairs (kept fresh on every item change), best first per lost item
+            matches_by_lost = {}
+            if my_lost:
+                stored = _apply_item_filters(
+                    db.session.query(LostItem, ItemMatch.lost_id)
+                    .join(ItemMatch, ItemMatch.found_id == LostItem.id)
+                    .filter(ItemMatch.side == 'lost', ItemMatch.lost_id.in_([my.id for my in my_lost]), LostItem.status == 'found'),
+                    filters
+                ).order_by(ItemMatch.score.desc(), LostItem.id.desc()).all()
+                for other, lost_id in stored:
+                    matches_by_lost.setdefault(lost_id, []).append(other)
             for my in my_lost:
-                scored = [
-                    (other, score_match(my, other))
-                    for other in recent_found
-                ]
-                # Keep if score passes threshold OR there is at least one shared token
-                scored = [s for s in scored if (s[1] >= 0.12) or has_token_overlap(my, s[0])]
-                scored.sort(key=lambda x: x[1], reverse=True)
-                top = [x[0] for x in scored[:5]]
+                top = matches_by_lost.get(my.id, [])[:5]
                 if top:
                     suggestions.append({
                         'lost': my,
@@ -1144,10 +3911,15 @@ def home():
     except Exception:
         suggestions = []
 
+    attach_item_details([s['lost'] for s in suggestions] + [m for s in suggestions for m in s['matches']])
+
     return render_template("home.html", 
-                         lost_items=attach_photos(lost_items), 
-                         found_items=attach_photos(found_items), 
-                         warehouse_items=attach_photos(warehouse_items),
+                         lost_items=attach_item_details(lost_items), 
+                         found_items=attach_item_details(found_items), 
+                         warehouse_items=attach_item_details(warehouse_items),
+                         lost_next_cursor=lost_next_cursor,
+                         found_next_cursor=found_next_cursor,
+                         warehouse_next_cursor=warehouse_next_cursor,
                          match_suggestions=[
                              {
                                  'lost': {
@@ -1168,33 +3940,32 @@ def home():
                                  ]
                              } for s in suggestions
                          ],
-                         q_item=item_name,
-                         q_location=location,
-                         q_keyword=keyword,
+                         q_item=filters['item'],
+                         q_location=filters['location'],
+                         q_keyword=filters['keyword'],
                          q_date_from=request.args.get('date_from', ''),
                          q_date_to=request.args.get('date_to', ''))
 
+# Next page of cards for a home-page section ("Load more"), same filters as home()
+@app.route("/items/<section>", methods=["GET"])
+def load_more_items(section):
+    if section not in HOME_PAGE_SIZES:
+        return jsonify({'error': 'Unknown section'}), 404
+    filters = _parse_item_filters(request.args)
+    items, next_cursor = get_item_page(
+        section, filters,
+        cursor=request.args.get('cursor'),
+        limit=HOME_PAGE_SIZES[section]
+    )
+    html = render_template('item_cards.html', items=attach_item_details(items), section=section)
+    return jsonify({'html': html, 'next_cursor': next_cursor})
+
 @app.route("/warehouse")
 def warehouse():
     # Show only warehouse items in a dedicated tab/page
     items = LostItem.query.filter_by(status='warehouse').order_by(LostItem.created_at.desc()).all()
 
-    def attach_photos_single(items_list):
-        for it in items_list:
-            photos = []
-            if it.photo_filenames:
-                try:
-                    data = json.loads(it.photo_filenames)
-                    if isinstance(data, list):
-                        photos = [p for p in data if isinstance(p, str)]
-                except Exception:
-                    photos = []
-            elif it.photo_filename:
-                photos = [it.photo_filename]
-            it.photos = photos
-        return items_list
-
-    return render_template('warehouse.html', warehouse_items=attach_photos_single(items))
+    return render_template('warehouse.html', warehouse_items=load_item_photos(items))
 
 # Create a Lost Item (POST)
 @app.route("/add_product", methods=["POST"])
@@ -1213,34 +3984,28 @@ def add_lost_item():
     description = request.form.get("description")
     
     # Handle optional multiple photo uploads
-    photo_filenames_list = []
     files = []
     if 'item_photos' in request.files:
         files = request.files.getlist('item_photos')
     elif 'item_photo' in request.files:  # backward compat single input
         single = request.files.get('item_photo')
         files = [single] if single else []
-    for file in files:
-        if file and file.filename != '' and allowed_file(file.filename):
-            original = secure_filename(file.filename)
-            token = secrets.token_hex(8)
-            reporter_id = session.get('user_id', 'anon')
-            unique_name = f"user_{reporter_id}_{token}_{original}"
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_name)
-            file.save(file_path)
-            photo_filenames_list.append(unique_name)
+    photo_filenames_list = store_uploads(f for f in files if f and f.filename != '' and allowed_file(f.filename))
 
     new_item = LostItem(
         name=name, 
         value=value if value else None, 
         description=description,
-        photo_filename=photo_filenames_list[0] if photo_filenames_list else None,
-        photo_filenames=json.dumps(photo_filenames_list) if photo_filenames_list else None,
         reported_by=session.get('user_id') if 'user_id' in session else None,
         warehouse_deadline=calculate_warehouse_deadline()
     )
+    add_item_photos(new_item, photo_filenames_list)
     db.session.add(new_item)
     db.session.commit()
+    warehouse_deadlines.schedule(new_item.id, new_item.warehouse_deadline)
+    hashing = enqueue_photo_hashing(new_item.id, fan_out=True) if photo_filenames_list else None
+    if photo_filenames_list:
+        enqueue_thumbnails(photo_filenames_list)
     
     # Log item creation activity
     if 'user_id' in session and session.get('user_id'):
@@ -1268,29 +4033,10 @@ def add_lost_item():
                 url=f"{url_for('home', _external=False)}#item-{new_item.id}"
             )
     
-    # Notify potential finders whose found items may match this lost report
-    try:
-        recent_found = LostItem.query.filter_by(status='found').order_by(LostItem.created_at.desc()).limit(100).all()
-        candidate_pairs = []
-        for f in recent_found:
-            score = _match_score(new_item, f)
-            if (score >= 0.12) or _has_token_overlap(new_item, f):
-                candidate_pairs.append((f, score))
-        candidate_pairs.sort(key=lambda x: x[1], reverse=True)
-        top_matches = [p[0] for p in candidate_pairs[:5]]
-        for match in top_matches:
-            if match.reported_by:
-                try:
-                    create_notification(
-                        user_id=match.reported_by,
-                        title='Potential match for your found item',
-                        message=f"A new lost report '{new_item.name}' may match your found item '{match.name}'.",
-                        url=f"{url_for('home', _external=False)}#item-{new_item.id}"
-                    )
-                except Exception:
-                    pass
-    except Exception:
-        pass
+    # Notify potential finders whose found items may match this lost report (background job,
+    # chained after photo hashing when there are photos)
+    if hashing is None:
+        enqueue_match_fanout(new_item.id)
 
     flash('Lost item reported successfully! Will be sent to warehouse in 150 hours if not claimed.')
     return redirect("/")
@@ -1313,36 +4059,30 @@ def report_found_item():
     location = request.form.get("location")
     
     # Handle optional multiple photo uploads
-    photo_filenames_list = []
     files = []
     if 'item_photos' in request.files:
         files = request.files.getlist('item_photos')
     elif 'item_photo' in request.files:  # backward compat single input
         single = request.files.get('item_photo')
         files = [single] if single else []
-    for file in files:
-        if file and file.filename != '' and allowed_file(file.filename):
-            original = secure_filename(file.filename)
-            token = secrets.token_hex(8)
-            reporter_id = session.get('user_id', 'anon')
-            unique_name = f"user_{reporter_id}_{token}_{original}"
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_name)
-            file.save(file_path)
-            photo_filenames_list.append(unique_name)
+    photo_filenames_list = store_uploads(f for f in files if f and f.filename != '' and allowed_file(f.filename))
 
     new_item = LostItem(
         name=name,
         value=value if value else None,
         description=description,
         location=location,
-        photo_filename=photo_filenames_list[0] if photo_filenames_list else None,
-        photo_filenames=json.dumps(photo_filenames_list) if photo_filenames_list else None,
         status='found',  # Mark as found immediately
         reported_by=session['user_id'],  # The person who found it
         warehouse_deadline=calculate_warehouse_deadline()
     )
+    add_item_photos(new_item, photo_filenames_list)
     db.session.add(new_item)
     db.session.commit()
+    warehouse_deadlines.schedule(new_item.id, new_item.warehouse_deadline)
+    hashing = enqueue_photo_hashing(new_item.id, fan_out=True) if photo_filenames_list else None
+    if photo_filenames_list:
+        enqueue_thumbnails(photo_filenames_list)
     
     # Log item creation activity
     log_activity(
@@ -1358,29 +4098,10 @@ def report_found_item():
         }
     )
     
-    # Notify owners of similar recent lost items
-    try:
-        recent_lost = LostItem.query.filter_by(status='lost').order_by(LostItem.created_at.desc()).limit(100).all()
-        candidate_pairs = []
-        for lost in recent_lost:
-            score = _match_score(lost, new_item)
-            if (score >= 0.12) or _has_token_overlap(lost, new_item):
-                candidate_pairs.append((lost, score))
-        candidate_pairs.sort(key=lambda x: x[1], reverse=True)
-        top_matches = [p[0] for p in candidate_pairs[:5]]
-        for match in top_matches:
-            if match.reported_by:
-                try:
-                    create_notification(
-                        user_id=match.reported_by,
-                        title='Potential match for your lost item',
-                        message=f"A new found item '{new_item.name}' may match your lost item '{match.name}'.",
-                        url=f"{url_for('home', _external=False)}#item-{new_item.id}"
-                    )
-                except Exception:
-                    pass
-    except Exception:
-        pass
+    # Notify owners of lost items that may match this find (background job, chained after
+    # photo hashing when there are photos)
+    if hashing is None:
+        enqueue_match_fanout(new_item.id)
 
     # Notify the reporter (finder)
     reporter = db.session.get(User, session['user_id'])
@@ -1471,14 +4192,261 @@ def get_time_remaining(item_id):
         'warehouse_deadline': item.warehouse_deadline.isoformat() if item.warehouse_deadline else None
     }), 200
 
+# ---------------- Poster cache ----------------
+# Rendered posters are kept on disk as <item id>-<version>.pdf, where the version hashes
+# everything the PDF shows, so a changed item can never hit a stale file. Edits and status
+# changes also drop the item's old files right away. Hits touch the file's mtime and the
+# least recently used posters are evicted once the folder passes POSTER_CACHE_MAX_BYTES.
+POSTER_LAYOUT_VERSION = 3  # bump whenever render_poster_pdf draws something different
+poster_cache_lock = threading.Lock()
+
+def poster_version(item, item_url):
+    """Content version of an item's poster (also used as its ETag)"""
+    parts = [
+        POSTER_LAYOUT_VERSION, item.id, item.name, item.description, item.status, item.value, item.location,
+        item.created_at, item.photos[:POSTER_PHOTO_LIMIT], item_url,
+    ]
+    return hashlib.sha256(json.dumps(parts, default=str).encode('utf-8')).hexdigest()[:32]
+
+def _poster_cache_path(item_id, version):
+    return os.path.join(app.config['POSTER_CACHE_FOLDER'], f"{item_id}-{version}.pdf")
+
+def cached_poster(item_id, version):
+    """Path of the cached poster for this version (marked as recently used), or None"""
+    path = _poster_cache_path(item_id, version)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+def store_poster(item_id, version, pdf):
+    """Write a freshly rendered poster into the cache and enforce the size cap"""
+    path = _poster_cache_path(item_id, version)
+    fd, temp = tempfile.mkstemp(dir=app.config['POSTER_CACHE_FOLDER'], suffix='.part')
+    with os.fdopen(fd, 'wb') as out:
+        out.write(pdf)
+    os.replace(temp, path)
+    invalidate_posters([item_id], keep=path)
+    _evict_posters(keep=path)
+    return path
+
+def invalidate_posters(item_ids, keep=None):
+    """Delete the cached posters of these items"""
+    prefixes = tuple(f"{item_id}-" for item_id in item_ids)
+    if not prefixes:
+        return
+    with poster_cache_lock, os.scandir(app.config['POSTER_CACHE_FOLDER']) as entries:
+        for entry in entries:
+            if entry.name.endswith('.pdf') and entry.name.startswith(prefixes) and entry.path != keep:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+def _evict_posters(keep=None):
+    limit = app.config['POSTER_CACHE_MAX_BYTES']
+    with poster_cache_lock:
+        files = []
+        with os.scandir(app.config['POSTER_CACHE_FOLDER']) as entries:
+            for entry in entries:
+                if entry.name.endswith('.pdf') and entry.path != keep:
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+@event.listens_for(LostItem, 'after_update')
+def _invalidate_posters_on_update(mapper, connection, target):
+    state = db.inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in ('name', 'description', 'location', 'value', 'status', 'photo_filename')):
+        invalidate_posters([target.id])
+
+@event.listens_for(LostItem, 'after_delete')
+def _invalidate_posters_on_delete(mapper, connection, target):
+    invalidate_posters([target.id])
+
+# ---------------- Poster rendering pool ----------------
+# ReportLab is CPU-bound, so larger posters render in worker processes instead of the request
+# thread. The request reads the photos and hands over a plain snapshot; render_poster_pdf
+# (in poster_render.py, which has no import side effects) touches neither the DB nor upload
+# storage. The pool is created on the first pooled render, so servers that never print a
+# large poster start no workers, and its workers come from a forkserver (spawn where that
+# is missing): they start from a fresh interpreter instead of a copy of a threaded server
+# process, and only load poster_render (plus the main script, as multiprocessing always
+# does, so `python app.py` dev runs re-import the app there). With POSTER_WORKERS=0, or if
+# the pool can't be used, posters render inline; a broken pool is replaced on the next
+# pooled render.
+# Job ids are "<item id>-<version>": repeated requests join the same render, and any process
+# can answer a status poll from the shared poster cache.
+_POSTER_JOB_ID = re.compile(r'^(\d+)-([0-9a-f]{32})$')
+_poster_pool = {'executor': None}
+_poster_pool_lock = threading.Lock()
+poster_jobs = {}
+poster_jobs_lock = threading.Lock()
+
+def _get_poster_pool():
+    """This process's poster pool, created on first use (None when POSTER_WORKERS is 0)"""
+    if app.config['POSTER_WORKERS'] <= 0:
+        return None
+    with _poster_pool_lock:
+        if _poster_pool['executor'] is None:
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload(['poster_render'])
+            else:
+                context = multiprocessing.get_context('spawn')
+            _poster_pool['executor'] = ProcessPoolExecutor(max_workers=app.config['POSTER_WORKERS'], mp_context=context)
+        return _poster_pool['executor']
+
+def _reset_poster_pool():
+    with _poster_pool_lock:
+        executor, _poster_pool['executor'] = _poster_pool['executor'], None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def poster_snapshot(item, item_url, skip_photos=()):
+    """Picklable copy of everything an item's poster shows, photo bytes included
+    (except for names in skip_photos, which the caller already has decoded)"""
+    photos = []
+    for name in item.photos[:POSTER_PHOTO_LIMIT]:
+        if name in skip_photos:
+            photos.append((name, None))
+            continue
+        try:
+            # The pre-scaled variant keeps render time and PDF size down; originals are the fallback
+            with upload_storage.open(poster_image(name) or name) as src:
+                photos.append((name, src.read()))
+        except Exception as e:
+            print(f"Poster photo '{name}' unavailable: {e}")
+    return SimpleNamespace(
+        id=item.id, name=item.name, status=item.status, value=item.value, location=item.location,
+        created_at=item.created_at, description=item.description, photos=photos, url=item_url,
+    )
+
+def _finish_poster_job(job_id, job, rendered):
+    try:
+        job.set_result(store_poster(int(job_id.split('-', 1)[0]), job_id.split('-', 1)[1], rendered.result()))
+    except Exception as e:
+        print(f"Poster job {job_id} failed: {e}")
+        if isinstance(e, BrokenProcessPool):
+            _reset_poster_pool()
+        job.set_exception(e)
+        return
+    with poster_jobs_lock:
+        if poster_jobs.get(job_id) is job:
+            del poster_jobs[job_id]
+
+def submit_poster_job(snapshot, version):
+    """Start (or join) the render of a poster; returns (job id, Future of the cached path)"""
+    job_id = f"{snapshot.id}-{version}"
+    with poster_jobs_lock:
+        job = poster_jobs.get(job_id)
+        if job is not None and not (job.done() and job.exception() is not None):
+            return job_id, job
+        job = poster_jobs[job_id] = Future()
+    inline = sum(len(data) for _, data in snapshot.photos) <= app.config['POSTER_INLINE_MAX_BYTES']
+    pool = None if inline else _get_poster_pool()
+    if pool is not None:
+        try:
+            pool.submit(render_poster_pdf, snapshot).add_done_callback(
+                lambda rendered: _finish_poster_job(job_id, job, rendered)
+            )
+            return job_id, job
+        except (BrokenProcessPool, RuntimeError) as e:
+            # Broken, or shut down by _reset_poster_pool in another thread
+            print(f"Poster pool unavailable, rendering inline: {e}")
+            _reset_poster_pool()
+    inline_job = Future()
+    try:
+        inline_job.set_result(render_poster_pdf(snapshot))
+    except Exception as e:
+        inline_job.set_exception(e)
+    _finish_poster_job(job_id, job, inline_job)
+    return job_id, job
+
+def poster_job_state(job_id):
+    """'pending', 'done', 'failed' or None for a job this deployment knows nothing about"""
+    match = _POSTER_JOB_ID.match(job_id)
+    if not match:
+        return None
+    with poster_jobs_lock:
+        job = poster_jobs.get(job_id)
+    if job is not None and not job.done():
+        return 'pending'
+    if job is not None and job.exception() is not None:
+        return 'failed'
+    return 'done' if cached_poster(int(match.group(1)), match.group(2)) else None
+
+def _poster_job_json(job_id, state):
+    payload = {'job_id': job_id, 'status': state, 'status_url': url_for('poster_job_status', job_id=job_id)}
+    if state == 'done':
+        payload['download_url'] = url_for('download_poster_job', job_id=job_id)
+    return payload
+
+def _log_poster_activity(item):
+    if 'user_id' in session:
+        log_activity(
+            user_id=session['user_id'],
+            action_type='generate_poster',
+            action_description=f'Generated PDF poster for item: {item.name}',
+            item_id=item.id,
+            additional_data={
+                'item_name': item.name,
+                'item_status': item.status
+            }
+        )
+
+@app.route('/api/poster/<int:item_id>/jobs', methods=['POST'])
+def submit_poster(item_id):
+    """Queue an item's poster for rendering; poll status_url, then fetch download_url"""
+    item = db.session.get(LostItem, item_id)
+    if not item:
+        return jsonify({'error': 'Item not found'}), 404
+    item_url = url_for('home', _external=True) + f"#item-{item.id}"
+    version = poster_version(item, item_url)
+    job_id = f"{item.id}-{version}"
+    if cached_poster(item.id, version) is None:
+        submit_poster_job(poster_snapshot(item, item_url), version)
+    _log_poster_activity(item)
+    state = poster_job_state(job_id) or 'pending'
+    return jsonify(_poster_job_json(job_id, state)), {'done': 200, 'failed': 500}.get(state, 202)
+
+@app.route('/api/poster/jobs/<job_id>', methods=['GET'])
+def poster_job_status(job_id):
+    state = poster_job_state(job_id)
+    if state is None:
+        return jsonify({'error': 'Unknown or expired poster job'}), 404
+    payload = _poster_job_json(job_id, state)
+    if state == 'failed':
+        payload['error'] = 'Poster rendering failed'
+    return jsonify(payload), 500 if state == 'failed' else 200
+
+@app.route('/api/poster/jobs/<job_id>/download', methods=['GET'])
+def download_poster_job(job_id):
+    match = _POSTER_JOB_ID.match(job_id)
+    path = cached_poster(int(match.group(1)), match.group(2)) if match else None
+    if path is None:
+        return jsonify({'error': 'Poster not ready', 'status_url': url_for('poster_job_status', job_id=job_id)}), 404
+    return send_file(path, mimetype='application/pdf', as_attachment=True,
+                     download_name=f"poster_item_{match.group(1)}.pdf", etag=match.group(2), conditional=True)
+
 # Generate a printable poster PDF for an item
 @app.route('/poster/<int:item_id>', methods=['GET'])
 def generate_poster(item_id):
     # Fresh import to ensure we're using the active interpreter's ReportLab
     try:
         from reportlab.pdfgen import canvas as _canvas
-        from reportlab.lib.pagesizes import A4 as _A4
-        from reportlab.lib.units import inch as _inch
     except Exception as import_err:
         try:
             import sys
@@ -1490,170 +4458,178 @@ def generate_poster(item_id):
     item = db.session.get(LostItem, item_id)
     if not item:
         return jsonify({'error': 'Item not found'}), 404
-    
-    # Log PDF generation activity
-    if 'user_id' in session:
-        log_activity(
-            user_id=session['user_id'],
-            action_type='generate_poster',
-            action_description=f'Generated PDF poster for item: {item.name}',
-            item_id=item.id,
-            additional_data={
-                'item_name': item.name,
-                'item_status': item.status
-            }
-        )
-
-    buffer = BytesIO()
-    page_width, page_height = _A4
-    c = _canvas.Canvas(buffer, pagesize=_A4)
-
-    margin = 50
-    y = page_height - margin
-
-    # Header
-    c.setFillColorRGB(0, 0.2, 0.6)
-    c.setFont("Helvetica-Bold", 26)
-    c.drawString(margin, y, "BRACU Lost & Found Poster")
-    y -= 20
-    c.setFillColorRGB(0, 0, 0)
-    c.setFont("Helvetica", 12)
-    c.drawString(margin, y, datetime.now().strftime('%Y-%m-%d %H:%M'))
-    y -= 30
-
-    # Item title and status badge
-    c.setFont("Helvetica-Bold", 22)
-    c.drawString(margin, y, f"{item.name or 'Unnamed Item'}")
-    status_text = item.status.capitalize() if item.status else 'Unknown'
-    c.setFont("Helvetica-Bold", 12)
-    c.setFillColorRGB(0.8, 0.5, 0) if status_text == 'Lost' else c.setFillColorRGB(0.2, 0.6, 0.2)
-    c.drawString(margin, y - 18, f"Status: {status_text}")
-    c.setFillColorRGB(0, 0, 0)
-    y -= 40
-
-    # Details
-    c.setFont("Helvetica", 12)
-    if item.value:
-        c.drawString(margin, y, f"Estimated Value: {item.value}")
-        y -= 18
-    if item.location:
-        c.drawString(margin, y, f"Location: {item.location}")
-        y -= 18
-    if item.created_at:
-        c.drawString(margin, y, f"Posted: {item.created_at.strftime('%Y-%m-%d %H:%M')}")
-        y -= 18
-
-    # Description block (wrap manually)
-    c.setFont("Helvetica", 12)
-    desc = item.description or ''
-    max_width = page_width - margin * 2
-    def wrap_text(text, font_name, font_size, max_w):
-        c.setFont(font_name, font_size)
-        words = text.split()
-        lines = []
-        line = ''
-        for w in words:
-            test = f"{line} {w}".strip()
-            if c.stringWidth(test, font_name, font_size) <= max_w:
-                line = test
-            else:
-                if line:
-                    lines.append(line)
-                line = w
-        if line:
-            lines.append(line)
-        return lines
-
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(margin, y, "Description:")
-    y -= 18
-    c.setFont("Helvetica", 12)
-    for line in wrap_text(desc, "Helvetica", 12, max_width):
-        c.drawString(margin, y, line)
-        y -= 16
-
-    y -= 10
-
-    # Photos section (embed up to 3 images, scaled to fit)
-    try:
-        photos = []
-        if item.photo_filenames:
-            try:
-                data = json.loads(item.photo_filenames)
-                if isinstance(data, list):
-                    photos = [p for p in data if isinstance(p, str)]
-            except Exception:
-                photos = []
-        elif item.photo_filename:
-            photos = [item.photo_filename]
-
-        if photos:
-            c.setFont("Helvetica-Bold", 14)
-            c.drawString(margin, y, "Photos:")
-            y -= 18
-            from reportlab.lib.utils import ImageReader
-            max_image_width = page_width - 2 * margin
-            max_image_height = 3 * _inch
-            for idx, photo in enumerate(photos[:3]):
-                absolute_path = os.path.join(app.root_path, app.config['UPLOAD_FOLDER'], photo)
-                if not os.path.exists(absolute_path):
-                    continue
-                try:
-                    img_reader = ImageReader(absolute_path)
-                    img_w, img_h = img_reader.getSize()
-                    scale = min(max_image_width / float(img_w), max_image_height / float(img_h))
-                    draw_w = float(img_w) * scale
-                    draw_h = float(img_h) * scale
-                    # New page if not enough space
-                    if y - draw_h < margin + 60:
-                        c.showPage()
-                        y = page_height - margin
-                        c.setFont("Helvetica-Bold", 14)
-                        c.drawString(margin, y, "Photos (cont.):")
-                        y -= 18
-                    x = margin + (max_image_width - draw_w) / 2.0
-                    c.drawImage(img_reader, x, y - draw_h, width=draw_w, height=draw_h, preserveAspectRatio=True, mask='auto')
-                    y -= draw_h + 12
-                except Exception as ie:
-                    print(f"Failed to embed image '{photo}': {ie}")
-    except Exception as e:
-        print(f"Photos section failed: {e}")
 
-    # QR code linking back to the item anchor on the portal
-    try:
-        from reportlab.graphics.barcode import qr as rl_qr
-        from reportlab.graphics import renderPDF as rl_renderPDF
-        item_url = url_for('home', _external=True) + f"#item-{item.id}"
-        code = rl_qr.QrCodeWidget(item_url)
-        bounds = code.getBounds()
-        size = 150
-        width = bounds[2] - bounds[0]
-        height = bounds[3] - bounds[1]
-        scale_x = float(size) / float(width)
-        scale_y = float(size) / float(height)
-        from reportlab.graphics.shapes import Drawing
-        d = Drawing(size, size, transform=[scale_x, 0, 0, scale_y, 0, 0])
-        d.add(code)
-        rl_renderPDF.draw(d, c, page_width - margin - size, margin)
-        c.setFont("Helvetica", 10)
-        c.drawString(page_width - margin - size, margin + size + 6, "Scan to view online")
-    except Exception as e:
-        print(f"QR generation failed: {e}")
+    item_url = url_for('home', _external=True) + f"#item-{item.id}"
+    version = poster_version(item, item_url)
+    path = cached_poster(item.id, version)
+    if path is None:
+        # Waiting on the pool's future releases the GIL, so other requests keep being served
+        job_id, job = submit_poster_job(poster_snapshot(item, item_url), version)
+        try:
+            path = job.result(timeout=app.config['POSTER_RENDER_TIMEOUT'])
+        except FutureTimeoutError:
+            response = jsonify({'error': 'Poster is still rendering, please retry shortly',
+                                **_poster_job_json(job_id, 'pending')})
+            response.headers['Retry-After'] = '5'
+            return response, 503
+
+    # send_file answers If-None-Match with a 304; "no-cache" makes clients revalidate
+    response = send_file(path, mimetype='application/pdf', as_attachment=True,
+                         download_name=f"poster_item_{item.id}.pdf", etag=version, conditional=True)
+    if response.status_code == 304:
+        return response
 
-    # Footer
-    c.setFont("Helvetica-Oblique", 10)
-    c.drawString(margin, margin, "Generated by BRACU Lost & Found Portal")
+    # Log PDF generation activity
+    _log_poster_activity(item)
+    return response
+
+# ---------------- Poster booklets ----------------
+# Staff print the posters of every open item before events. One request covers all items
+# matching the home-page filters plus a status list, read from the DB in small batches:
+#  - format=zip (default) streams one PDF per item out as each is ready, reusing the poster
+#    cache and the render pool, so memory stays flat however many items match.
+#  - format=pdf draws every poster onto one canvas as its batch arrives, reusing the decoded
+#    photos of the last POSTER_BOOKLET_IMAGE_CACHE ones drawn. ReportLab keeps the whole
+#    document in memory until save(), so this is capped at POSTER_BOOKLET_PDF_MAX_ITEMS;
+#    the booklet is spooled to a temp file and streamed from there.
+POSTER_BOOKLET_BATCH = 50
+POSTER_BOOKLET_STATUSES = ('lost', 'found', 'warehouse')
+POSTER_BOOKLET_PDF_MAX_ITEMS = 100
+POSTER_BOOKLET_IMAGE_CACHE = 32
+
+def _booklet_item_batches(item_ids):
+    """Yield the items for these ids, in order, a batch at a time with their photos loaded"""
+    for start in range(0, len(item_ids), POSTER_BOOKLET_BATCH):
+        chunk = item_ids[start:start + POSTER_BOOKLET_BATCH]
+        items = {item.id: item for item in LostItem.query.filter(LostItem.id.in_(chunk)).all()}
+        yield load_item_photos([items[item_id] for item_id in chunk if item_id in items])
+
+def _poster_path_future(item, item_url):
+    """Future of the cached poster path for an item, rendering it through the pool if needed"""
+    version = poster_version(item, item_url)
+    path = cached_poster(item.id, version)
+    if path is None:
+        return submit_poster_job(poster_snapshot(item, item_url), version)[1]
+    done = Future()
+    done.set_result(path)
+    return done
+
+class _ZipChunkSink(io.RawIOBase):
+    """Write-only, unseekable target for ZipFile; the generator drains what was written"""
+
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def writable(self):
+        return True
 
-    c.showPage()
-    c.save()
-    pdf = buffer.getvalue()
-    buffer.close()
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def _stream_poster_zip(item_ids, home_url):
+    # Keep a few renders in flight so the pool stays busy while finished posters stream out
+    window = max(2, app.config['POSTER_WORKERS'] * 2)
+    pending = deque()
+    sink = _ZipChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+        def flush(limit):
+            while len(pending) > limit:
+                item_id, future = pending.popleft()
+                try:
+                    archive.write(future.result(timeout=app.config['POSTER_RENDER_TIMEOUT']), f"poster_item_{item_id}.pdf")
+                except Exception as e:
+                    print(f"Booklet skipped poster for item {item_id}: {e}")
+                yield sink.drain()
+
+        for items in _booklet_item_batches(item_ids):
+            for item in items:
+                pending.append((item.id, _poster_path_future(item, f"{home_url}#item-{item.id}")))
+                yield from flush(window)
+        yield from flush(0)
+    yield sink.drain()
+
+def _stream_poster_booklet(item_ids, home_url):
+    from reportlab.pdfgen import canvas as _canvas
+    from reportlab.lib.pagesizes import A4 as _A4
+
+    with tempfile.TemporaryFile(dir=app.config['POSTER_CACHE_FOLDER']) as spool:
+        c = _canvas.Canvas(spool, pagesize=_A4)
+        images = OrderedDict()  # photo name -> ImageReader, least recently drawn first
+        for items in _booklet_item_batches(item_ids):
+            for item in items:
+                reused = [name for name in item.photos[:POSTER_PHOTO_LIMIT] if name in images]
+                for name in reused:
+                    images.move_to_end(name)
+                snapshot = poster_snapshot(item, f"{home_url}#item-{item.id}", skip_photos=reused)
+                draw_poster_pages(c, snapshot, images)
+                # Evict only after drawing, so the photos this poster skipped were still there
+                while len(images) > POSTER_BOOKLET_IMAGE_CACHE:
+                    images.popitem(last=False)
+        c.save()
+        spool.seek(0)
+        while True:
+            chunk = spool.read(64 * 1024)
+            if not chunk:
+                break
+            yield chunk
+
+@app.route('/posters/booklet', methods=['GET'])
+def poster_booklet():
+    """Posters of every item matching the home-page filters and `status` (comma-separated,
+    default found): a ZIP of one PDF per item (format=zip, the default), or a single PDF
+    (format=pdf) for at most POSTER_BOOKLET_PDF_MAX_ITEMS items; larger PDF requests get a
+    413 whose zip_url asks for the same items as a ZIP.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Authentication required'}), 401
+    statuses = [s for s in request.args.get('status', 'found').split(',') if s in POSTER_BOOKLET_STATUSES]
+    output = request.args.get('format', 'zip')
+    if not statuses or output not in ('pdf', 'zip'):
+        return jsonify({'error': f"status must be one of {', '.join(POSTER_BOOKLET_STATUSES)} and format pdf or zip"}), 400
+
+    filters = _parse_item_filters(request.args)
+    item_ids = [row.id for row in _apply_item_filters(
+        LostItem.query.filter(LostItem.status.in_(statuses)), filters
+    ).with_entities(LostItem.id).order_by(LostItem.created_at.desc(), LostItem.id.desc()).all()]
+    if not item_ids:
+        return jsonify({'error': 'No items match these filters'}), 404
+    if output == 'pdf' and len(item_ids) > POSTER_BOOKLET_PDF_MAX_ITEMS:
+        return jsonify({
+            'error': f"PDF booklets are limited to {POSTER_BOOKLET_PDF_MAX_ITEMS} items "
+                     f"({len(item_ids)} match); use format=zip",
+            'zip_url': url_for('poster_booklet', **{**request.args.to_dict(), 'format': 'zip'}),
+        }), 413
 
-    filename = f"poster_item_{item.id}.pdf"
-    headers = {
-        'Content-Disposition': f'attachment; filename="{filename}"'
-    }
-    return Response(pdf, mimetype='application/pdf', headers=headers)
+    log_activity(
+        user_id=session['user_id'],
+        action_type='generate_poster_booklet',
+        action_description=f"Generated {output.upper()} poster booklet of {len(item_ids)} items",
+        additional_data={
+            'statuses': statuses,
+            'format': output,
+            'item_count': len(item_ids),
+            'filters': {key: request.args.get(key, '') for key in ('item', 'location', 'keyword', 'date_from', 'date_to')}
+        }
+    )
+    home_url = url_for('home', _external=True)
+    stream = _stream_poster_zip(item_ids, home_url) if output == 'zip' else _stream_poster_booklet(item_ids, home_url)
+    download_name = f"posters_{'_'.join(statuses)}_{datetime.now().strftime('%Y%m%d')}.{output}"
+    return Response(
+        stream_with_context(stream),
+        mimetype='application/zip' if output == 'zip' else 'application/pdf',
+        headers={'Content-Disposition': f'attachment; filename="{download_name}"'}
+    )
 
 # ---------------- Notification APIs ----------------
 @app.route('/notifications', methods=['GET'])
@@ -1798,7 +4774,11 @@ def get_messages(conversation_id):
             'created_at': m.created_at.strftime('%Y-%m-%d %H:%M:%S') if m.created_at else None
         }
         if getattr(m, 'attachment', None):
-            item['attachment'] = url_for('static', filename=f'uploads/{m.attachment}', _external=False)
+            item['attachment'] = upload_url(m.attachment)
+            item['attachment_srcset'] = photo_srcset(m.attachment)
+            if m.attachment_name:
+                item['attachment_name'] = m.attachment_name
+                item['attachment_download'] = upload_url(m.attachment, m.attachment_name)
         payload.append(item)
     return jsonify({'messages': payload})
 
@@ -1839,17 +4819,18 @@ def send_message(conversation_id):
         content = (request.form.get('content') or '').strip()
         file = request.files.get('file')
         saved_filename = None
+        attachment_name = None
         if file and file.filename:
             if not allowed_file(file.filename):
                 return jsonify({'error': 'File type not allowed'}), 400
-            base = secure_filename(file.filename)
-            unique = f"user_{session['user_id']}_{secrets.token_hex(8)}_{base}"
-            save_path = os.path.join(app.config['UPLOAD_FOLDER'], unique)
-            file.save(save_path)
-            saved_filename = unique
+            saved_filename = store_upload(file)
+            if not saved_filename:
+                return jsonify({'error': 'Image file could not be read'}), 400
+            attachment_name = secure_filename(file.filename) or None
         if not content and not saved_filename:
             return jsonify({'error': 'Message content or file required'}), 400
-        msg = Message(conversation_id=conversation_id, sender_id=me, content=content or '', attachment=saved_filename)
+        msg = Message(conversation_id=conversation_id, sender_id=me, content=content or '',
+                      attachment=saved_filename, attachment_name=attachment_name)
     else:
         data = request.get_json(silent=True) or {}
         content = (data.get('content') or '').strip()
@@ -1858,6 +4839,8 @@ def send_message(conversation_id):
         msg = Message(conversation_id=conversation_id, sender_id=me, content=content)
     db.session.add(msg)
     db.session.commit()
+    if msg.attachment:
+        enqueue_thumbnails([msg.attachment])
 
     # Log chat message activity
     log_activity(
@@ -1886,7 +4869,11 @@ def send_message(conversation_id):
 
     resp = {'id': msg.id}
     if getattr(msg, 'attachment', None):
-        resp['attachment'] = url_for('static', filename=f'uploads/{msg.attachment}', _external=False)
+        resp['attachment'] = upload_url(msg.attachment)
+        resp['attachment_srcset'] = photo_srcset(msg.attachment)
+        if msg.attachment_name:
+            resp['attachment_name'] = msg.attachment_name
+            resp['attachment_download'] = upload_url(msg.attachment, msg.attachment_name)
     return jsonify(resp), 201
 
 @app.route('/api/chat/start_from_item/<int:item_id>', methods=['POST'])
@@ -1973,32 +4960,23 @@ def edit_item(item_id):
         photo_filenames_list = []
         if 'item_photos' in request.files:
             files = request.files.getlist('item_photos')
-            for file in files:
-                if file and file.filename != '' and allowed_file(file.filename):
-                    original = secure_filename(file.filename)
-                    token = secrets.token_hex(8)
-                    reporter_id = session.get('user_id', 'anon')
-                    unique_name = f"user_{reporter_id}_{token}_{original}"
-                    file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_name)
-                    file.save(file_path)
-                    photo_filenames_list.append(unique_name)
-        # Merge newly uploaded photos with existing ones
-        existing = []
-        if item.photo_filenames:
-            try:
-                existing = json.loads(item.photo_filenames)
-                if not isinstance(existing, list):
-                    existing = []
-            except Exception:
-                existing = []
-        combined = existing + photo_filenames_list
-        if combined:
-            item.photo_filenames = json.dumps(combined)
-            item.photo_filename = combined[0]
+            photo_filenames_list = store_uploads(f for f in files if f and f.filename != '' and allowed_file(f.filename))
+        # Append newly uploaded photos after the existing ones
+        add_item_photos(item, photo_filenames_list)
     except Exception as e:
         print(f"Photo update skipped on edit: {e}")
+        photo_filenames_list = []
 
     db.session.commit()
+    invalidate_posters([item.id])
+    if photo_filenames_list:
+        enqueue_photo_hashing(item.id)
+        enqueue_thumbnails(photo_filenames_list)
+    try:
+        refresh_item_matches(item)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Match refresh failed for item {item.id}: {e}")
     
     # Log item edit activity
     log_activity(
@@ -2035,6 +5013,12 @@ def mark_item_found(item_id):
     previous_status = item.status
     item.status = 'found'
     db.session.commit()
+    warehouse_deadlines.schedule(item.id, item.warehouse_deadline)
+    try:
+        refresh_item_matches(item)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Match refresh failed for item {item.id}: {e}")
     
     # Log status change activity
     log_activity(
@@ -2085,6 +5069,7 @@ def delete_lost_item(product_id):
 
     previous_status = item.status
     item.status = 'deleted'
+    drop_item_matches([item.id])
     db.session.commit()
 
     # Log item deletion activity
@@ -2149,6 +5134,12 @@ def undo_delete_item(item_id):
     restored_status = 'found' if item.location else 'lost'
     item.status = restored_status
     db.session.commit()
+    warehouse_deadlines.schedule(item.id, item.warehouse_deadline)
+    try:
+        refresh_item_matches(item)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Match refresh failed for item {item.id}: {e}")
 
     # Log item restoration activity
     log_activity(
@@ -2251,9 +5242,13 @@ def verify_profile_update():
             user.phone = pending.get('phone', user.phone)
             user.address = pending.get('address', user.address)
             filename = pending.get('profile_photo_filename')
-            if filename:
-                user.profile_photo = filename
+            staged_path = os.path.join(app.config['UPLOAD_STAGING_FOLDER'], filename) if filename else None
+            if staged_path and os.path.isfile(staged_path):
+                release_uploads([user.profile_photo])
+                user.profile_photo = store_upload_file(staged_path)
             db.session.commit()
+            if staged_path and user.profile_photo:
+                enqueue_thumbnails([user.profile_photo])
             
             # Log profile update activity
             log_activity(
@@ -0,0 +1,99 @@
+# Benchmark: exact Jaccard match scan (what _match_score does pair by pair) vs MinHash/LSH candidates
+#
+# Usage: python bench_matching.py [sizes...]    e.g. python bench_matching.py 10000 100000
+#
+# Builds synthetic found items in memory, half of them noisy copies of the lost reports used
+# as queries, and reports recall of the exact top-k (pairs at or above the LSH threshold) and
+# per-query latency. Signatures and banding come from minhash.py, as in app.py (NumPy needed).
+# Does not touch instance/ecommerce.db.
+
+import random
+import sys
+import time
+
+import numpy as np
+
+from minhash import MINHASH_NUM_PERM as NUM_PERM, lsh_band_shape, lsh_buckets, minhash_signature
+
+THRESHOLD = float(next((a.split('=', 1)[1] for a in sys.argv[1:] if a.startswith('--threshold=')), 0.3))
+TOP_K = 10
+QUERIES = 200
+
+WORDS = [
+    'iphone', 'samsung', 'galaxy', 'wallet', 'watch', 'calculator', 'casio', 'laptop', 'charger',
+    'bottle', 'umbrella', 'keys', 'card', 'student', 'black', 'blue', 'red', 'leather', 'gold',
+    'silver', 'bag', 'backpack', 'notebook', 'headphones', 'earbuds', 'glasses', 'jacket', 'ring',
+]
+LOCATIONS = ['library', 'cafeteria', 'auditorium', 'lab', 'classroom', 'parking', 'gym', 'lobby']
+RARE_WORDS = [f"model{n:05d}" for n in range(20_000)]
+
+BANDS, ROWS = lsh_band_shape(THRESHOLD)
+
+
+def signature(tokens):
+    # An array, so estimating similarity is one vectorized comparison
+    return np.array(minhash_signature(tokens), dtype=np.uint64)
+
+
+def buckets(sig):
+    return lsh_buckets(sig.tolist(), BANDS, ROWS)
+
+
+def random_item(rnd):
+    return set(rnd.sample(WORDS, 2) + rnd.choices(WORDS, k=4) + rnd.choices(RARE_WORDS, k=3) + [rnd.choice(LOCATIONS)])
+
+
+def noisy_copy(rnd, tokens):
+    kept = [t for t in tokens if rnd.random() > 0.3]
+    return set(kept + rnd.choices(WORDS, k=2))
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:] if not a.startswith('--')] or [10_000, 100_000]
+    print(f"# threshold {THRESHOLD}: {BANDS} bands x {ROWS} rows, recall of exact top-{TOP_K} pairs >= threshold")
+    print(f"{'items':>9} {'exact ms':>9} {'lsh ms':>9} {'recall':>7} {'cands':>7}")
+    for n in sizes:
+        rnd = random.Random(42)
+        queries = [random_item(rnd) for _ in range(QUERIES)]
+        found = [noisy_copy(rnd, rnd.choice(queries)) if i % 2 else random_item(rnd) for i in range(n)]
+
+        started = time.perf_counter()
+        signatures = [signature(tokens) for tokens in found]
+        index = {}
+        for item_id, sig in enumerate(signatures):
+            for key in buckets(sig):
+                index.setdefault(key, []).append(item_id)
+        print(f"# built {n} signatures + LSH index in {time.perf_counter() - started:.1f}s")
+
+        exact_time = lsh_time = 0.0
+        hits = relevant = candidates_seen = 0
+        for tokens in queries:
+            started = time.perf_counter()
+            scored = sorted(((jaccard(tokens, other), i) for i, other in enumerate(found)), reverse=True)
+            exact_time += time.perf_counter() - started
+            truth = {i for score, i in scored[:TOP_K] if score >= THRESHOLD}
+
+            started = time.perf_counter()
+            sig = signature(tokens)
+            candidates = set()
+            for key in buckets(sig):
+                candidates.update(index.get(key, ()))
+            estimated = sorted(((np.count_nonzero(signatures[i] == sig) / NUM_PERM, i) for i in candidates), reverse=True)
+            kept = {i for score, i in estimated if score >= THRESHOLD}
+            lsh_top = {i for _, i in sorted(((jaccard(tokens, found[i]), i) for i in kept), reverse=True)[:TOP_K]}
+            lsh_time += time.perf_counter() - started
+
+            hits += len(truth & lsh_top)
+            relevant += len(truth)
+            candidates_seen += len(candidates)
+        recall = hits / relevant if relevant else 1.0
+        print(f"{n:>9} {exact_time / QUERIES * 1000:>9.2f} {lsh_time / QUERIES * 1000:>9.2f} "
+              f"{recall:>7.3f} {candidates_seen // QUERIES:>7}")
+
+
+if __name__ == '__main__':
+    main()
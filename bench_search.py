@@ -0,0 +1,103 @@
+# Benchmark: item search via ILIKE '%kw%' (old path) vs the FTS5 trigram index (new path)
+#
+# Usage: python bench_search.py [sizes...]    e.g. python bench_search.py 10000 100000 1000000
+#
+# Builds a throwaway SQLite database per size with synthetic lost_item rows, then times
+# the same keyword searches both ways. Does not touch instance/ecommerce.db.
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+WORDS = [
+    'iphone', 'samsung', 'galaxy', 'wallet', 'watch', 'calculator', 'casio', 'laptop', 'charger',
+    'bottle', 'umbrella', 'keys', 'card', 'student', 'black', 'blue', 'red', 'leather', 'gold',
+    'silver', 'bag', 'backpack', 'notebook', 'headphones', 'earbuds', 'glasses', 'jacket', 'ring',
+]
+LOCATIONS = ['library', 'cafeteria', 'auditorium', 'lab 7', 'classroom 1102', 'parking', 'gym', 'lobby']
+# Long tail of model names/serials so most words are rare, like real descriptions
+RARE_WORDS = [f"model{n:05d}" for n in range(20_000)]
+# Common words (LIKE can stop early), rare words, and a miss (LIKE scans the whole table)
+QUERIES = ['phone', 'gold watch', 'model01234', 'casio model00042', 'zebra']
+PAGE_SIZE = 12
+
+
+def build_db(path, n):
+    rnd = random.Random(42)
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE lost_item (id INTEGER PRIMARY KEY, name TEXT, description TEXT, location TEXT, "
+        "status TEXT, created_at TEXT)"
+    )
+    rows = (
+        (
+            i,
+            ' '.join(rnd.sample(WORDS, 2)),
+            ' '.join(rnd.choices(WORDS, k=8) + rnd.choices(RARE_WORDS, k=4)),
+            rnd.choice(LOCATIONS),
+            rnd.choice(['lost', 'found']),
+            f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d} 12:00:00",
+        )
+        for i in range(1, n + 1)
+    )
+    conn.executemany("INSERT INTO lost_item VALUES (?, ?, ?, ?, ?, ?)", rows)
+    conn.execute("CREATE INDEX ix_lost_item_status_created_id ON lost_item (status, created_at, id)")
+    conn.execute(
+        "CREATE VIRTUAL TABLE lost_item_fts USING fts5(name, description, location, "
+        "content='lost_item', content_rowid='id', tokenize='trigram')"
+    )
+    conn.execute("INSERT INTO lost_item_fts(lost_item_fts) VALUES ('rebuild')")
+    conn.commit()
+    return conn
+
+
+def like_search(conn, kw):
+    like = f"%{kw}%"
+    return conn.execute(
+        "SELECT id FROM lost_item WHERE status = 'found' "
+        "AND (description LIKE ? OR name LIKE ? OR location LIKE ?) "
+        "ORDER BY created_at DESC, id DESC LIMIT ?",
+        (like, like, like, PAGE_SIZE + 1),
+    ).fetchall()
+
+
+def fts_search(conn, kw):
+    match = ' '.join(f'"{t}"' for t in kw.split())
+    return conn.execute(
+        "SELECT lost_item.id FROM lost_item JOIN ("
+        "  SELECT rowid AS item_id, bm25(lost_item_fts, 5.0, 1.0, 2.0) AS rank"
+        "  FROM lost_item_fts WHERE lost_item_fts MATCH ?"
+        ") ranked ON ranked.item_id = lost_item.id "
+        "WHERE lost_item.status = 'found' ORDER BY ranked.rank, lost_item.id DESC LIMIT ?",
+        (match, PAGE_SIZE + 1),
+    ).fetchall()
+
+
+def timed(fn, conn, kw, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(conn, kw)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000.0
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    print(f"{'items':>9}  {'query':<18} {'LIKE ms':>9} {'FTS5 ms':>9}")
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            started = time.perf_counter()
+            conn = build_db(os.path.join(tmp, 'bench.db'), n)
+            print(f"# built {n} items in {time.perf_counter() - started:.1f}s")
+            for kw in QUERIES:
+                print(f"{n:>9}  {kw:<18} {timed(like_search, conn, kw):>9.2f} {timed(fts_search, conn, kw):>9.2f}")
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# MinHash signatures and LSH banding for app.py's match index, kept apart (no Flask, no DB,
+# nothing run on import beyond the fixed permutations) so bench_matching.py measures the
+# exact scheme the app stores.
+
+import hashlib
+import random
+import struct
+import zlib
+
+try:
+    import numpy as np
+except ImportError:
+    # Optional: without NumPy signatures are computed in pure Python
+    np = None
+
+MINHASH_NUM_PERM = 128
+MINHASH_PRIME = (1 << 31) - 1  # keeps a * x + b inside 64 bits for the NumPy path
+_minhash_rng = random.Random(20240917)  # fixed seed: signatures must agree across processes
+MINHASH_PERMUTATIONS = [
+    (_minhash_rng.randrange(1, MINHASH_PRIME), _minhash_rng.randrange(0, MINHASH_PRIME))
+    for _ in range(MINHASH_NUM_PERM)
+]
+
+def lsh_band_shape(threshold, num_perm=MINHASH_NUM_PERM):
+    """(bands, rows) whose S-curve midpoint (1/bands)^(1/rows) is closest to `threshold`"""
+    return min(
+        ((num_perm // rows, rows) for rows in range(1, num_perm + 1)),
+        key=lambda shape: abs((1.0 / shape[0]) ** (1.0 / shape[1]) - threshold)
+    )
+
+def minhash_signature(tokens):
+    """MinHash signature (list of MINHASH_NUM_PERM ints) of a token set, or None if empty"""
+    hashed = [zlib.crc32(t.encode('utf-8')) % MINHASH_PRIME for t in tokens]
+    if not hashed:
+        return None
+    if np is not None:
+        a = np.array([p[0] for p in MINHASH_PERMUTATIONS], dtype=np.uint64)
+        b = np.array([p[1] for p in MINHASH_PERMUTATIONS], dtype=np.uint64)
+        x = np.array(hashed, dtype=np.uint64)
+        return ((a[:, None] * x[None, :] + b[:, None]) % MINHASH_PRIME).min(axis=1).tolist()
+    return [min((a * x + b) % MINHASH_PRIME for x in hashed) for a, b in MINHASH_PERMUTATIONS]
+
+def pack_minhash(signature):
+    return struct.pack(f'<{MINHASH_NUM_PERM}I', *signature) if signature else None
+
+def unpack_minhash(blob):
+    return list(struct.unpack(f'<{MINHASH_NUM_PERM}I', blob)) if blob else None
+
+def minhash_similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity: share of permutations where the minima agree"""
+    if not sig_a or not sig_b:
+        return 0.0
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / MINHASH_NUM_PERM
+
+def lsh_buckets(signature, bands, rows):
+    """[(band, bucket)] keys of a signature; bucket is a signed 64-bit hash of the band's rows"""
+    if not signature:
+        return []
+    keys = []
+    for band in range(bands):
+        chunk = signature[band * rows:(band + 1) * rows]
+        digest = hashlib.blake2b(struct.pack(f'<{rows}I', *chunk), digest_size=8).digest()
+        keys.append((band, int.from_bytes(digest, 'little', signed=True)))
+    return keys
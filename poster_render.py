@@ -0,0 +1,156 @@
+# Poster drawing for app.py, kept apart so poster worker processes can import it without
+# the Flask app: nothing here runs on import, touches the DB or reads upload storage.
+# Posters are drawn from the plain snapshots built by app.poster_snapshot().
+
+from io import BytesIO
+
+POSTER_PHOTO_LIMIT = 3
+
+def render_poster_pdf(item):
+    """Draw a poster from a poster_snapshot() and return the PDF bytes (runs in pool workers)"""
+    from reportlab.pdfgen import canvas as _canvas
+    from reportlab.lib.pagesizes import A4 as _A4
+
+    buffer = BytesIO()
+    c = _canvas.Canvas(buffer, pagesize=_A4)
+    draw_poster_pages(c, item)
+    c.save()
+    pdf = buffer.getvalue()
+    buffer.close()
+    return pdf
+
+
+def draw_poster_pages(c, item, images=None):
+    """Draw one poster snapshot onto canvas `c`, finishing its last page.
+
+    `images` maps photo names to ImageReaders, so a booklet decodes each photo once.
+    """
+    from reportlab.lib.pagesizes import A4 as _A4
+    from reportlab.lib.units import inch as _inch
+
+    page_width, page_height = _A4
+    margin = 50
+    y = page_height - margin
+
+    # Header
+    c.setFillColorRGB(0, 0.2, 0.6)
+    c.setFont("Helvetica-Bold", 26)
+    c.drawString(margin, y, "BRACU Lost & Found Poster")
+    # No print date: the PDF is cached, and "Posted:" below dates the item itself
+    y -= 50
+    c.setFillColorRGB(0, 0, 0)
+
+    # Item title and status badge
+    c.setFont("Helvetica-Bold", 22)
+    c.drawString(margin, y, f"{item.name or 'Unnamed Item'}")
+    status_text = item.status.capitalize() if item.status else 'Unknown'
+    c.setFont("Helvetica-Bold", 12)
+    c.setFillColorRGB(0.8, 0.5, 0) if status_text == 'Lost' else c.setFillColorRGB(0.2, 0.6, 0.2)
+    c.drawString(margin, y - 18, f"Status: {status_text}")
+    c.setFillColorRGB(0, 0, 0)
+    y -= 40
+
+    # Details
+    c.setFont("Helvetica", 12)
+    if item.value:
+        c.drawString(margin, y, f"Estimated Value: {item.value}")
+        y -= 18
+    if item.location:
+        c.drawString(margin, y, f"Location: {item.location}")
+        y -= 18
+    if item.created_at:
+        c.drawString(margin, y, f"Posted: {item.created_at.strftime('%Y-%m-%d %H:%M')}")
+        y -= 18
+
+    # Description block (wrap manually)
+    c.setFont("Helvetica", 12)
+    desc = item.description or ''
+    max_width = page_width - margin * 2
+    def wrap_text(text, font_name, font_size, max_w):
+        c.setFont(font_name, font_size)
+        words = text.split()
+        lines = []
+        line = ''
+        for w in words:
+            test = f"{line} {w}".strip()
+            if c.stringWidth(test, font_name, font_size) <= max_w:
+                line = test
+            else:
+                if line:
+                    lines.append(line)
+                line = w
+        if line:
+            lines.append(line)
+        return lines
+
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(margin, y, "Description:")
+    y -= 18
+    c.setFont("Helvetica", 12)
+    for line in wrap_text(desc, "Helvetica", 12, max_width):
+        c.drawString(margin, y, line)
+        y -= 16
+
+    y -= 10
+
+    # Photos section (embed up to 3 images, scaled to fit)
+    try:
+        photos = item.photos
+        if photos:
+            c.setFont("Helvetica-Bold", 14)
+            c.drawString(margin, y, "Photos:")
+            y -= 18
+            from reportlab.lib.utils import ImageReader
+            max_image_width = page_width - 2 * margin
+            max_image_height = 3 * _inch
+            for idx, (photo, data) in enumerate(photos[:POSTER_PHOTO_LIMIT]):
+                try:
+                    img_reader = images.get(photo) if images is not None else None
+                    if img_reader is None:
+                        img_reader = ImageReader(BytesIO(data))
+                        if images is not None:
+                            images[photo] = img_reader
+                    img_w, img_h = img_reader.getSize()
+                    scale = min(max_image_width / float(img_w), max_image_height / float(img_h))
+                    draw_w = float(img_w) * scale
+                    draw_h = float(img_h) * scale
+                    # New page if not enough space
+                    if y - draw_h < margin + 60:
+                        c.showPage()
+                        y = page_height - margin
+                        c.setFont("Helvetica-Bold", 14)
+                        c.drawString(margin, y, "Photos (cont.):")
+                        y -= 18
+                    x = margin + (max_image_width - draw_w) / 2.0
+                    c.drawImage(img_reader, x, y - draw_h, width=draw_w, height=draw_h, preserveAspectRatio=True, mask='auto')
+                    y -= draw_h + 12
+                except Exception as ie:
+                    print(f"Failed to embed image '{photo}': {ie}")
+    except Exception as e:
+        print(f"Photos section failed: {e}")
+
+    # QR code linking back to the item anchor on the portal
+    try:
+        from reportlab.graphics.barcode import qr as rl_qr
+        from reportlab.graphics import renderPDF as rl_renderPDF
+        code = rl_qr.QrCodeWidget(item.url)
+        bounds = code.getBounds()
+        size = 150
+        width = bounds[2] - bounds[0]
+        height = bounds[3] - bounds[1]
+        scale_x = float(size) / float(width)
+        scale_y = float(size) / float(height)
+        from reportlab.graphics.shapes import Drawing
+        d = Drawing(size, size, transform=[scale_x, 0, 0, scale_y, 0, 0])
+        d.add(code)
+        rl_renderPDF.draw(d, c, page_width - margin - size, margin)
+        c.setFont("Helvetica", 10)
+        c.drawString(page_width - margin - size, margin + size + 6, "Scan to view online")
+    except Exception as e:
+        print(f"QR generation failed: {e}")
+
+    # Footer
+    c.setFont("Helvetica-Oblique", 10)
+    c.drawString(margin, margin, "Generated by BRACU Lost & Found Portal")
+
+    c.showPage()
@@ -0,0 +1,34 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# app.py configures itself from the environment at import time
+_tmp = tempfile.mkdtemp(prefix='blf-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmp, 'test.db')
+os.environ['POSTER_CACHE_FOLDER'] = os.path.join(_tmp, 'poster_cache')
+os.environ['WAREHOUSE_SCHEDULER_ENABLED'] = 'false'
+os.environ['EMAIL_OUTBOX_WORKER_ENABLED'] = 'false'
+os.environ['MATCH_FANOUT_ASYNC'] = 'false'
+os.environ['POSTER_WORKERS'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as blf  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    blf.app.config['TESTING'] = True
+    with blf.app.app_context():
+        blf.db.drop_all()
+        blf.db.create_all()
+        if blf.item_match_engine is not None:
+            blf.item_match_engine.built_at = None
+        yield blf.app
+        blf.db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
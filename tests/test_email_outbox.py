@@ -0,0 +1,68 @@
+import json
+import socket
+
+import pytest
+
+controller_module = pytest.importorskip('aiosmtpd.controller')
+
+from app import EmailOutbox, db, drain_email_outbox, enqueue_email, mail  # noqa: E402
+
+
+class _Recorder:
+    """aiosmtpd handler keeping every accepted message; refuses recipients named unknown@..."""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith('unknown@'):
+            return '550 No such user'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos, envelope.content.decode('utf-8', 'replace')))
+        return '250 Message accepted'
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server(app, monkeypatch):
+    handler = _Recorder()
+    controller = controller_module.Controller(handler, hostname='127.0.0.1', port=_free_port())
+    controller.start()
+    for key, value in {
+        'MAIL_SERVER': controller.hostname, 'MAIL_PORT': controller.port, 'MAIL_USE_TLS': False,
+        'MAIL_USE_SSL': False, 'MAIL_NO_AUTH': True, 'MAIL_USERNAME': None, 'MAIL_PASSWORD': None,
+        'MAIL_DEFAULT_SENDER': 'noreply@bracu-lostfound.test', 'MAIL_SUPPRESS_SEND': False,
+    }.items():
+        monkeypatch.setitem(app.config, key, value)
+    monkeypatch.setitem(app.extensions, 'mail', mail.init_mail(app.config))
+    yield handler
+    controller.stop()
+
+
+def test_queued_email_is_delivered(smtp_server):
+    assert enqueue_email('Item found', ['owner@g.bracu.ac.bd'], 'Your wallet was handed in.')
+
+    assert drain_email_outbox() == {'sent': 1, 'retried': 0, 'dead': 0}
+    [(recipients, content)] = smtp_server.messages
+    assert recipients == ['owner@g.bracu.ac.bd']
+    assert 'Subject: Item found' in content
+    row = EmailOutbox.query.one()
+    assert (row.status, row.attempts, json.loads(row.recipients)) == ('sent', 1, ['owner@g.bracu.ac.bd'])
+
+
+def test_rejected_recipient_is_dead_lettered(smtp_server):
+    enqueue_email('Item found', ['unknown@g.bracu.ac.bd'], 'Nobody reads this.')
+
+    assert drain_email_outbox() == {'sent': 0, 'retried': 0, 'dead': 1}
+    assert smtp_server.messages == []
+    row = EmailOutbox.query.one()
+    assert row.status == 'dead'
+    assert '550' in row.last_error
@@ -0,0 +1,61 @@
+from sqlalchemy import event
+
+from app import (HOME_PAGE_SIZES, LostItem, User, UserBadge, UserPoints, add_item_photos, db,
+                 rebuild_item_matches)
+
+# Items per status in the small run; the large run adds 2 * N more, and all 3 * N still fit
+# on the first page of every home section
+N = min(HOME_PAGE_SIZES.values()) // 3
+
+
+def _add_user(n):
+    user = User(username=f'user{n}', email=f'user{n}@example.com', password='x',
+                student_faculty_id=f'{n:08d}', email_verified=True)
+    db.session.add(user)
+    db.session.flush()
+    db.session.add(UserPoints(user_id=user.id, return_points=n))
+    db.session.add(UserBadge(user_id=user.id, badge_type='first_return', badge_name='First Return',
+                             badge_description='Returned an item'))
+    return user
+
+
+def _add_items(me, start, count):
+    for n in range(start, start + count):
+        poster = _add_user(n)
+        for status, owner in (('lost', me), ('found', poster), ('warehouse', poster)):
+            item = LostItem(name=f'Blue umbrella {n}', description='Folding umbrella', location='Library',
+                            status=status, reported_by=owner.id)
+            add_item_photos(item, [f'{status}-{n}-a.jpg', f'{status}-{n}-b.jpg'])
+            db.session.add(item)
+    db.session.commit()
+    rebuild_item_matches()
+
+
+def _count_home_queries(client):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        response = client.get('/')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    assert response.status_code == 200
+    return len(statements)
+
+
+def test_home_query_count_does_not_grow_with_items(app, client):
+    me = _add_user(0)
+    db.session.commit()
+    with client.session_transaction() as sess:
+        sess['user_id'] = me.id
+    _add_items(me, 1, N)
+    client.get('/')  # first request runs the one-off before_request hooks
+    small = _count_home_queries(client)
+
+    _add_items(me, N + 1, 2 * N)
+    large = _count_home_queries(client)
+
+    assert small == large
@@ -0,0 +1,49 @@
+from app import ITEM_MATCH_PER_ITEM, ItemMatch, LostItem, db, rebuild_item_matches, refresh_item_matches
+
+
+def _add(name, description, status, location=None, value=None):
+    item = LostItem(name=name, description=description, status=status, location=location, value=value)
+    db.session.add(item)
+    return item
+
+
+def _list_of(item):
+    owner = ItemMatch.lost_id if item.status == 'lost' else ItemMatch.found_id
+    return ItemMatch.query.filter(ItemMatch.side == item.status, owner == item.id).all()
+
+
+def test_editing_popular_found_item_keeps_counterpart_lists(app):
+    found = _add('Black leather wallet', 'Wallet with a library card', 'found', 'Library', 50)
+    close = [_add('Black leather wallet', 'Wallet with a library card', 'lost', 'Library', 50)
+             for _ in range(ITEM_MATCH_PER_ITEM)]
+    # The 11th lost report: its best match is the wallet, but it ranks below the others
+    eleventh = _add('Wallet', 'Lost it somewhere', 'lost')
+    db.session.commit()
+    rebuild_item_matches()
+    assert {row.lost_id for row in _list_of(found)} == {item.id for item in close}
+    assert [row.found_id for row in _list_of(eleventh)] == [found.id]
+
+    found.description = 'Brown wallet with a library card'
+    db.session.commit()
+    matches = refresh_item_matches(found)
+
+    assert len(matches) == ITEM_MATCH_PER_ITEM
+    assert eleventh.id not in {other.id for other, _ in matches}
+    assert [row.found_id for row in _list_of(eleventh)] == [found.id]
+    for item in close:
+        assert [row.found_id for row in _list_of(item)] == [found.id]
+
+
+def test_closed_item_leaves_counterpart_lists(app):
+    lost = _add('Casio calculator', 'fx-991 calculator', 'lost')
+    found = [_add('Casio calculator', 'fx-991 calculator', 'found') for _ in range(ITEM_MATCH_PER_ITEM + 1)]
+    db.session.commit()
+    rebuild_item_matches()
+    assert len(_list_of(lost)) == ITEM_MATCH_PER_ITEM
+
+    found[-1].status = 'warehouse'
+    db.session.commit()
+    refresh_item_matches(found[-1])
+
+    # The next-best found item moves up into the lost report's list
+    assert {row.found_id for row in _list_of(lost)} == {item.id for item in found[:-1]}
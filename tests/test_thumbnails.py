@@ -0,0 +1,35 @@
+import pytest
+
+import app as blf
+
+
+class _DeniedStorage:
+    """Upload storage whose existence checks fail like an S3 403"""
+
+    def __init__(self):
+        self.checks = 0
+
+    def exists(self, name):
+        self.checks += 1
+        raise RuntimeError('An error occurred (403) when calling the HeadObject operation: Forbidden')
+
+
+@pytest.fixture
+def denied_storage(monkeypatch):
+    storage = _DeniedStorage()
+    monkeypatch.setattr(blf, 'upload_storage', storage)
+    monkeypatch.setattr(blf, '_thumbnails_missing', {})
+    return storage
+
+
+def test_failed_thumbnail_check_renders_without_srcset_and_is_cached(app, denied_storage, monkeypatch):
+    with app.test_request_context('/'):
+        assert blf.photo_srcset_attrs('cas/ab/photo.jpg', '100vw') == ''
+        assert blf.photo_srcset_attrs('cas/ab/photo.jpg', '100vw') == ''
+    assert denied_storage.checks == 1
+
+    # Once the miss expires, storage is asked again
+    monkeypatch.setattr(blf, 'THUMBNAIL_MISSING_TTL', 0)
+    with app.test_request_context('/'):
+        assert blf.photo_srcset('cas/ab/photo.jpg') == ''
+    assert denied_storage.checks == 2
@@ -0,0 +1,66 @@
+import hashlib
+import os
+import time
+
+import pytest
+
+import app as blf
+from app import LocalUploadStorage, StoredUpload, collect_upload_garbage, db, store_upload_file
+
+CONTENT = b'%PDF-1.4 lost and found receipt'
+
+
+@pytest.fixture
+def storage(app, tmp_path, monkeypatch):
+    storage = LocalUploadStorage(str(tmp_path / 'uploads'), quarantine_root=str(tmp_path / 'quarantine'))
+    monkeypatch.setattr(blf, 'upload_storage', storage)
+    staging = tmp_path / 'staging'
+    staging.mkdir()
+    monkeypatch.setitem(app.config, 'UPLOAD_STAGING_FOLDER', str(staging))
+    return storage
+
+
+def _orphan(storage, tmp_path):
+    """A stored file no row references any more, older than UPLOAD_GC_GRACE"""
+    name = f"{blf.UPLOAD_CAS_DIR}/{hashlib.sha256(CONTENT).hexdigest()}.pdf"
+    staged = tmp_path / 'orphan.part'
+    staged.write_bytes(CONTENT)
+    storage.put_file(str(staged), name)
+    old = time.time() - blf.app.config['UPLOAD_GC_GRACE'] - 60
+    os.utime(storage.path(name), (old, old))
+    return name
+
+
+def _upload_again(tmp_path):
+    """What a request does when the same bytes are posted again (its row isn't committed yet)"""
+    staged = tmp_path / 'again.part'
+    staged.write_bytes(CONTENT)
+    return store_upload_file(str(staged), extension='pdf')
+
+
+def test_reupload_during_gc_scan_keeps_the_file(app, storage, tmp_path, monkeypatch):
+    name = _orphan(storage, tmp_path)
+    quarantine_batch = blf._quarantine_batch
+
+    def reupload_then_quarantine(*args, **kwargs):
+        # The scan has already listed the orphan with its old mtime
+        assert _upload_again(tmp_path) == name
+        return quarantine_batch(*args, **kwargs)
+
+    monkeypatch.setattr(blf, '_quarantine_batch', reupload_then_quarantine)
+    stats = collect_upload_garbage(storage)
+    db.session.commit()
+
+    assert stats['quarantined'] == 0
+    assert storage.exists(name)
+    assert StoredUpload.query.filter_by(filename=name).one().ref_count == 1
+
+
+def test_reupload_after_quarantine_writes_the_file_again(app, storage, tmp_path):
+    name = _orphan(storage, tmp_path)
+    assert collect_upload_garbage(storage)['quarantined'] == 1
+    assert not storage.exists(name)
+
+    assert _upload_again(tmp_path) == name
+    with storage.open(name) as stored:
+        assert stored.read() == CONTENT
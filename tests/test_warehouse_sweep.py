@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app import ActivityLog, EmailOutbox, LostItem, User, check_warehouse_deadlines, db
+
+
+def _reporter():
+    user = User(username='owner', email='owner@example.com', password='x', student_faculty_id='12345678')
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+
+def _overdue(name, status, reporter):
+    item = LostItem(name=name, description=name, status=status, reported_by=reporter.id,
+                    warehouse_deadline=datetime.now() - timedelta(minutes=1))
+    db.session.add(item)
+    return item
+
+
+def test_sweep_reports_each_item_previous_status(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'MAIL_NO_AUTH', True)
+    reporter = _reporter()
+    lost = _overdue('Umbrella', 'lost', reporter)
+    found = _overdue('Keys', 'found', reporter)
+    db.session.commit()
+
+    with app.test_request_context('/'):
+        assert check_warehouse_deadlines() == 2
+
+    subjects = {row.subject for row in EmailOutbox.query.all()}
+    assert subjects == {"Status update for 'Umbrella': lost → warehouse", "Status update for 'Keys': found → warehouse"}
+    logged = {row.item_id: row.additional_data for row in ActivityLog.query.all()}
+    assert '"previous_status": "lost"' in logged[lost.id]
+    assert '"previous_status": "found"' in logged[found.id]
+
+
+def test_sweep_skips_deadline_extended_after_select(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'MAIL_NO_AUTH', True)
+    reporter = _reporter()
+    item = _overdue('Bottle', 'lost', reporter)
+    db.session.commit()
+    extended = []
+
+    # The owner extends the deadline between the sweep's SELECT and its UPDATE
+    @event.listens_for(db.session, 'do_orm_execute')
+    def _extend_before_update(state):
+        if state.is_update and not extended:
+            extended.append(True)
+            state.session.execute(
+                db.update(LostItem).where(LostItem.id == item.id)
+                .values(warehouse_deadline=datetime.now() + timedelta(days=1))
+            )
+
+    try:
+        with app.test_request_context('/'):
+            assert check_warehouse_deadlines() == 0
+    finally:
+        event.remove(db.session, 'do_orm_execute', _extend_before_update)
+
+    db.session.refresh(item)
+    assert item.status == 'lost'
+    assert EmailOutbox.query.count() == 0